@@ -1,8 +1,23 @@
 # content_elaboration.py
 import os
+import atexit
+import asyncio
+import weakref
+import threading
+from collections.abc import AsyncIterator, Iterator
 import openai
+import httpx
+import re
 import json
 import datetime
+import functools
+from urllib.parse import urlparse
+from dataclasses import dataclass
+
+import llm_cache
+import llm_rate_limit
+import llm_retry
+import llm_tokens
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -11,96 +26,296 @@ OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY")
 # Using gpt-4o-mini as requested by the user for this elaboration phase
 DEFAULT_ELABORATION_MODEL_NAME = os.environ.get("ELABORATION_MODEL_NAME", "nousresearch/deephermes-3-mistral-24b-preview:free") 
 OPENROUTER_API_BASE = "https://openrouter.ai/api/v1"
+ELABORATION_TEMPERATURE = 0.5 # Slightly lower for more focused elaboration
+ELABORATION_CACHE_TTL = 86400
+ELABORATION_SEMANTIC_THRESHOLD = float(os.environ.get("ELABORATION_SEMANTIC_THRESHOLD", 0.95))
+ELABORATION_MAX_ATTEMPTS = 5
+
+# Tiered routing: (outline size upper bound in tokens, model). Short outlines go to a small, fast model.
+_MODEL_TIERS = [
+    (300, os.environ.get("ELABORATION_MODEL_SMALL", "meta-llama/llama-3.2-3b-instruct:free")),
+    (1000, DEFAULT_ELABORATION_MODEL_NAME),
+    (float("inf"), os.environ.get("ELABORATION_MODEL_LARGE", DEFAULT_ELABORATION_MODEL_NAME)),
+]
+ELABORATION_RETRY_MAX_WAIT = 30.0
+# Outlines above this many tokens lose their lowest-value bullets so the prompt fits the model's context window
+ELABORATION_MAX_OUTLINE_TOKENS = int(os.environ.get("ELABORATION_MAX_OUTLINE_TOKENS", 6000))
+
+# Pooled HTTP/OpenAI clients are built lazily, once per process: importing the module costs nothing, and a
+# forked worker (multiprocessing, gunicorn --preload) never reuses its parent's connection pool
+_CLIENT_STATE = {"pid": None, "client": None}
+_CLIENT_LOCK = threading.Lock()
+
+def _warm_connection(http_client: httpx.Client) -> None:
+    """Cheap request whose only purpose is to leave a keep-alive socket in the pool; the response is ignored."""
+    try:
+        http_client.head("/models", timeout=5.0)
+    except Exception as e:
+        print(f"[Content Elaboration] Connection warmup failed (non-fatal): {e}")
 
-CLIENT = None
-if OPENROUTER_API_KEY:
-    CLIENT = openai.OpenAI(
+def _build_client() -> openai.OpenAI | None:
+    if not OPENROUTER_API_KEY:
+        print("Warning: OPENROUTER_API_KEY environment variable not set. LLM calls will fail.")
+        return None
+    # One pooled HTTP client for every elaboration call so the TLS+TCP connection to openrouter.ai stays warm
+    http_client = httpx.Client(
+        base_url=OPENROUTER_API_BASE,
+        limits=httpx.Limits(max_keepalive_connections=16, max_connections=32, keepalive_expiry=60.0),
+        timeout=httpx.Timeout(45.0, connect=10.0), # Slightly above the observed p95 completion time
+        headers={"Connection": "keep-alive"},
+    )
+    atexit.register(http_client.close)
+    # Open the TCP+TLS connection in the background so the first real completion skips the handshake
+    threading.Thread(target=_warm_connection, args=(http_client,), daemon=True).start()
+    return openai.OpenAI(
         base_url=OPENROUTER_API_BASE,
         api_key=OPENROUTER_API_KEY,
+        http_client=http_client,
+        max_retries=0, # Retries are handled by llm_retry so they are not multiplied by the SDK's own
     )
-else:
-    print("Warning: OPENROUTER_API_KEY environment variable not set. LLM calls will fail.")
 
-CURRENT_YEAR = datetime.datetime.now().year
+def get_client() -> openai.OpenAI | None:
+    """Returns this process's shared OpenAI client (None without an API key), rebuilding it after a fork."""
+    pid = os.getpid()
+    if _CLIENT_STATE["pid"] != pid:
+        with _CLIENT_LOCK:
+            if _CLIENT_STATE["pid"] != pid:
+                _CLIENT_STATE["client"] = _build_client()
+                _CLIENT_STATE["pid"] = pid
+    return _CLIENT_STATE["client"]
+
+# AsyncOpenAI clients are bound to the event loop they were first used on, so keep one per loop
+_ASYNC_CLIENTS = weakref.WeakKeyDictionary()
+
+def _get_async_client() -> openai.AsyncOpenAI | None:
+    if not OPENROUTER_API_KEY:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None:
+        client = openai.AsyncOpenAI(
+            base_url=OPENROUTER_API_BASE,
+            api_key=OPENROUTER_API_KEY,
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_keepalive_connections=16, max_connections=32, keepalive_expiry=60.0),
+                timeout=httpx.Timeout(45.0, connect=10.0),
+            ),
+        )
+        _ASYNC_CLIENTS[loop] = client
+    return client
+
+@functools.lru_cache(maxsize=1)
+def _year_bucket(day_ordinal: int) -> int:
+    return datetime.datetime.now().year
+
+def current_year() -> int:
+    """Current year, recomputed at most once per day so long-running processes roll over at New Year."""
+    return _year_bucket(datetime.date.today().toordinal())
+
+# Static elaboration instructions; only the year and the query are filled in per call
+_SYSTEM_PROMPT_TEMPLATE = (
+    "You are an expert content writer and AI research analyst. Your primary task is to take a factual 'Brief Information Outline' (which includes source citations) and the original user query, then expand this outline into a well-structured, detailed, and coherent piece of content that **directly and comprehensively answers the original user query.** The current year is {year}.\n\n"
+
+    "Here's what you need to do:\n"
+    "1.  **Understand the Goal:** The original user query was: \"{query}\". The provided outline is the factual, web-sourced basis for your response. Your elaborated content MUST serve as a direct answer to this original query.\n"
+    "2.  **Source of Truth:** The 'Brief Information Outline' is your primary source of facts. You MUST NOT introduce new factual claims or data points that are not supported by this outline. Your role is to elaborate, explain, connect, and structure the existing information to answer the user's query.\n"
+    "3.  **Elaborate on Outline Points:** Take each bullet point from the outline and expand on it. Provide more context, explanation, or detail where appropriate, always staying true to the information presented in the outline point and its cited source.\n"
+    "4.  **Structure for Clarity:** Organize the elaborated information logically. Use clear headings (e.g., using Markdown like `## Main Topic from Query` or `### Key Aspect`) to structure the content into sections that naturally address different facets of the original user query.\n"
+    "5.  **Integrate and Answer:** Weave the elaborated points from the outline into a narrative or explanation that directly and thoroughly answers the `Original User Query`. For example, if the user asked 'How can X be used for Y?', your elaborated content about X (based on the outline) should clearly explain its application to Y.\n"
+    "6.  **Maintain Citations (Implicitly):** The input outline already contains citations. While elaborating, you are expanding on these cited facts. You don't need to re-cite every sentence, but the elaborated content should clearly flow from the cited outline points. You can introduce sections with phrases like 'Based on information from [Source URL mentioned in outline for relevant point]...' if it adds clarity, but the main goal is a readable narrative.\n"
+    "7.  **Coherent Narrative & Flow:** Ensure the elaborated content flows well, with smooth transitions between points and sections, forming a complete answer to the user's initial question.\n"
+    "8.  **Professional Tone:** Maintain a professional, informative, and helpful tone.\n"
+    "9.  **Output Format:** Produce the output in well-formatted Markdown.\n\n"
+    "DO NOT simply repeat the outline. Your goal is to transform the factual outline points into a comprehensive, well-explained answer to the user's original query, using only the information provided in the outline."
+)
+
+
+# Exception type -> (error kind, transient?). Looked up along the exception's MRO so the most specific entry wins
+# (RateLimitError/AuthenticationError are APIStatusError subclasses, which are in turn APIError subclasses).
+_ERR_HANDLERS = {
+    llm_retry.CircuitOpenError: ("circuit_open", False),
+    openai.RateLimitError: ("ratelimit", True),
+    openai.AuthenticationError: ("auth", False),
+    openai.InternalServerError: ("server", True),
+    openai.APIStatusError: ("status", False),
+    openai.APIConnectionError: ("connection", True),
+    openai.APIError: ("api", False),
+    json.JSONDecodeError: ("json", False),
+}
+_RETRYABLE_ERRORS = tuple(cls for cls, (_, transient) in _ERR_HANDLERS.items() if transient)
+
+# Shared by the sync and async paths: once OpenRouter keeps failing, stop sending it traffic for a while
+_ELABORATION_BREAKER = llm_retry.CircuitBreaker(fail_max=10, reset_timeout=30, name="openrouter-elaboration")
+# Identical concurrent requests (same cache key) share a single in-flight HTTP call
+_ELABORATION_FLIGHTS = llm_cache.SingleFlight()
+
+
+@dataclass(frozen=True)
+class LLMError:
+    """Returned by the private call helpers instead of sentinel-prefixed strings."""
+    code: str
+    message: str
+
+
+def _describe_llm_exception(e: Exception) -> tuple[str, str]:
+    """Maps an exception raised by the OpenAI SDK to (error kind, human readable message)."""
+    kind = next((_ERR_HANDLERS[cls][0] for cls in type(e).__mro__ if cls in _ERR_HANDLERS), "unexpected")
+    if kind == "circuit_open":
+        return kind, f"OpenRouter temporarily disabled after repeated failures: {e}"
+    if kind == "ratelimit":
+        return kind, f"OpenRouter Rate Limit Exceeded (RateLimitError exception): {e}"
+    if kind == "auth":
+        return kind, f"OpenRouter Authentication Error: {e}. Check API key."
+    if kind == "connection":
+        return kind, f"OpenRouter API Connection Error: {e}. Network issue or server unavailable."
+    if kind == "json":
+        return kind, (f"JSON Decode Error during LLM call ({type(e).__name__}): {e}. "
+                      "API server returned non-JSON response. Possible server issue or HTML error page.")
+    if kind in ("status", "server", "api"):
+        status_code = getattr(e, 'status_code', None)
+        error_message = (f"OpenRouter API Status Error (Status {status_code}): {getattr(e, 'message', str(e))}" if kind != "api"
+                         else f"OpenRouter APIError ({type(e).__name__}): {e}.")
+        response = getattr(e, 'response', None)
+        raw_text = "N/A"
+        if response is not None:
+            try: raw_text = response.text
+            except Exception: raw_text = "Could not read raw response text."
+        error_message += f" Raw response: {raw_text}"
+        if status_code == 429 or "rate limit" in getattr(e, 'message', str(e)).lower():
+            error_message += "\nThis appears to be a rate limit error from the API."
+        return kind, error_message
+    return kind, f"An unexpected error occurred during LLM call for elaboration ({type(e).__name__}): {e}."
+
+
+def _extract_elaboration_content(chat_completion) -> str | LLMError:
+    """Pulls the message text out of a completion, returning an LLMError when it is unusable."""
+    if hasattr(chat_completion, 'error') and chat_completion.error:
+        api_error_message = chat_completion.error.get('message', 'Unknown API error in response object.')
+        api_error_code = chat_completion.error.get('code', 'N/A')
+        error_message = (f"LLM API returned an error in the response object: "
+                         f"Code {api_error_code} - {api_error_message}\n"
+                         f"Full error object: {str(chat_completion.error)}")
+        print(f"Error in _call_llm_for_elaboration (API error in response): {error_message}")
+        return LLMError("api_response", api_error_message)
+
+    if chat_completion and \
+       hasattr(chat_completion, 'choices') and \
+       chat_completion.choices and \
+       chat_completion.choices[0] and \
+       hasattr(chat_completion.choices[0], 'message') and \
+       chat_completion.choices[0].message and \
+       hasattr(chat_completion.choices[0].message, 'content') and \
+       chat_completion.choices[0].message.content is not None:
+        return chat_completion.choices[0].message.content
+
+    error_message = "LLM API call for elaboration succeeded but response structure was unexpected or content was missing.\n"
+    error_message += f"Chat completion object (str): {str(chat_completion)}\n"
+    print(f"Error in _call_llm_for_elaboration (unexpected structure): {error_message}")
+    return LLMError("unexpected_structure", "Could not parse elaborated content from LLM.")
+
+
+def _do_create(client: openai.OpenAI, messages: list[dict], model_name: str, stream: bool = False):
+    """chat.completions.create with jittered exponential backoff on transient errors, behind the circuit breaker."""
+    return llm_retry.call_with_retry(
+        llm_rate_limit.paced(client.chat.completions.create, messages),
+        model=model_name,
+        messages=messages,
+        temperature=ELABORATION_TEMPERATURE,
+        stream=stream,
+        retry_on=_RETRYABLE_ERRORS,
+        max_attempts=ELABORATION_MAX_ATTEMPTS,
+        max_wait=ELABORATION_RETRY_MAX_WAIT,
+        breaker=_ELABORATION_BREAKER,
+    )
 
-def _call_llm_for_elaboration(messages: list[dict], model_name: str = DEFAULT_ELABORATION_MODEL_NAME) -> str | None:
+
+async def _ado_create(async_client: openai.AsyncOpenAI, messages: list[dict], model_name: str, stream: bool = False):
+    return await llm_retry.acall_with_retry(
+        llm_rate_limit.apaced(async_client.chat.completions.create, messages),
+        model=model_name,
+        messages=messages,
+        temperature=ELABORATION_TEMPERATURE,
+        stream=stream,
+        retry_on=_RETRYABLE_ERRORS,
+        max_attempts=ELABORATION_MAX_ATTEMPTS,
+        max_wait=ELABORATION_RETRY_MAX_WAIT,
+        breaker=_ELABORATION_BREAKER,
+    )
+
+
+def _call_llm_for_elaboration(messages: list[dict], model_name: str = DEFAULT_ELABORATION_MODEL_NAME) -> str | LLMError:
     """
     Private helper function to make a call to the LLM for content elaboration.
-    Returns the elaborated content or None if an error occurs.
+    Returns the elaborated content, or an LLMError if the call failed.
     """
-    if not CLIENT:
+    client = get_client()
+    if not client:
         error_message = "OpenRouter client not initialized for elaboration. API key might be missing."
         print(f"Error in _call_llm_for_elaboration: {error_message}")
-        return f"Error: {error_message}" 
+        return LLMError("no_client", error_message)
+
+    response_cache = llm_cache.get_default_cache()
+    cache_key = llm_cache.make_cache_key(model_name, messages, ELABORATION_TEMPERATURE) # Also keys in-flight coalescing
+    if response_cache:
+        cached_content = response_cache.get(cache_key)
+        if cached_content is not None:
+            print(f"[Content Elaboration LLM Call] Cache hit for model: {model_name} (stats: {response_cache.stats})")
+            return cached_content
+
+    print(f"[Content Elaboration LLM Call] Requesting completion from model: {model_name}")
     try:
-        print(f"[Content Elaboration LLM Call] Requesting completion from model: {model_name}")
-        chat_completion = CLIENT.chat.completions.create(
-            model=model_name,
-            messages=messages,
-            temperature=0.5 # Slightly lower for more focused elaboration
-        )
-        
-        if hasattr(chat_completion, 'error') and chat_completion.error:
-            api_error_message = chat_completion.error.get('message', 'Unknown API error in response object.')
-            api_error_code = chat_completion.error.get('code', 'N/A')
-            error_message = (f"LLM API returned an error in the response object: "
-                             f"Code {api_error_code} - {api_error_message}\n"
-                             f"Full error object: {str(chat_completion.error)}")
-            print(f"Error in _call_llm_for_elaboration (API error in response): {error_message}")
-            return f"Error generating elaborated content: {api_error_message}"
-
-        if chat_completion and \
-           hasattr(chat_completion, 'choices') and \
-           chat_completion.choices and \
-           len(chat_completion.choices) > 0 and \
-           chat_completion.choices[0] and \
-           hasattr(chat_completion.choices[0], 'message') and \
-           chat_completion.choices[0].message and \
-           hasattr(chat_completion.choices[0].message, 'content') and \
-           chat_completion.choices[0].message.content is not None:
-            response_content = chat_completion.choices[0].message.content
-            print(f"[Content Elaboration LLM Call] Received elaborated content (length: {len(response_content)}).")
-            return response_content
-        else:
-            error_message = "LLM API call for elaboration succeeded but response structure was unexpected or content was missing.\n"
-            error_message += f"Chat completion object (str): {str(chat_completion)}\n"
-            print(f"Error in _call_llm_for_elaboration (unexpected structure): {error_message}")
-            return "Error: Could not parse elaborated content from LLM."
+        chat_completion = _ELABORATION_FLIGHTS.do(cache_key, _do_create, client, messages, model_name)
+    except Exception as e:
+        kind, error_message = _describe_llm_exception(e)
+        print(f"Error in _call_llm_for_elaboration ({kind}): {error_message}")
+        return LLMError(kind, error_message)
 
-    except openai.APIStatusError as e: 
-        error_message = f"OpenRouter API Status Error (Status {e.status_code}): {getattr(e, 'message', str(e))}\n"
-        raw_text = "N/A"
-        if e.response is not None:
-            try: raw_text = e.response.text
-            except Exception: raw_text = "Could not read raw response text."
-        error_message += f"Raw response text: {raw_text}"
-        if e.status_code == 429 or "rate limit" in getattr(e, 'message', str(e)).lower():
-            error_message += "\nThis appears to be a rate limit error from the API."
-        print(f"Error in _call_llm_for_elaboration (APIStatusError): {error_message}")
-        return f"Error generating elaborated content: API Status Error {e.status_code}"
-    except openai.APIConnectionError as e:
-        error_message = f"OpenRouter API Connection Error: {e}. Network issue or server unavailable."
-    except openai.RateLimitError as e: 
-        error_message = f"OpenRouter Rate Limit Exceeded (RateLimitError exception): {e}"
-    except openai.AuthenticationError as e: 
-        error_message = f"OpenRouter Authentication Error: {e}. Check API key."
-    except openai.APIError as e: 
-        error_message = f"OpenRouter APIError ({type(e).__name__}): {e}."
-        raw_text = "N/A"
-        if hasattr(e, 'response') and e.response is not None and hasattr(e.response, 'text'):
-            try: raw_text = e.response.text
-            except Exception: raw_text = "Could not read raw response text."
-        error_message += f" Raw response: {raw_text}"
-    except json.JSONDecodeError as e: 
-        error_message = f"JSON Decode Error during LLM call ({type(e).__name__}): {e}.\n"
-        error_message += ("API server returned non-JSON response. Possible server issue or HTML error page.")
-    except Exception as e: 
-        error_message = f"An unexpected error occurred during LLM call for elaboration ({type(e).__name__}): {e}."
-        print(f"Error in _call_llm_for_elaboration (general exception): {error_message}")
-        return f"Error generating elaborated content: {str(e)}"
+    response_content = _extract_elaboration_content(chat_completion)
+    if isinstance(response_content, LLMError):
+        return response_content
+    print(f"[Content Elaboration LLM Call] Received elaborated content (length: {len(response_content)}).")
+    if response_cache:
+        response_cache.set(cache_key, response_content, ttl=ELABORATION_CACHE_TTL)
+    return response_content
 
 
-def elaborate_on_outline(original_user_query: str, information_outline: str, model_name: str = DEFAULT_ELABORATION_MODEL_NAME) -> str | None:
+async def _acall_llm_for_elaboration(messages: list[dict], model_name: str = DEFAULT_ELABORATION_MODEL_NAME) -> str | LLMError:
+    """
+    Async mirror of _call_llm_for_elaboration, sharing the same response cache.
+    """
+    async_client = _get_async_client()
+    if not async_client:
+        error_message = "OpenRouter client not initialized for elaboration. API key might be missing."
+        print(f"Error in _acall_llm_for_elaboration: {error_message}")
+        return LLMError("no_client", error_message)
+
+    response_cache = llm_cache.get_default_cache()
+    cache_key = llm_cache.make_cache_key(model_name, messages, ELABORATION_TEMPERATURE) # Also keys in-flight coalescing
+    if response_cache:
+        cached_content = response_cache.get(cache_key)
+        if cached_content is not None:
+            print(f"[Content Elaboration LLM Call] Cache hit for model: {model_name} (stats: {response_cache.stats})")
+            return cached_content
+
+    print(f"[Content Elaboration LLM Call] (async) Requesting completion from model: {model_name}")
+    try:
+        chat_completion = await _ELABORATION_FLIGHTS.ado(cache_key, _ado_create, async_client, messages, model_name)
+    except Exception as e:
+        kind, error_message = _describe_llm_exception(e)
+        print(f"Error in _acall_llm_for_elaboration ({kind}): {error_message}")
+        return LLMError(kind, error_message)
+
+    response_content = _extract_elaboration_content(chat_completion)
+    if isinstance(response_content, LLMError):
+        return response_content
+    print(f"[Content Elaboration LLM Call] (async) Received elaborated content (length: {len(response_content)}).")
+    if response_cache:
+        response_cache.set(cache_key, response_content, ttl=ELABORATION_CACHE_TTL)
+    return response_content
+
+
+def elaborate_on_outline(original_user_query: str, information_outline: str, model_name: str | None = None) -> str | None:
     """
     Takes an original user query and a factual outline (with citations) and uses an LLM
     to elaborate on the points, creating well-structured content that directly addresses the original query.
@@ -109,7 +324,8 @@ def elaborate_on_outline(original_user_query: str, information_outline: str, mod
         original_user_query: The user's initial query for context and to be directly addressed.
         information_outline: The factual outline generated by a previous LLM step,
                              expected to contain bullet points and source citations.
-        model_name: The LLM model to use for elaboration.
+        model_name: The LLM model to use for elaboration. When omitted, a model tier is
+                    picked from the outline token count (see _MODEL_TIERS).
 
     Returns:
         A string containing the elaborated content, or None/error message if failed.
@@ -118,22 +334,275 @@ def elaborate_on_outline(original_user_query: str, information_outline: str, mod
 
     if not information_outline or not information_outline.strip():
         return "No outline provided to elaborate on."
+    information_outline, model_name = _prepare_outline(information_outline, model_name)
 
-    system_prompt = (
-        f"You are an expert content writer and AI research analyst. Your primary task is to take a factual 'Brief Information Outline' (which includes source citations) and the original user query, then expand this outline into a well-structured, detailed, and coherent piece of content that **directly and comprehensively answers the original user query.** The current year is {CURRENT_YEAR}.\n\n"
-
-        "Here's what you need to do:\n"
-        "1.  **Understand the Goal:** The original user query was: \"{original_user_query}\". The provided outline is the factual, web-sourced basis for your response. Your elaborated content MUST serve as a direct answer to this original query.\n"
-        "2.  **Source of Truth:** The 'Brief Information Outline' is your primary source of facts. You MUST NOT introduce new factual claims or data points that are not supported by this outline. Your role is to elaborate, explain, connect, and structure the existing information to answer the user's query.\n"
-        "3.  **Elaborate on Outline Points:** Take each bullet point from the outline and expand on it. Provide more context, explanation, or detail where appropriate, always staying true to the information presented in the outline point and its cited source.\n"
-        "4.  **Structure for Clarity:** Organize the elaborated information logically. Use clear headings (e.g., using Markdown like `## Main Topic from Query` or `### Key Aspect`) to structure the content into sections that naturally address different facets of the original user query.\n"
-        "5.  **Integrate and Answer:** Weave the elaborated points from the outline into a narrative or explanation that directly and thoroughly answers the `Original User Query`. For example, if the user asked 'How can X be used for Y?', your elaborated content about X (based on the outline) should clearly explain its application to Y.\n"
-        "6.  **Maintain Citations (Implicitly):** The input outline already contains citations. While elaborating, you are expanding on these cited facts. You don't need to re-cite every sentence, but the elaborated content should clearly flow from the cited outline points. You can introduce sections with phrases like 'Based on information from [Source URL mentioned in outline for relevant point]...' if it adds clarity, but the main goal is a readable narrative.\n"
-        "7.  **Coherent Narrative & Flow:** Ensure the elaborated content flows well, with smooth transitions between points and sections, forming a complete answer to the user's initial question.\n"
-        "8.  **Professional Tone:** Maintain a professional, informative, and helpful tone.\n"
-        "9.  **Output Format:** Produce the output in well-formatted Markdown.\n\n"
-        "DO NOT simply repeat the outline. Your goal is to transform the factual outline points into a comprehensive, well-explained answer to the user's original query, using only the information provided in the outline."
-    )
+    semantic_cache, semantic_text, cached_elaboration = _semantic_cache_lookup(original_user_query, information_outline, model_name)
+    if cached_elaboration is not None:
+        return cached_elaboration
+
+    messages = _build_elaboration_messages(original_user_query, information_outline)
+    elaborated_content = _call_llm_for_elaboration(messages, model_name)
+    return _finalize_elaboration(elaborated_content, semantic_cache, model_name, semantic_text)
+
+
+async def elaborate_on_outline_async(original_user_query: str, information_outline: str, model_name: str | None = None) -> str | None:
+    """Async counterpart of elaborate_on_outline, used by the batch helpers."""
+    print(f"\n[Content Elaboration] (async) Elaborating on outline for query: '{original_user_query}'")
+
+    if not information_outline or not information_outline.strip():
+        return "No outline provided to elaborate on."
+    information_outline, model_name = _prepare_outline(information_outline, model_name)
+
+    semantic_cache, semantic_text, cached_elaboration = _semantic_cache_lookup(original_user_query, information_outline, model_name)
+    if cached_elaboration is not None:
+        return cached_elaboration
+
+    messages = _build_elaboration_messages(original_user_query, information_outline)
+    elaborated_content = await _acall_llm_for_elaboration(messages, model_name)
+    return _finalize_elaboration(elaborated_content, semantic_cache, model_name, semantic_text)
+
+
+def elaborate_on_outline_stream(original_user_query: str, information_outline: str, model_name: str | None = None) -> Iterator[str]:
+    """
+    Streaming variant of elaborate_on_outline: yields content chunks as the model produces them.
+    Cache hits are yielded as a single chunk. Closing the generator early (e.g. the UI navigates
+    away) closes the HTTP stream so no further tokens are generated; only complete responses are cached.
+    Errors are yielded as a single "Failed to elaborate: ..." chunk.
+    """
+    print(f"\n[Content Elaboration] (stream) Elaborating on outline for query: '{original_user_query}'")
+
+    if not information_outline or not information_outline.strip():
+        yield "No outline provided to elaborate on."
+        return
+    information_outline, model_name = _prepare_outline(information_outline, model_name)
+
+    semantic_cache, semantic_text, cached_elaboration = _semantic_cache_lookup(original_user_query, information_outline, model_name)
+    if cached_elaboration is not None:
+        yield cached_elaboration
+        return
+
+    messages = _build_elaboration_messages(original_user_query, information_outline)
+    response_cache = llm_cache.get_default_cache()
+    cache_key = llm_cache.make_cache_key(model_name, messages, ELABORATION_TEMPERATURE) if response_cache else None
+    cached_content = response_cache.get(cache_key) if response_cache else None
+    if cached_content is not None:
+        yield cached_content
+        return
+
+    client = get_client()
+    if not client:
+        yield "Failed to elaborate: OpenRouter client not initialized for elaboration. API key might be missing."
+        return
+
+    try:
+        stream = _do_create(client, messages, model_name, stream=True)
+    except Exception as e:
+        kind, error_message = _describe_llm_exception(e)
+        print(f"Error in elaborate_on_outline_stream ({kind}): {error_message}")
+        yield f"Failed to elaborate: {error_message}"
+        return
+
+    parts = []
+    completed = False
+    try:
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+        completed = True
+    except Exception as e:
+        kind, error_message = _describe_llm_exception(e)
+        print(f"Error in elaborate_on_outline_stream while streaming ({kind}): {error_message}")
+        yield f"\n\nFailed to elaborate: {error_message}"
+    finally:
+        # Runs on GeneratorExit too, so an abandoned stream stops billing tokens
+        stream.close()
+
+    elaborated_content = "".join(parts)
+    if completed and elaborated_content:
+        print(f"[Content Elaboration LLM Call] Streamed elaborated content (length: {len(elaborated_content)}).")
+        if response_cache:
+            response_cache.set(cache_key, elaborated_content, ttl=ELABORATION_CACHE_TTL)
+        if semantic_cache:
+            semantic_cache.store(model_name, semantic_text, elaborated_content)
+
+
+async def elaborate_on_outline_stream_async(original_user_query: str, information_outline: str, model_name: str | None = None) -> AsyncIterator[str]:
+    """Async counterpart of elaborate_on_outline_stream."""
+    if not information_outline or not information_outline.strip():
+        yield "No outline provided to elaborate on."
+        return
+    information_outline, model_name = _prepare_outline(information_outline, model_name)
+
+    semantic_cache, semantic_text, cached_elaboration = _semantic_cache_lookup(original_user_query, information_outline, model_name)
+    if cached_elaboration is not None:
+        yield cached_elaboration
+        return
+
+    messages = _build_elaboration_messages(original_user_query, information_outline)
+    response_cache = llm_cache.get_default_cache()
+    cache_key = llm_cache.make_cache_key(model_name, messages, ELABORATION_TEMPERATURE) if response_cache else None
+    cached_content = response_cache.get(cache_key) if response_cache else None
+    if cached_content is not None:
+        yield cached_content
+        return
+
+    async_client = _get_async_client()
+    if not async_client:
+        yield "Failed to elaborate: OpenRouter client not initialized for elaboration. API key might be missing."
+        return
+
+    try:
+        stream = await _ado_create(async_client, messages, model_name, stream=True)
+    except Exception as e:
+        kind, error_message = _describe_llm_exception(e)
+        print(f"Error in elaborate_on_outline_stream_async ({kind}): {error_message}")
+        yield f"Failed to elaborate: {error_message}"
+        return
+
+    parts = []
+    completed = False
+    try:
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield delta
+        completed = True
+    except Exception as e:
+        kind, error_message = _describe_llm_exception(e)
+        print(f"Error in elaborate_on_outline_stream_async while streaming ({kind}): {error_message}")
+        yield f"\n\nFailed to elaborate: {error_message}"
+    finally:
+        await stream.close()
+
+    elaborated_content = "".join(parts)
+    if completed and elaborated_content:
+        if response_cache:
+            response_cache.set(cache_key, elaborated_content, ttl=ELABORATION_CACHE_TTL)
+        if semantic_cache:
+            semantic_cache.store(model_name, semantic_text, elaborated_content)
+
+
+async def elaborate_batch(items: list[tuple[str, str]], concurrency: int = 8, model_name: str | None = None) -> list:
+    """
+    Elaborates several (original_user_query, information_outline) pairs concurrently,
+    keeping at most `concurrency` requests in flight against OpenRouter.
+    Results are returned in input order; failed items are returned as the raised exception.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(query: str, outline: str):
+        async with sem:
+            return await elaborate_on_outline_async(query, outline, model_name)
+
+    tasks = [_one(query, outline) for query, outline in items]
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def elaborate_on_outlines_batch(queries_and_outlines: list[tuple[str, str]], concurrency: int = 8, model_name: str | None = None) -> list:
+    """Synchronous entry point for elaborate_batch."""
+    return asyncio.run(elaborate_batch(queries_and_outlines, concurrency=concurrency, model_name=model_name))
+
+
+def _select_elaboration_model(information_outline: str, model_name: str | None = None, outline_tokens: int | None = None) -> str:
+    """An explicit model always wins; otherwise route by outline token count. Outlines with code blocks skip the small tier."""
+    if model_name:
+        return model_name
+    if outline_tokens is None:
+        outline_tokens = llm_tokens.count_tokens(information_outline)
+    tiers = _MODEL_TIERS[1:] if "```" in information_outline else _MODEL_TIERS
+    return next(model for limit, model in tiers if outline_tokens < limit)
+
+
+def _prepare_outline(information_outline: str, model_name: str | None = None) -> tuple[str, str]:
+    """Counts the outline's tokens once, trims it to ELABORATION_MAX_OUTLINE_TOKENS and picks the model tier."""
+    outline_tokens = llm_tokens.count_tokens(information_outline)
+    if outline_tokens > ELABORATION_MAX_OUTLINE_TOKENS:
+        information_outline, outline_tokens = _trim_outline_to_budget(information_outline, ELABORATION_MAX_OUTLINE_TOKENS)
+    return information_outline, _select_elaboration_model(information_outline, model_name, outline_tokens)
+
+
+def _trim_outline_to_budget(outline: str, max_tokens: int) -> tuple[str, int]:
+    """
+    Drops bullets until the outline fits max_tokens. Bullets citing a domain that another kept
+    bullet already covers go first, longest first; then the longest remaining bullets.
+    Non-bullet lines (headings, notes) are always kept.
+    """
+    lines = outline.splitlines()
+    line_tokens = [llm_tokens.count_tokens(line) + 1 for line in lines] # +1 for the newline
+    total_tokens = sum(line_tokens)
+
+    domain_counts = {}
+    bullet_domains = {}
+    for i, line in enumerate(lines):
+        if not line.lstrip().startswith('- '):
+            continue
+        urls = _URL_RE.findall(line)
+        domain = urlparse(urls[0]).netloc.lower() if urls else None
+        bullet_domains[i] = domain
+        if domain:
+            domain_counts[domain] = domain_counts.get(domain, 0) + 1
+
+    def _drop_priority(i):
+        domain = bullet_domains[i]
+        return (domain_counts.get(domain, 0) > 1, line_tokens[i])
+
+    dropped = set()
+    for i in sorted(bullet_domains, key=_drop_priority, reverse=True):
+        if total_tokens <= max_tokens:
+            break
+        dropped.add(i)
+        total_tokens -= line_tokens[i]
+        domain = bullet_domains[i]
+        if domain:
+            domain_counts[domain] -= 1
+
+    print(f"[Content Elaboration] Outline over {max_tokens} tokens; dropped {len(dropped)} bullet(s).")
+    trimmed = "\n".join(line for i, line in enumerate(lines) if i not in dropped)
+    return trimmed, llm_tokens.count_tokens(trimmed)
+
+
+_URL_RE = re.compile(r'https?://[^\s)\]]+')
+_BLANK_LINES_RE = re.compile(r'\n{3,}')
+_INLINE_WS_RE = re.compile(r'[ \t]+')
+
+
+def _compact_outline(outline: str) -> str:
+    """
+    Shrinks the outline before it is sent: collapses whitespace runs, drops repeated bullets
+    (compared without their citation), and swaps URLs cited more than once for short [S1]-style
+    tokens with a legend at the end.
+    """
+    compacted_lines = []
+    seen_bullets = set()
+    for line in outline.splitlines():
+        line = _INLINE_WS_RE.sub(' ', line).rstrip()
+        if line.lstrip().startswith('- '):
+            bullet_key = line.split("(Source:")[0].strip().lower()
+            if bullet_key in seen_bullets:
+                continue
+            seen_bullets.add(bullet_key)
+        compacted_lines.append(line)
+    compacted = _BLANK_LINES_RE.sub('\n\n', '\n'.join(compacted_lines)).strip()
+
+    url_counts = {}
+    for url in _URL_RE.findall(compacted):
+        url_counts[url] = url_counts.get(url, 0) + 1
+    repeated_urls = [url for url, count in url_counts.items() if count > 1]
+    if not repeated_urls:
+        return compacted
+
+    url_tokens = {url: f"[S{i}]" for i, url in enumerate(repeated_urls, start=1)}
+    compacted = _URL_RE.sub(lambda m: url_tokens.get(m.group(0), m.group(0)), compacted)
+    legend = "\n".join(f"{token} {url}" for url, token in url_tokens.items())
+    return f"{compacted}\n\nSource legend:\n{legend}"
+
+
+def _build_elaboration_messages(original_user_query: str, information_outline: str) -> list[dict]:
+    information_outline = _compact_outline(information_outline)
+    system_prompt = _SYSTEM_PROMPT_TEMPLATE.format(year=current_year(), query=original_user_query)
 
     user_prompt_for_elaboration = (
         f"Original User Query to address: \"{original_user_query}\"\n\n"
@@ -144,24 +613,39 @@ def elaborate_on_outline(original_user_query: str, information_outline: str, mod
         "Please elaborate on the points in the outline above to create a detailed and well-structured piece of content that directly and comprehensively answers my original query. Use appropriate headings and ensure all information is based strictly on the provided outline."
     )
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt_for_elaboration}
     ]
 
-    elaborated_content = _call_llm_for_elaboration(messages, model_name)
-    
-    if elaborated_content and "Error:" in elaborated_content[:20]: # Basic check if _call_llm returned an error string
-        return f"Failed to elaborate: {elaborated_content}"
+
+def _semantic_cache_lookup(original_user_query: str, information_outline: str, model_name: str):
+    """Paraphrased queries with near-identical outlines are served from the semantic cache."""
+    semantic_cache = llm_cache.get_semantic_cache("elaboration", threshold=ELABORATION_SEMANTIC_THRESHOLD, ttl=ELABORATION_CACHE_TTL)
+    semantic_text = f"{original_user_query}\n{information_outline}"
+    cached_elaboration = None
+    if semantic_cache:
+        cached_elaboration = semantic_cache.lookup(model_name, semantic_text)
+        if cached_elaboration is not None:
+            print(f"[Content Elaboration] Semantic cache hit (stats: {semantic_cache.stats})")
+    return semantic_cache, semantic_text, cached_elaboration
+
+
+def _finalize_elaboration(elaborated_content: str | LLMError, semantic_cache, model_name: str, semantic_text: str) -> str | None:
+    if isinstance(elaborated_content, LLMError):
+        return f"Failed to elaborate: {elaborated_content.message}"
+
+    if semantic_cache and elaborated_content:
+        semantic_cache.store(model_name, semantic_text, elaborated_content)
 
     return elaborated_content
 
 if __name__ == '__main__':
-    print(f"--- Testing Content Elaboration Module (V2 - Query Focused, Current Year: {CURRENT_YEAR}) ---")
+    print(f"--- Testing Content Elaboration Module (V2 - Query Focused, Current Year: {current_year()}) ---")
     test_model_name = os.environ.get("ELABORATION_MODEL_NAME", DEFAULT_ELABORATION_MODEL_NAME)
     print(f"Using model for elaboration tests: {test_model_name}")
 
-    if not CLIENT:
+    if not get_client():
         print("Cannot run tests: OpenRouter client not initialized. Is OPENROUTER_API_KEY set?")
     else:
         sample_original_query = "How can Model Context Protocol (MCP) be used to generate PDF reports, and what are its key features?"
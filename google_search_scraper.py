@@ -3,19 +3,50 @@ import os
 import time
 import json
 import random
-from urllib.parse import urlparse, quote_plus
+import functools
+import types
+import threading
+import queue
+import atexit
+from collections import OrderedDict, defaultdict
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode, quote_plus
 from datetime import datetime, timedelta, timezone 
 from dotenv import load_dotenv
 from newspaper import Article, ArticleException, Config as NewspaperConfig
-from bs4 import BeautifulSoup
+import lxml.html
+import lxml.etree
 import logging
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
-from collections import Counter
-
-# Google API Client
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+import asyncio
+import heapq
+from operator import itemgetter
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# selectolax (Optional): lexbor-backed parser, much faster than lxml for the fallback extractor's text extraction
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxHTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
+
+# ciso8601 (Optional): C ISO-8601 parser for publish dates; falls back to datetime.fromisoformat
+try:
+    import ciso8601
+    CISO8601_AVAILABLE = True
+except ImportError:
+    CISO8601_AVAILABLE = False
+
+# aiohttp (Optional): lets page downloads overlap; without it pages are fetched on a thread pool via requests
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
 
 # Custom extractors dictionary (empty by default)
 CUSTOM_EXTRACTORS = {}
@@ -60,30 +91,47 @@ load_dotenv()
 RESULTS_PER_API_CALL = int(os.getenv('RESULTS_PER_API_CALL_GOOGLE', 5)) 
 TOTAL_URLS_TO_PROCESS_LIMIT = int(os.getenv('TOTAL_URLS_TO_PROCESS_LIMIT_GOOGLE', 10)) 
 MIN_CONTENT_LENGTH = int(os.getenv('MIN_CONTENT_LENGTH', 250)) 
-MAX_API_RETRIES = 2 
-BACKOFF_FACTOR_API = 3 
 MAX_HTML_RETRIES = 2 
 BACKOFF_FACTOR_HTML = 1
-
-TRUSTED_DOMAINS_GENERAL = os.getenv(
+MAX_RETRY_AFTER_SECONDS = 10 # Longer Retry-After waits are not worth holding a fetch slot for
+SELENIUM_POOL_SIZE = int(os.getenv('SELENIUM_POOL_SIZE', 2))
+MAX_CONCURRENT_FETCHES = int(os.getenv('MAX_CONCURRENT_FETCHES', 16))
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', 4))
+PARSE_PROCESSES = int(os.getenv('PARSE_PROCESSES', 0)) # >0: parse pages in this many worker processes instead of GIL-bound threads
+MAX_FETCHES_PER_HOST = int(os.getenv('MAX_FETCHES_PER_HOST', 2))
+HTML_CACHE_MAX_ENTRIES = 512
+MAX_HTML_BYTES = int(os.getenv('MAX_HTML_BYTES', 2_000_000)) # Bodies are truncated here; article text sits well within it
+HTML_CACHE_TTL_SECONDS = int(os.getenv('HTML_CACHE_TTL_SECONDS', 600))
+
+def _domain_set(csv: str) -> frozenset[str]:
+    return frozenset(domain.strip() for domain in csv.split(',') if domain.strip())
+
+TRUSTED_DOMAINS_GENERAL = _domain_set(os.getenv(
     'TRUSTED_DOMAINS_GENERAL',
     'wikipedia.org,reuters.com,apnews.com,bbc.com,nytimes.com,wsj.com,forbes.com,bloomberg.com,techcrunch.com,theverge.com,wired.com,arstechnica.com,instagram.com,facebook.com,twitter.com,linkedin.com,reddit.com,medium.com,github.com,stackoverflow.com,youtube.com'
-).split(',') 
-TRUSTED_DOMAINS_IPL = os.getenv(
+))
+TRUSTED_DOMAINS_IPL = _domain_set(os.getenv(
     'TRUSTED_DOMAINS_IPL',
     'espncricinfo.com,cricbuzz.com,indiatimes.com,timesofindia.indiatimes.com,'
     'ndtv.com/sport,hindustantimes.com/cricket,bcci.tv,cricketworld.com,'
     'sportskeeda.com/cricket,news18.com/cricket,indianexpress.com/sports/cricket,thehindu.com/sport/cricket,sportstar.thehindu.com,iplt20.com'
-).split(',')
-TRUSTED_DOMAINS_LUCKNOW = os.getenv(
+))
+TRUSTED_DOMAINS_LUCKNOW = _domain_set(os.getenv(
     'TRUSTED_DOMAINS_LUCKNOW',
     'timesofindia.indiatimes.com,cities.hindustantimes.com,indianexpress.com,amarujala.com,jagran.com,news18.com,ndtv.com,thehindu.com,dainikbhaskar.com,patrika.com,allevents.in,bookmyshow.com'
-).split(',') 
+))
+# Sites that only render their content with JavaScript; other domains skip the (slow) Selenium fallback
+# unless the response looks like a bot-challenge page
+SELENIUM_DOMAINS = _domain_set(os.getenv(
+    'SELENIUM_DOMAINS',
+    'instagram.com,facebook.com,twitter.com,x.com,linkedin.com,allevents.in,bookmyshow.com'
+))
 
 
 # Google API Configuration
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 CUSTOM_SEARCH_ENGINE_ID = os.getenv("CUSTOM_SEARCH_ENGINE_ID")
+GOOGLE_CSE_URL = "https://www.googleapis.com/customsearch/v1" # Called directly; no discovery document or service build per query
 
 # newspaper3k Configuration
 NP_CONFIG = NewspaperConfig()
@@ -92,70 +140,467 @@ NP_CONFIG.request_timeout = 20
 NP_CONFIG.fetch_images = False
 NP_CONFIG.memoize_articles = False
 NP_CONFIG.verbose = False 
+NP_CONFIG.language = 'en' # Pinned so newspaper3k skips per-article language detection
+NP_CONFIG.keep_article_html = False
+NP_CONFIG.follow_meta_refresh = False # HTML is fetched by us; newspaper3k never downloads
+
+# Fallback extractor: the page is parsed once with lxml and searched with precompiled XPath
+_WS_RE = re.compile(r'\s+')
+_FALLBACK_JUNK_TAGS = ('script', 'style', 'nav', 'footer', 'aside', 'header', 'form', 'button', 'input', 'img', 'figure', 'figcaption', 'iframe', 'link', 'meta')
+
+def _class_xpath(class_name: str) -> str:
+    return f'//*[contains(concat(" ", normalize-space(@class), " "), " {class_name} ")]'
+
+# Class/id based junk (sidebars, ads, cookie banners), matched in a single XPath union
+_FALLBACK_JUNK_SELECTOR = '.sidebar, #sidebar, .ad, .advertisement, .cookie-banner'
+_FALLBACK_JUNK_XPATH = lxml.etree.XPath(' | '.join([
+    _class_xpath('sidebar'), '//*[@id="sidebar"]', _class_xpath('ad'), _class_xpath('advertisement'), _class_xpath('cookie-banner'),
+]))
+
+# (CSS selector, equivalent XPath) for likely main-content containers
+_MAIN_CONTENT_SELECTORS = [
+    ('article[class*="content"]', '//article[contains(@class, "content")]'),
+    ('div[class*="content"]', '//div[contains(@class, "content")]'),
+    ('article[id*="content"]', '//article[contains(@id, "content")]'),
+    ('div[id*="content"]', '//div[contains(@id, "content")]'),
+    ('article', '//article'),
+    ('main', '//main'),
+    ('.main-content', _class_xpath('main-content')),
+    ('#main', '//*[@id="main"]'),
+    ('.post-body', _class_xpath('post-body')),
+    ('.entry-content', _class_xpath('entry-content')),
+    ('.td-post-content', _class_xpath('td-post-content')),
+    ('.story-content', _class_xpath('story-content')),
+    ('[role="main"]', '//*[@role="main"]'),
+    ('.article-body', _class_xpath('article-body')),
+    ('.articleBody', _class_xpath('articleBody')),
+]
+# Combined into one selector/XPath union so the tree is walked once; the first match in document order wins
+_MAIN_CONTENT_SELECTOR = ', '.join(selector for selector, _ in _MAIN_CONTENT_SELECTORS)
+_MAIN_CONTENT_XPATH = lxml.etree.XPath(' | '.join(xpath for _, xpath in _MAIN_CONTENT_SELECTORS))
+
+class _CappedRetryAfter(Retry):
+    """Retry that ignores Retry-After waits above MAX_RETRY_AFTER_SECONDS and uses normal backoff instead, like the async path."""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is not None and retry_after > MAX_RETRY_AFTER_SECONDS:
+            return None
+        return retry_after
+
+# One pooled Session for every page fetch so keep-alive sockets (and TLS sessions) are reused across URLs on the same host.
+# urllib3's Retry handles transient failures with exponential backoff.
+def _build_http_session() -> requests.Session:
+    session = requests.Session()
+    retry = _CappedRetryAfter(total=MAX_HTML_RETRIES, backoff_factor=BACKOFF_FACTOR_HTML,
+                              status_forcelist=[429, 500, 502, 503, 504], allowed_methods=frozenset(['GET', 'HEAD']),
+                              respect_retry_after_header=True, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+_HTTP_SESSION = _build_http_session()
 
 
 def get_random_user_agent():
     return random.choice(USER_AGENT_LIST)
 
+# In-process page cache: refined queries often return the same URLs, so a page is downloaded once per run
+_HTML_CACHE = OrderedDict() # canonical url -> (fetched_at, html)
+_HTML_CACHE_LOCK = threading.Lock()
+
+_TRACKING_PARAM_PREFIXES = ('utm_', 'mc_')
+_TRACKING_PARAMS = frozenset({'fbclid', 'gclid', 'dclid', 'msclkid', 'igshid', 'ref', 'ref_src', 'ref_url'})
+
+def canonicalize_url(url: str) -> str:
+    """
+    Dedup key for a URL: drops the scheme, fragment, tracking parameters and a leading 'www.',
+    lowercases the host and trims trailing slashes, so variants of one page collapse together.
+    """
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    host = host[4:] if host.startswith('www.') else host
+    query = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+             if k.lower() not in _TRACKING_PARAMS and not k.lower().startswith(_TRACKING_PARAM_PREFIXES)]
+    return urlunparse(('', host, parsed.path.rstrip('/') or '/', parsed.params, urlencode(query), ''))
+
+def _html_cache_get(url: str) -> str | None:
+    key = canonicalize_url(url)
+    with _HTML_CACHE_LOCK:
+        entry = _HTML_CACHE.get(key)
+        if entry is None:
+            return None
+        fetched_at, html_content = entry
+        if time.monotonic() - fetched_at > HTML_CACHE_TTL_SECONDS:
+            del _HTML_CACHE[key]
+            return None
+        _HTML_CACHE.move_to_end(key)
+        return html_content
+
+def _html_cache_put(url: str, html_content: str) -> None:
+    if not html_content:
+        return
+    key = canonicalize_url(url)
+    with _HTML_CACHE_LOCK:
+        _HTML_CACHE[key] = (time.monotonic(), html_content)
+        _HTML_CACHE.move_to_end(key)
+        while len(_HTML_CACHE) > HTML_CACHE_MAX_ENTRIES:
+            _HTML_CACHE.popitem(last=False)
+
+def clear_html_cache() -> None:
+    with _HTML_CACHE_LOCK:
+        _HTML_CACHE.clear()
+
+
+# One frozen header set per User-Agent, built once; fetches pick one at random instead of building a dict per request
+_HEADER_TEMPLATES = tuple(types.MappingProxyType({
+    'User-Agent': user_agent,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5', 'Referer': 'https://www.google.com/',
+    'DNT': '1', 'Upgrade-Insecure-Requests': '1'
+}) for user_agent in USER_AGENT_LIST)
+
+def _request_headers():
+    return _HEADER_TEMPLATES[random.randrange(len(_HEADER_TEMPLATES))]
+
+def _is_html_content_type(content_type: str | None) -> bool:
+    return not content_type or 'html' in content_type.lower() # A missing header is given the benefit of the doubt
+
+def _decode_html(body: bytes, encoding: str | None) -> str:
+    try:
+        return body[:MAX_HTML_BYTES].decode(encoding or 'utf-8', 'replace')
+    except LookupError: # Server advertised a charset Python does not know
+        return body[:MAX_HTML_BYTES].decode('utf-8', 'replace')
+
+_SMALL_PAGE_CHARS = 1024 # Bodies this small are usually a JS shell or an interstitial, not an article
+_CHALLENGE_MARKERS = (b'cf-browser-verification', b'challenge-platform', b'cf-chl', b'captcha-delivery')
+
+def _needs_browser(url: str, body: bytes) -> bool:
+    """Selenium only helps for JS-rendered domains or bot-challenge pages; plain 403/429s fail in Chrome too."""
+    host = urlparse(url).netloc.lower()
+    host = host[4:] if host.startswith('www.') else host
+    if host in SELENIUM_DOMAINS or any(host.endswith('.' + d) for d in SELENIUM_DOMAINS):
+        return True
+    return any(marker in body for marker in _CHALLENGE_MARKERS)
+
+# Per-host caps so a batch dominated by one site does not open MAX_CONCURRENT_FETCHES sockets to it at once
+_HOST_SEMAPHORES = {}
+_HOST_SEMAPHORES_LOCK = threading.Lock()
+
+def _host_key(url: str) -> str:
+    return urlparse(url).netloc.lower().removeprefix('www.')
+
+def _host_semaphore(url: str) -> threading.BoundedSemaphore:
+    host = _host_key(url)
+    with _HOST_SEMAPHORES_LOCK:
+        semaphore = _HOST_SEMAPHORES.get(host)
+        if semaphore is None:
+            semaphore = _HOST_SEMAPHORES[host] = threading.BoundedSemaphore(MAX_FETCHES_PER_HOST)
+        return semaphore
+
 def get_html_with_headers(url: str) -> str:
+    cached_html = _html_cache_get(url)
+    if cached_html is not None:
+        logger.info(f"[HTML Fetch] Cache hit for {url}")
+        return cached_html
     logger.info(f"[HTML Fetch] Attempting to fetch: {url}")
     html_content = ''
-    session = requests.Session()
-    headers = {
-        'User-Agent': get_random_user_agent(),
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5', 'Referer': 'https://www.google.com/',
-        'DNT': '1', 'Upgrade-Insecure-Requests': '1'
-    }
+    probe_body = b''
     try:
-        for attempt in range(MAX_HTML_RETRIES):
-            try:
-                resp = session.get(url, headers=headers, timeout=15) 
-                resp.raise_for_status()
-                html_content = resp.text
-                logger.info(f"  [HTML Fetch] Successfully fetched with requests from {url}")
-                return html_content
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"  [HTML Fetch] Requests attempt {attempt+1} failed for {url}: {e}")
-                if attempt < MAX_HTML_RETRIES - 1:
-                    time.sleep(BACKOFF_FACTOR_HTML * (2**attempt))
-                else: 
-                    logger.error(f"  [HTML Fetch] Requests failed after {MAX_HTML_RETRIES} attempts for {url}.")
+        with _host_semaphore(url), _HTTP_SESSION.get(url, headers=_request_headers(), timeout=15, stream=True) as resp:
+            if resp.status_code >= 400:
+                probe_body = next(resp.iter_content(16384), b'') # Kept to spot challenge pages
+            resp.raise_for_status()
+            if not _is_html_content_type(resp.headers.get('Content-Type')):
+                logger.info(f"  [HTML Fetch] Skipping non-HTML response ({resp.headers.get('Content-Type')}) from {url}")
+                return ''
+            chunks, total_bytes = [], 0
+            for chunk in resp.iter_content(65536):
+                chunks.append(chunk)
+                total_bytes += len(chunk)
+                if total_bytes >= MAX_HTML_BYTES:
+                    logger.info(f"  [HTML Fetch] Truncated {url} at {MAX_HTML_BYTES} bytes")
+                    break
+            html_content = _decode_html(b''.join(chunks), resp.encoding)
+        logger.info(f"  [HTML Fetch] Successfully fetched with requests from {url}")
+        if len(html_content) >= _SMALL_PAGE_CHARS or not (SELENIUM_ENABLED and _needs_browser(url, html_content.encode())):
+            _html_cache_put(url, html_content)
+            return html_content
+        probe_body = html_content.encode()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"  [HTML Fetch] Requests failed after {MAX_HTML_RETRIES} retries for {url}: {e}")
     except Exception as e: 
         logger.error(f"  [HTML Fetch] Unexpected error during requests for {url}: {e}")
 
-    if not html_content and SELENIUM_ENABLED:
-        logger.info(f"  [HTML Fetch] Falling back to Selenium for {url}")
-        driver = None # Initialize driver to None for the finally block
-        try:
-            if SELENIUM_DRIVER_PATH:
-                service = ChromeService(executable_path=SELENIUM_DRIVER_PATH)
-                driver = webdriver.Chrome(service=service, options=CHROME_OPTIONS)
-            else: 
-                driver = webdriver.Chrome(options=CHROME_OPTIONS)
-            
-            driver.set_page_load_timeout(30) 
-            driver.get(url)
-            time.sleep(random.uniform(3,5)) 
-            html_content = driver.page_source
-            logger.info(f"  [HTML Fetch] Successfully fetched with Selenium from {url} (Length: {len(html_content)})")
-        except WebDriverException as e:
-            logger.error(f"  [HTML Fetch] Selenium WebDriverException for {url}: {e}")
-        except Exception as e: 
-            logger.error(f"  [HTML Fetch] Unexpected Selenium error for {url}: {e}")
-        finally:
-            if driver is not None: # Check if driver was initialized
-                driver.quit()
+    if SELENIUM_ENABLED and _needs_browser(url, probe_body):
+        html_content = get_html_with_selenium(url) or html_content
+        _html_cache_put(url, html_content)
+    elif SELENIUM_ENABLED and not html_content:
+        logger.info(f"  [HTML Fetch] Skipping Selenium for {url}: not a JS-rendered domain and no challenge page detected")
     
     if not html_content:
         logger.error(f"  [HTML Fetch] Failed to fetch HTML content for {url} after all attempts.")
     return html_content
 
 
+# Reusable headless Chrome instances: launching Chrome costs seconds, so drivers are created lazily
+# (at most SELENIUM_POOL_SIZE) and handed back to the pool after each page
+_DRIVER_POOL = queue.Queue()
+_DRIVER_POOL_LOCK = threading.Lock()
+_LIVE_DRIVERS = set()
+
+def _new_driver():
+    if SELENIUM_DRIVER_PATH:
+        service = ChromeService(executable_path=SELENIUM_DRIVER_PATH)
+        driver = webdriver.Chrome(service=service, options=CHROME_OPTIONS)
+    else: 
+        driver = webdriver.Chrome(options=CHROME_OPTIONS)
+    driver.set_page_load_timeout(30) 
+    return driver
+
+def _acquire_driver():
+    try:
+        return _DRIVER_POOL.get_nowait()
+    except queue.Empty:
+        pass
+    with _DRIVER_POOL_LOCK:
+        if len(_LIVE_DRIVERS) < SELENIUM_POOL_SIZE:
+            driver = _new_driver()
+            _LIVE_DRIVERS.add(driver)
+            return driver
+    return _DRIVER_POOL.get(timeout=60) # Pool is full: wait for another fetch to hand its driver back
+
+def _release_driver(driver, healthy: bool) -> None:
+    if healthy:
+        try:
+            driver.delete_all_cookies()
+            _DRIVER_POOL.put(driver)
+            return
+        except Exception as e:
+            logger.warning(f"  [HTML Fetch] Could not reset Selenium driver, discarding it: {e}")
+    with _DRIVER_POOL_LOCK:
+        _LIVE_DRIVERS.discard(driver)
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+def _shutdown_driver_pool() -> None:
+    with _DRIVER_POOL_LOCK:
+        drivers = list(_LIVE_DRIVERS)
+        _LIVE_DRIVERS.clear()
+    for driver in drivers:
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+atexit.register(_shutdown_driver_pool)
+
+
+def get_html_with_selenium(url: str) -> str:
+    """Renders the page in a pooled headless Chrome; last-resort fallback when a plain HTTP fetch fails."""
+    logger.info(f"  [HTML Fetch] Falling back to Selenium for {url}")
+    html_content = ''
+    driver = None # Initialize driver to None for the finally block
+    healthy = True
+    try:
+        driver = _acquire_driver()
+        driver.get(url)
+        time.sleep(random.uniform(3,5)) 
+        html_content = driver.page_source[:MAX_HTML_BYTES]
+        logger.info(f"  [HTML Fetch] Successfully fetched with Selenium from {url} (Length: {len(html_content)})")
+    except WebDriverException as e:
+        healthy = False # A crashed or wedged browser is replaced rather than reused
+        logger.error(f"  [HTML Fetch] Selenium WebDriverException for {url}: {e}")
+    except Exception as e: 
+        logger.error(f"  [HTML Fetch] Unexpected Selenium error for {url}: {e}")
+    finally:
+        if driver is not None: # Check if driver was initialized
+            _release_driver(driver, healthy)
+    return html_content
+
+
+def _retry_after_seconds(header_value: str | None) -> float | None:
+    """Delay requested by a 429's Retry-After header (seconds form only), or None if absent or too long to wait."""
+    try:
+        delay = float(header_value)
+    except (TypeError, ValueError):
+        return None
+    return delay if 0 <= delay <= MAX_RETRY_AFTER_SECONDS else None
+
+async def _fetch_html_async(session, url: str, semaphore: asyncio.Semaphore, pool: ThreadPoolExecutor) -> str:
+    """aiohttp download bounded by the semaphore; falls back to Selenium on the thread pool if it fails."""
+    cached_html = _html_cache_get(url)
+    if cached_html is not None:
+        logger.info(f"[HTML Fetch] (async) Cache hit for {url}")
+        return cached_html
+    html_content = ''
+    probe_body = b''
+    async with semaphore:
+        logger.info(f"[HTML Fetch] (async) Attempting to fetch: {url}")
+        try:
+            for attempt in range(MAX_HTML_RETRIES + 1):
+                async with session.get(url, headers=_request_headers(), timeout=aiohttp.ClientTimeout(total=15)) as resp:
+                    retry_after = _retry_after_seconds(resp.headers.get('Retry-After')) if resp.status == 429 else None
+                    if retry_after is None or attempt == MAX_HTML_RETRIES:
+                        if resp.status >= 400:
+                            probe_body = await resp.content.read(16384) # Kept to spot challenge pages
+                        resp.raise_for_status()
+                        if not _is_html_content_type(resp.headers.get('Content-Type')):
+                            logger.info(f"  [HTML Fetch] (async) Skipping non-HTML response ({resp.headers.get('Content-Type')}) from {url}")
+                            return ''
+                        chunks, total_bytes = [], 0
+                        async for chunk in resp.content.iter_chunked(65536):
+                            chunks.append(chunk)
+                            total_bytes += len(chunk)
+                            if total_bytes >= MAX_HTML_BYTES:
+                                logger.info(f"  [HTML Fetch] (async) Truncated {url} at {MAX_HTML_BYTES} bytes")
+                                break
+                        html_content = _decode_html(b''.join(chunks), resp.charset)
+                        if len(html_content) < _SMALL_PAGE_CHARS:
+                            probe_body = html_content.encode()
+                        logger.info(f"  [HTML Fetch] (async) Successfully fetched from {url}")
+                        break
+                logger.info(f"  [HTML Fetch] (async) Rate limited by {url}; retrying in {retry_after:.1f}s")
+                await asyncio.sleep(retry_after)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"  [HTML Fetch] (async) Request failed for {url}: {e}")
+        except Exception as e:
+            logger.error(f"  [HTML Fetch] (async) Unexpected error for {url}: {e}")
+
+    if len(html_content) < _SMALL_PAGE_CHARS and SELENIUM_ENABLED and _needs_browser(url, probe_body):
+        html_content = await asyncio.get_running_loop().run_in_executor(pool, get_html_with_selenium, url) or html_content
+    elif SELENIUM_ENABLED and not html_content:
+        logger.info(f"  [HTML Fetch] Skipping Selenium for {url}: not a JS-rendered domain and no challenge page detected")
+    _html_cache_put(url, html_content)
+    if not html_content:
+        logger.error(f"  [HTML Fetch] Failed to fetch HTML content for {url} after all attempts.")
+    return html_content
+
+
+# Parse worker processes are started on first use and kept for the life of the process (rebuilt after a fork
+# or if a worker dies), so the cost of spawning them and importing newspaper3k/lxml is paid once
+_PARSE_PROCESS_POOL = {"pid": None, "pool": None}
+_PARSE_PROCESS_POOL_LOCK = threading.Lock()
+
+def _parse_process_pool() -> ProcessPoolExecutor | None:
+    if PARSE_PROCESSES <= 0:
+        return None
+    pid = os.getpid()
+    with _PARSE_PROCESS_POOL_LOCK:
+        if _PARSE_PROCESS_POOL["pid"] != pid:
+            _PARSE_PROCESS_POOL["pool"] = ProcessPoolExecutor(max_workers=PARSE_PROCESSES)
+            _PARSE_PROCESS_POOL["pid"] = pid
+        return _PARSE_PROCESS_POOL["pool"]
+
+def _discard_parse_process_pool(broken_pool: ProcessPoolExecutor) -> None:
+    with _PARSE_PROCESS_POOL_LOCK:
+        if _PARSE_PROCESS_POOL["pool"] is broken_pool:
+            _PARSE_PROCESS_POOL["pid"] = None
+    broken_pool.shutdown(wait=False)
+
+def _shutdown_parse_process_pool() -> None:
+    with _PARSE_PROCESS_POOL_LOCK:
+        pool = _PARSE_PROCESS_POOL["pool"] if _PARSE_PROCESS_POOL["pid"] == os.getpid() else None
+        _PARSE_PROCESS_POOL["pid"] = _PARSE_PROCESS_POOL["pool"] = None
+    if pool:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+atexit.register(_shutdown_parse_process_pool)
+
+async def _parse_article_html_async(url_info: dict, html_content: str, thread_pool: ThreadPoolExecutor) -> dict:
+    """parse_article_html off the event loop: in a worker process when PARSE_PROCESSES is set, otherwise on the thread pool."""
+    loop = asyncio.get_running_loop()
+    process_pool = _parse_process_pool()
+    if process_pool is not None:
+        try:
+            return await loop.run_in_executor(process_pool, parse_article_html, url_info, html_content)
+        except BrokenProcessPool:
+            logger.warning("[Extractor] Parse worker process died; rebuilding the pool and parsing on a thread instead.")
+            _discard_parse_process_pool(process_pool)
+    return await loop.run_in_executor(thread_pool, parse_article_html, url_info, html_content)
+
+async def _extract_articles_async(urls_info_list: list[dict]) -> list[dict]:
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+    # Taken before the global semaphore, so URLs queued behind a busy host do not hold slots other hosts could use
+    host_semaphores = defaultdict(lambda: asyncio.Semaphore(MAX_FETCHES_PER_HOST))
+    connector = aiohttp.TCPConnector(limit=32, ttl_dns_cache=300, keepalive_timeout=30)
+
+    with ThreadPoolExecutor(max_workers=PARSE_WORKERS) as pool:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            async def _one(url_info: dict) -> dict:
+                url = url_info.get('url', 'N/A')
+                async with host_semaphores[_host_key(url)]:
+                    html_content = await _fetch_html_async(session, url, semaphore, pool)
+                # newspaper3k/lxml/selectolax parsing is CPU-bound, keep it off the event loop
+                return await _parse_article_html_async(url_info, html_content, pool)
+
+            return await asyncio.gather(*(_one(url_info) for url_info in urls_info_list))
+
+
+def _unique_urls_info(urls_info_list: list[dict]) -> list[dict]:
+    # Concurrent duplicates would all miss the HTML cache and be fetched in parallel, so collapse them first
+    seen_urls = set()
+    unique_urls_info = []
+    for url_info in urls_info_list:
+        url_key = canonicalize_url(url_info.get('url', 'N/A'))
+        if url_key not in seen_urls:
+            seen_urls.add(url_key)
+            unique_urls_info.append(url_info)
+    return unique_urls_info
+
+def _extract_articles_threaded(urls_info_list: list[dict]) -> list[dict]:
+    # Page fetches inside extract_article_content are further capped per host by _host_semaphore
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_FETCHES, len(urls_info_list))) as pool:
+        return list(pool.map(extract_article_content, urls_info_list))
+
+def extract_articles_concurrently(urls_info_list: list[dict]) -> list[dict]:
+    """
+    Downloads and parses all URLs with overlapping I/O, preserving input order. Entries whose URLs
+    canonicalize to the same page are extracted once (the first occurrence is kept).
+    Uses aiohttp when installed, otherwise a thread pool over extract_article_content.
+    """
+    urls_info_list = _unique_urls_info(urls_info_list)
+    if not urls_info_list:
+        return []
+    if AIOHTTP_AVAILABLE:
+        return asyncio.run(_extract_articles_async(urls_info_list))
+    return _extract_articles_threaded(urls_info_list)
+
+async def extract_articles_concurrently_async(urls_info_list: list[dict]) -> list[dict]:
+    """extract_articles_concurrently for callers already inside an event loop."""
+    urls_info_list = _unique_urls_info(urls_info_list)
+    if not urls_info_list:
+        return []
+    if AIOHTTP_AVAILABLE:
+        return await _extract_articles_async(urls_info_list)
+    return await asyncio.to_thread(_extract_articles_threaded, urls_info_list)
+
+
+@functools.lru_cache(maxsize=1)
+def _year_strings(day_ordinal: int) -> tuple[str, str]:
+    year = datetime.now().year
+    return str(year), str(year - 1)
+
+def _current_year_strings() -> tuple[str, str]:
+    """(current year, previous year) as strings, recomputed at most once per day so long-running processes roll over at New Year."""
+    return _year_strings(datetime.now().toordinal())
+
+
 def determine_query_params_for_google(query: str, location: str = None, lookback_hours: int = None) -> tuple[str, list[str], int, str | None]:
+    # The year is part of the memo key so cached params never outlive New Year; callers get their own domain list
+    query_for_api, trusted_domains, num_api_results, date_restrict_api = \
+        _determine_query_params_cached(query, location, lookback_hours, _current_year_strings()[0])
+    return query_for_api, list(trusted_domains), num_api_results, date_restrict_api
+
+
+@functools.lru_cache(maxsize=128)
+def _determine_query_params_cached(query: str, location: str | None, lookback_hours: int | None, current_year_str: str) -> tuple[str, tuple[str, ...], int, str | None]:
     query_lower = query.lower()
     date_restrict_api = None
-    trusted_domains_for_query = list(TRUSTED_DOMAINS_GENERAL) 
+    trusted_domains_for_query = set(TRUSTED_DOMAINS_GENERAL) 
     num_api_results = RESULTS_PER_API_CALL 
 
     query_for_api = query 
@@ -168,7 +613,7 @@ def determine_query_params_for_google(query: str, location: str = None, lookback
                 query_for_api = f"{query} in {location}"
         logger.info(f"Location context: Using query '{query_for_api}'")
         if "lucknow" in location_lower:
-             trusted_domains_for_query.extend(TRUSTED_DOMAINS_LUCKNOW)
+             trusted_domains_for_query |= TRUSTED_DOMAINS_LUCKNOW
 
 
     if lookback_hours:
@@ -185,13 +630,12 @@ def determine_query_params_for_google(query: str, location: str = None, lookback
         logger.info("General news/latest query detected, setting dateRestrict to past 7 days (d7).")
         date_restrict_api = "d7" 
     
-    current_year_str = str(datetime.now().year) 
     if current_year_str in query and not (date_restrict_api or "latest" in query_lower or "current" in query_lower):
         logger.info(f"Query contains specific year {current_year_str} and no recency term. Removing dateRestrict.")
         date_restrict_api = None 
     
     if "ipl" in query_lower or "cricket" in query_lower:
-        trusted_domains_for_query.extend(TRUSTED_DOMAINS_IPL)
+        trusted_domains_for_query |= TRUSTED_DOMAINS_IPL
 
     if date_restrict_api or "news" in query_lower or "latest" in query_lower or "updates" in query_lower:
         num_api_results = min(max(RESULTS_PER_API_CALL, 7), 10) 
@@ -204,10 +648,10 @@ def determine_query_params_for_google(query: str, location: str = None, lookback
             query_for_api = f"{quoted_entity} in {location}" if location and location_lower not in quoted_entity.lower() else quoted_entity
             logger.info(f"Specific entity heuristic applied. Modified query for Google API: {query_for_api}")
     
-    return query_for_api, list(set(trusted_domains_for_query)), num_api_results, date_restrict_api
+    return query_for_api, tuple(trusted_domains_for_query), num_api_results, date_restrict_api
 
 
-def build_google_search_queries(base_query_for_api: str, is_entity_search: bool, trusted_domains_for_this_query: list[str]) -> list[str]:
+def build_google_search_queries(base_query_for_api: str, is_entity_search: bool, trusted_domains_for_this_query: Iterable[str]) -> list[str]:
     queries = set()
     queries.add(base_query_for_api) 
 
@@ -225,11 +669,11 @@ def build_google_search_queries(base_query_for_api: str, is_entity_search: bool,
         queries.add(f"{core_query} latest news")
         queries.add(f"{core_query} updates")
 
-    if trusted_domains_for_this_query:
-        random.shuffle(trusted_domains_for_this_query) 
-        for i, domain in enumerate(trusted_domains_for_this_query):
-            if i >= 2 and not is_entity_search : break # Fewer site-specific for general
-            if i >= 1 and is_entity_search: break # Very few for specific entities
+    trusted_domains = tuple(trusted_domains_for_this_query) # Works for any collection and never mutates the caller's
+    if trusted_domains:
+        # Very few site-specific queries for specific entities, a couple for general queries
+        picks = random.sample(trusted_domains, k=min(1 if is_entity_search else 2, len(trusted_domains)))
+        for domain in picks:
             queries.add(f"{core_query} site:{domain.strip()}") # Use core_query for site search
             
     final_queries = list(queries)
@@ -241,6 +685,21 @@ def build_google_search_queries(base_query_for_api: str, is_entity_search: bool,
     return final_queries[:5] 
 
 
+LOW_QUALITY_DOMAINS_FOR_NEWS = [
+    "indiatoday.in", "news18.com", "timesnownews.com", "republicworld.com", "opindia.com", "oneindia.com",
+    "zeenews.india.com", "firstpost.com", "wionews.com", "dnaindia.com", "newsbytesapp.com", "thequint.com",
+    "swarajyamag.com", "abplive.com", "ibtimes.co.in", "latestly.com", "theprint.in", "thewire.in", "scroll.in",
+    "livemint.com", "deccanherald.com", "freepressjournal.in", "financialexpress.com", "business-standard.com",
+    "newsx.com", "theweek.in", "outlookindia.com", "asianage.com", "newindianexpress.com", "orissapost.com",
+    "punemirror.indiatimes.com", "mumbaimirror.indiatimes.com", "bangaloremirror.indiatimes.com", "ahmedabadmirror.com"
+]
+_LOW_QUALITY_NEWS_DOMAINS = frozenset(LOW_QUALITY_DOMAINS_FOR_NEWS)
+# Trusted Lucknow news domains plus Amar Ujala, Jagran, Dainik Bhaskar are always treated as likely articles
+_ALWAYS_ARTICLE_DOMAINS = frozenset([d.split('/')[0].lower() for d in TRUSTED_DOMAINS_LUCKNOW] + ["amarujala.com", "jagran.com", "dainikbhaskar.com"])
+_FILE_EXT_RE = re.compile(r'\.(?:pdf|docx?|xlsx?|pptx?|zip|exe|jpe?g|png|gif)(?:[?#]|$)', re.I)
+_ARTICLE_HINT_RE = re.compile(r'articleshow|/news/')
+_WORD_RE = re.compile(r'\w+')
+
 def get_urls_from_google_api(query: str, num_results: int, date_restrict_param: str | None) -> list[dict]:
     if not GOOGLE_API_KEY or not CUSTOM_SEARCH_ENGINE_ID:
         logger.error("GOOGLE_API_KEY or CUSTOM_SEARCH_ENGINE_ID not set.")
@@ -248,17 +707,19 @@ def get_urls_from_google_api(query: str, num_results: int, date_restrict_param:
 
     urls_info_list = []
     is_news_query_flag = "news" in query.lower() or "latest" in query.lower() or date_restrict_param is not None
+    recent_year_paths = tuple(f"/{year}/" for year in _current_year_strings())
+    query_keywords = frozenset(word for word in _WORD_RE.findall(query.lower()) if len(word) > 3)
 
     try:
         logger.info(f"  [Google API] Sending query: '{query}' (Requesting {num_results} results)")
-        service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY, cache_discovery=False)
-        
-        request_params = {'q': query, 'cx': CUSTOM_SEARCH_ENGINE_ID, 'num': min(num_results, 10)}
+        request_params = {'key': GOOGLE_API_KEY, 'q': query, 'cx': CUSTOM_SEARCH_ENGINE_ID, 'num': min(num_results, 10)}
         if date_restrict_param:
             request_params['dateRestrict'] = date_restrict_param
             logger.info(f"  [Google API] Applying dateRestrict: {date_restrict_param} for query: '{query}'")
 
-        res = service.cse().list(**request_params).execute()
+        resp = _HTTP_SESSION.get(GOOGLE_CSE_URL, params=request_params, timeout=10)
+        resp.raise_for_status()
+        res = resp.json()
 
         if 'items' in res:
             for item in res['items']:
@@ -270,27 +731,24 @@ def get_urls_from_google_api(query: str, num_results: int, date_restrict_param:
                 parsed_u = urlparse(url)
                 domain = parsed_u.netloc
 
-                if is_news_query_flag and domain in LOW_QUALITY_DOMAINS_FOR_NEWS:
+                if is_news_query_flag and domain in _LOW_QUALITY_NEWS_DOMAINS:
                     logger.info(f"    https://officialfilter.com/ Skipping low-quality/social media news source: {url}")
                     continue
 
                 if parsed_u.scheme not in ['http', 'https']: continue
-                if any(ext in url.lower() for ext in ['.pdf', '.doc', '.xls', '.ppt', '.zip', '.exe', '.jpg', '.png', '.gif']):
+                if _FILE_EXT_RE.search(parsed_u.path):
                     logger.info(f"    https://officialfilter.com/ Skipping direct file/image link: {url}")
                     continue
                 
                 # Heuristic for homepages (User's Step 2 suggestion)
-                is_likely_article = "articleshow" in url or "/news/" in url or f"/{str(datetime.now().year)}/" in url or f"/{str(datetime.now().year-1)}/" in url or len(parsed_u.path.split('/')) > 3
-                # Relax article heuristic for trusted Lucknow news domains
-                trusted_lucknow_domains = [d.split('/')[0].lower() for d in TRUSTED_DOMAINS_LUCKNOW]
-                # Always treat Amar Ujala, Jagran, Dainik Bhaskar as likely articles for news queries
-                hindi_news_domains = ["amarujala.com", "jagran.com", "dainikbhaskar.com"]
-                if domain.lower() in trusted_lucknow_domains or domain.lower() in hindi_news_domains:
+                is_likely_article = bool(_ARTICLE_HINT_RE.search(url)) or any(p in url for p in recent_year_paths) or len(parsed_u.path.split('/')) > 3
+                # Relax article heuristic for trusted Lucknow news domains and major Hindi news sites
+                if domain.lower() in _ALWAYS_ARTICLE_DOMAINS:
                     is_likely_article = True
                 if not is_likely_article:
                     # For news queries, be stricter with homepages
                     if is_news_query_flag and (parsed_u.path in ['/', ''] or len(parsed_u.path.split('/')) <=2) :
-                         if not any(kw in snippet.lower() for kw in query.lower().split() if len(kw)>3): 
+                         if not query_keywords.intersection(_WORD_RE.findall(snippet.lower())): 
                             logger.info(f"    https://officialfilter.com/ Skipping likely homepage with less relevant snippet for news query: {url}")
                             continue
                     elif not is_news_query_flag: # Less strict for non-news
@@ -303,24 +761,30 @@ def get_urls_from_google_api(query: str, num_results: int, date_restrict_param:
         else:
             logger.warning(f"  [Google API] No 'items' in Google API response for query: '{query}'.")
             
-    except HttpError as e:
-        logger.error(f"  [Google API] HttpError for query '{query}': {e.resp.status} {e._get_reason()}")
-        if e.resp.status == 429 or e.resp.status == 403: 
-            logger.warning(f"  [Google API] Rate limit or quota likely exceeded (Status: {e.resp.status}).")
+    except requests.exceptions.HTTPError as e:
+        status = e.response.status_code if e.response is not None else None
+        reason = e.response.reason if e.response is not None else str(e)
+        logger.error(f"  [Google API] HttpError for query '{query}': {status} {reason}")
+        if status == 429 or status == 403: 
+            logger.warning(f"  [Google API] Rate limit or quota likely exceeded (Status: {status}).")
     except Exception as e:
         logger.error(f"  [Google API] Unexpected error for query '{query}': {e}")
     
     logger.info(f"  [Google API] Retrieved {len(urls_info_list)} valid URLs for query: '{query}'")
     return urls_info_list
 
-LOW_QUALITY_DOMAINS_FOR_NEWS = [
-    "indiatoday.in", "news18.com", "timesnownews.com", "republicworld.com", "opindia.com", "oneindia.com",
-    "zeenews.india.com", "firstpost.com", "wionews.com", "dnaindia.com", "newsbytesapp.com", "thequint.com",
-    "swarajyamag.com", "abplive.com", "ibtimes.co.in", "latestly.com", "theprint.in", "thewire.in", "scroll.in",
-    "livemint.com", "deccanherald.com", "freepressjournal.in", "financialexpress.com", "business-standard.com",
-    "newsx.com", "theweek.in", "outlookindia.com", "asianage.com", "newindianexpress.com", "orissapost.com",
-    "punemirror.indiatimes.com", "mumbaimirror.indiatimes.com", "bangaloremirror.indiatimes.com", "ahmedabadmirror.com"
-]
+
+_PREFERRED_NEWS_DOMAINS = { # Example, can be expanded
+    'timesofindia.indiatimes.com': 10, 'hindustantimes.com': 9, 'indianexpress.com': 9,
+    'ndtv.com': 8, 'news18.com': 8, 'thehindu.com': 8, 
+    'livehindustan.com': 9, 'amarujala.com': 9, 'jagran.com': 9, 
+    'bbc.com': 7, 'reuters.com': 7, 'apnews.com': 7,
+    'espncricinfo.com': 10, 'cricbuzz.com': 10 
+}
+_PREFERRED_NEWS_DOMAINS_LUCKNOW = {**_PREFERRED_NEWS_DOMAINS, **{d: 10 for d in sorted(TRUSTED_DOMAINS_LUCKNOW) if d not in _PREFERRED_NEWS_DOMAINS}}
+# Tuples so str.endswith can test every suffix in one C-level call
+_PREFERRED_NEWS_SUFFIXES = tuple(_PREFERRED_NEWS_DOMAINS)
+_PREFERRED_NEWS_SUFFIXES_LUCKNOW = tuple(_PREFERRED_NEWS_DOMAINS_LUCKNOW)
 
 def get_all_top_urls_orchestrator(base_query_for_api: str, num_api_results_per_query_config: int, date_restrict_api_param: str | None, trusted_domains_for_query: list[str], location: str | None) -> list[dict]:
     """
@@ -333,37 +797,30 @@ def get_all_top_urls_orchestrator(base_query_for_api: str, num_api_results_per_q
     all_urls_info_dict = {} 
     urls_collected_count = 0
 
-    for q_idx, q in enumerate(refined_queries):
-        if urls_collected_count >= TOTAL_URLS_TO_PROCESS_LIMIT:
-            logger.info(f"https://www.merriam-webster.com/dictionary/collector Reached total URL processing limit of {TOTAL_URLS_TO_PROCESS_LIMIT}.")
-            break
-        
-        current_num_results_to_request = num_api_results_per_query_config
+    def _num_results_for(q: str) -> int:
         if is_entity_search and q == base_query_for_api: 
-            current_num_results_to_request = min(10, num_api_results_per_query_config + 2) 
-        elif "site:" in q: 
-            current_num_results_to_request = max(1, num_api_results_per_query_config // 2)
-
-        urls_from_api_for_q = []
-        for attempt in range(MAX_API_RETRIES): 
-            urls_from_api_for_q = get_urls_from_google_api(q, current_num_results_to_request, date_restrict_api_param)
-            if urls_from_api_for_q: 
-                break 
-            logger.warning(f"  Attempt {attempt+1} for query '{q}' returned no results. Retrying if possible...")
-            if attempt < MAX_API_RETRIES - 1:
-                time.sleep(BACKOFF_FACTOR_API * (2 ** attempt))
-            else:
-                logger.error(f"  Failed to get URLs for query '{q}' after {MAX_API_RETRIES} attempts.")
-        
-        for url_info in urls_from_api_for_q:
-            if url_info['url'] not in all_urls_info_dict: 
-                all_urls_info_dict[url_info['url']] = url_info 
-                urls_collected_count +=1
-                if urls_collected_count >= TOTAL_URLS_TO_PROCESS_LIMIT:
-                    break
-        
-        if q_idx < len(refined_queries) - 1: 
-            time.sleep(random.uniform(1.0, 1.5)) 
+            return min(10, num_api_results_per_query_config + 2) 
+        if "site:" in q: 
+            return max(1, num_api_results_per_query_config // 2)
+        return num_api_results_per_query_config
+
+    # Refined queries are independent, so they go out concurrently; results are merged in query order
+    # so the base query keeps first claim on the URL budget
+    with ThreadPoolExecutor(max_workers=max(1, len(refined_queries))) as pool:
+        futures = [pool.submit(get_urls_from_google_api, q, _num_results_for(q), date_restrict_api_param) for q in refined_queries]
+        for future in futures:
+            if urls_collected_count >= TOTAL_URLS_TO_PROCESS_LIMIT:
+                logger.info(f"https://www.merriam-webster.com/dictionary/collector Reached total URL processing limit of {TOTAL_URLS_TO_PROCESS_LIMIT}.")
+                for pending in futures:
+                    pending.cancel()
+                break
+            for url_info in future.result():
+                url_key = canonicalize_url(url_info['url']) # url_info keeps the original URL for fetching
+                if url_key not in all_urls_info_dict: 
+                    all_urls_info_dict[url_key] = url_info 
+                    urls_collected_count +=1
+                    if urls_collected_count >= TOTAL_URLS_TO_PROCESS_LIMIT:
+                        break
 
     unique_urls_list = list(all_urls_info_dict.values())
     
@@ -371,23 +828,17 @@ def get_all_top_urls_orchestrator(base_query_for_api: str, num_api_results_per_q
     is_general_news_query = "news" in base_query_for_api.lower() or "latest" in base_query_for_api.lower() or date_restrict_api_param is not None
     if is_general_news_query:
         logger.info("https://www.merriam-webster.com/dictionary/collector Applying domain prioritization for news query...")
-        preferred_domains_map = { # Example, can be expanded
-            'timesofindia.indiatimes.com': 10, 'hindustantimes.com': 9, 'indianexpress.com': 9,
-            'ndtv.com': 8, 'news18.com': 8, 'thehindu.com': 8, 
-            'livehindustan.com': 9, 'amarujala.com': 9, 'jagran.com': 9, 
-            'bbc.com': 7, 'reuters.com': 7, 'apnews.com': 7,
-            'espncricinfo.com': 10, 'cricbuzz.com': 10 
-        }
         # Add location specific trusted domains to preferred map with high priority
         if location and "lucknow" in location.lower():
-            for domain in TRUSTED_DOMAINS_LUCKNOW:
-                if domain not in preferred_domains_map: preferred_domains_map[domain] = 10
+            preferred_domains_map, preferred_suffixes = _PREFERRED_NEWS_DOMAINS_LUCKNOW, _PREFERRED_NEWS_SUFFIXES_LUCKNOW
+        else:
+            preferred_domains_map, preferred_suffixes = _PREFERRED_NEWS_DOMAINS, _PREFERRED_NEWS_SUFFIXES
         
         for url_info in unique_urls_list:
             domain = url_info.get('domain', '')
             priority = preferred_domains_map.get(domain, 0)
-            if priority == 0: 
-                for preferred_domain_key in preferred_domains_map:
+            if priority == 0 and domain.endswith(preferred_suffixes): 
+                for preferred_domain_key in preferred_suffixes:
                     if domain.endswith(preferred_domain_key):
                         priority = preferred_domains_map[preferred_domain_key] -1 
                         break
@@ -399,7 +850,175 @@ def get_all_top_urls_orchestrator(base_query_for_api: str, num_api_results_per_q
     return unique_urls_list[:TOTAL_URLS_TO_PROCESS_LIMIT] 
 
 
+def _parse_html_tree(html_content: str):
+    try:
+        return lxml.html.fromstring(html_content)
+    except ValueError: # str input with an XML encoding declaration must be parsed as bytes
+        return lxml.html.fromstring(html_content.encode('utf-8'))
+
+def _node_text(node) -> str:
+    """Whitespace-stripped text fragments joined by single spaces (same output as BS4 get_text(' ', strip=True))."""
+    return ' '.join(fragment.strip() for fragment in node.itertext() if fragment.strip())
+
+
+def _fallback_texts_lxml(html_content: str) -> tuple[str, str]:
+    root = _parse_html_tree(html_content)
+    lxml.etree.strip_elements(root, *_FALLBACK_JUNK_TAGS, with_tail=False)
+    for element in _FALLBACK_JUNK_XPATH(root):
+        if element.getparent() is not None:
+            element.drop_tree()
+    matches = _MAIN_CONTENT_XPATH(root)
+    main_content_text = _node_text(matches[0]) if matches else ""
+    if len(main_content_text) >= MIN_CONTENT_LENGTH:
+        return main_content_text, ""
+    body = root.find('.//body')
+    return main_content_text, _node_text(body if body is not None else root)
+
+def _fallback_texts_selectolax(html_content: str) -> tuple[str, str]:
+    tree = SelectolaxHTMLParser(html_content)
+    tree.strip_tags(list(_FALLBACK_JUNK_TAGS))
+    for node in tree.css(_FALLBACK_JUNK_SELECTOR):
+        node.decompose()
+    node = tree.css_first(_MAIN_CONTENT_SELECTOR)
+    main_content_text = node.text(separator=' ', strip=True) if node else ""
+    if len(main_content_text) >= MIN_CONTENT_LENGTH:
+        return main_content_text, ""
+    root = tree.body or tree.root
+    return main_content_text, root.text(separator=' ', strip=True) if root else ""
+
+def _fallback_texts(html_content: str) -> tuple[str, str]:
+    """
+    (main-content text, body text) with junk removed; body text is only computed when the
+    main-content container is missing or short. Uses selectolax when installed, otherwise lxml.
+    """
+    if SELECTOLAX_AVAILABLE:
+        return _fallback_texts_selectolax(html_content)
+    return _fallback_texts_lxml(html_content)
+
+
 def extract_article_content(url_info: dict) -> dict:
+    html_content = get_html_with_headers(url_info.get('url', 'N/A')) 
+    return parse_article_html(url_info, html_content)
+
+
+def _parse_iso_datetime(value: str) -> datetime:
+    """ISO-8601 string to datetime (naive if the string has no offset). Raises ValueError if unparseable."""
+    if CISO8601_AVAILABLE:
+        return ciso8601.parse_datetime(value)
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def _extract_with_custom(article_data: dict, html_content: str) -> None:
+    url, domain = article_data['url'], article_data['domain']
+    if domain not in CUSTOM_EXTRACTORS:
+        return
+    try:
+        custom_result = CUSTOM_EXTRACTORS[domain](html_content, url)
+        if custom_result and custom_result.get('text') and len(custom_result.get('text')) >= MIN_CONTENT_LENGTH:
+            logger.info(f"  [Custom Extractor] Success for {url} ({domain})")
+            article_data.update({
+                'title': custom_result.get('title', article_data['title']),
+                'text': custom_result.get('text'),
+                'publish_date': custom_result.get('publish_date', article_data['publish_date']),
+                'extraction_method': custom_result.get('extraction_method', 'custom'),
+                'extraction_note': custom_result.get('extraction_note', f"Success (custom_{domain.split('.')[0]})")
+            })
+        elif custom_result and custom_result.get('text'):
+             logger.warning(f"  [Custom Extractor] Short content from {domain} for {url}. Length: {len(custom_result.get('text'))}")
+             article_data.update(custom_result) 
+        else:
+            logger.warning(f"  [Custom Extractor] Failed or no content from {domain} for {url}. Note: {custom_result.get('extraction_note', 'N/A')}")
+    except Exception as e:
+        logger.error(f"  [Custom Extractor] Error for {domain} on {url}: {str(e)}")
+        article_data['extraction_note'] = f"Custom extractor error for {domain}"
+
+def _extract_with_newspaper(article_data: dict, html_content: str) -> None:
+    url = article_data['url']
+    try: 
+        article = Article(url, config=NP_CONFIG) 
+        article.set_html(html_content) # Marks the article as downloaded; assigning .html alone makes parse() refuse to run
+        article.parse()
+        text = article.text.strip()
+        
+        current_title = article_data.get('title', 'N/A')
+        if article.title and article.title.strip() and \
+           (current_title == 'N/A' or not str(current_title).strip() or len(article.title.strip()) > len(str(current_title))):
+            article_data['title'] = article.title.strip()
+        
+        if article.publish_date and isinstance(article.publish_date, datetime): 
+             article_data['publish_date'] = article.publish_date.replace(tzinfo=timezone.utc) if article.publish_date.tzinfo is None else article.publish_date.astimezone(timezone.utc)
+        elif article.publish_date: 
+            try: 
+                parsed_date_str = str(article.publish_date)
+                if 'T' in parsed_date_str: 
+                    parsed_date = _parse_iso_datetime(parsed_date_str)
+                else: 
+                    parsed_date = datetime.strptime(parsed_date_str, '%Y-%m-%d %H:%M:%S')
+                article_data['publish_date'] = parsed_date.replace(tzinfo=timezone.utc) if parsed_date.tzinfo is None else parsed_date.astimezone(timezone.utc)
+            except (ValueError, TypeError):
+                logger.warning(f"  [newspaper3k] Could not parse publish_date: {article.publish_date} (type: {type(article.publish_date)}) for {url}")
+                article_data['publish_date'] = article_data.get('publish_date', None) # Keep from custom if exists
+
+        if text and len(text) >= MIN_CONTENT_LENGTH:
+            article_data['text'] = text; article_data['extraction_method'] = 'newspaper3k'
+            article_data['extraction_note'] = f"Success (newspaper3k) ~{len(text)} chars."
+            logger.info(f"  [newspaper3k] Success for {url} (Length: {len(text)})")
+        elif text: 
+            if not article_data.get('text') or len(text) > len(article_data.get('text','')):
+                article_data['text'] = text
+            article_data['extraction_method'] = 'newspaper3k_short'
+            article_data['extraction_note'] = f"{article_data.get('extraction_note','')} | newspaper3k short text ({len(text)} chars)."
+        else: 
+            article_data['extraction_note'] = f"{article_data.get('extraction_note','')} | newspaper3k extracted no text."
+            
+    except ArticleException as e:
+        logger.error(f"  [newspaper3k] ArticleException for {url}: {e}")
+        article_data['extraction_note'] = f"{article_data.get('extraction_note','')} | newspaper3k ArticleException: {str(e)[:100]}"
+    except Exception as e:
+        logger.error(f"  [newspaper3k] General error for {url}: {e}")
+        article_data['extraction_note'] = f"{article_data.get('extraction_note','')} | newspaper3k general error: {str(e)[:100]}"
+
+def _extract_with_html_fallback(article_data: dict, html_content: str) -> None:
+    url = article_data['url']
+    original_extraction_note = article_data.get('extraction_note', 'Previous methods failed.')
+    logger.info(f"  [Fallback HTML] For: {url} (Previous note: {original_extraction_note})")
+    try:
+        main_content_text, body_text = _fallback_texts(html_content)
+        if len(main_content_text) >= MIN_CONTENT_LENGTH: 
+            logger.info(f"    [HTML fallback] Found good content in a main-content container")
+        if len(main_content_text) < MIN_CONTENT_LENGTH: 
+            final_text = main_content_text if main_content_text and len(main_content_text) > len(body_text) / 3 else body_text
+        else: 
+            final_text = main_content_text
+        final_text = _WS_RE.sub(' ', final_text).strip()
+        
+        if final_text and len(final_text) >= MIN_CONTENT_LENGTH:
+            article_data['text'] = final_text
+            article_data['extraction_method'] = 'html_fallback'
+            article_data['extraction_note'] = f"Success (HTML fallback) ~{len(final_text)} chars."
+            logger.info(f"    [HTML fallback] Success for {url} (Length: {len(final_text)})")
+        elif final_text: 
+            if not article_data.get('text') or len(final_text) > len(article_data.get('text','')):
+                article_data['text'] = final_text
+            article_data['extraction_method'] = 'html_fallback_short'
+            article_data['extraction_note'] = f"{original_extraction_note} | HTML fallback short text ({len(final_text)} chars)." 
+            logger.warning(f"    [HTML fallback] Short content for {url} (Length: {len(final_text)})")
+        else: 
+            article_data['extraction_note'] = f"{original_extraction_note} | HTML fallback no significant text." 
+            logger.warning(f"    [HTML fallback] No significant text for {url}.")
+    except Exception as e:
+        logger.error(f"  [Fallback HTML] Error for {url}: {e}")
+        article_data['extraction_note'] = f"{article_data.get('extraction_note','')} | HTML fallback error: {str(e)[:100]}"
+        if not article_data.get('text') or str(article_data.get('text','')).isspace():
+             article_data['text'] = ''
+
+
+# Tried in order; parse_article_html stops at the first stage that leaves MIN_CONTENT_LENGTH of text,
+# so e.g. the fallback parse never runs on pages newspaper3k already handled.
+_EXTRACTION_STAGES = (_extract_with_custom, _extract_with_newspaper, _extract_with_html_fallback)
+
+
+def parse_article_html(url_info: dict, html_content: str) -> dict:
     # This function logic is kept the same as the robust version from google_search_scraper_py_no_trusted_domains_fixed_args
     # (Ensuring it handles datetime objects correctly for publish_date)
     url = url_info.get('url', 'N/A')
@@ -409,194 +1028,89 @@ def extract_article_content(url_info: dict) -> dict:
     article_data = {
         'url': url, 'title': title_from_search, 'text': '', 
         'publish_date': None, 'domain': domain, 
+        'trusted_domain': url_info.get('trusted_domain', False), # One of the query's trusted domains; used in Phase 2 ranking
         'extraction_method': 'none', 
-        'extraction_note': 'Processing not attempted or failed early.'
+        'extraction_note': 'Processing not attempted or failed early.',
+        'text_len': 0 # Set from the final 'text' on return so sort keys and filters need not re-measure it
     }
 
-    html_content = get_html_with_headers(url) 
-
     if not html_content:
         article_data['extraction_note'] = "Failed to download HTML content after all attempts."
         logger.error(f"  [Extractor] Failed to download HTML for {url}")
-        return article_data
-
-    # Try domain-specific custom extraction first (Step 3 & 4)
-    if domain in CUSTOM_EXTRACTORS:
-        try:
-            custom_result = CUSTOM_EXTRACTORS[domain](html_content, url)
-            if custom_result and custom_result.get('text') and len(custom_result.get('text')) >= MIN_CONTENT_LENGTH:
-                logger.info(f"  [Custom Extractor] Success for {url} ({domain})")
-                article_data.update({
-                    'title': custom_result.get('title', article_data['title']),
-                    'text': custom_result.get('text'),
-                    'publish_date': custom_result.get('publish_date', article_data['publish_date']),
-                    'extraction_method': custom_result.get('extraction_method', 'custom'),
-                    'extraction_note': custom_result.get('extraction_note', f"Success (custom_{domain.split('.')[0]})")
-                })
-                # Ensure publish_date is datetime after custom extraction
-                if article_data['publish_date'] and isinstance(article_data['publish_date'], str):
-                    try:
-                        article_data['publish_date'] = datetime.fromisoformat(article_data['publish_date'].replace('Z', '+00:00')).replace(tzinfo=timezone.utc)
-                    except: pass # Keep as string if parsing fails
-                return article_data
-            elif custom_result and custom_result.get('text'):
-                 logger.warning(f"  [Custom Extractor] Short content from {domain} for {url}. Length: {len(custom_result.get('text'))}")
-                 article_data.update(custom_result) 
-            else:
-                logger.warning(f"  [Custom Extractor] Failed or no content from {domain} for {url}. Note: {custom_result.get('extraction_note', 'N/A')}")
-        except Exception as e:
-            logger.error(f"  [Custom Extractor] Error for {domain} on {url}: {str(e)}")
-            article_data['extraction_note'] = f"Custom extractor error for {domain}"
-
-
-    if not article_data.get('text') or len(article_data.get('text', '')) < MIN_CONTENT_LENGTH :
-        try: 
-            article = Article(url, config=NP_CONFIG) 
-            article.html = html_content 
-            article.parse()
-            text = article.text.strip()
-            
-            current_title = article_data.get('title', title_from_search)
-            if article.title and article.title.strip() and \
-               (current_title == 'N/A' or not str(current_title).strip() or len(article.title.strip()) > len(str(current_title))):
-                article_data['title'] = article.title.strip()
-            
-            if article.publish_date and isinstance(article.publish_date, datetime.datetime): 
-                 article_data['publish_date'] = article.publish_date.replace(tzinfo=timezone.utc) if article.publish_date.tzinfo is None else article.publish_date.astimezone(timezone.utc)
-            elif article.publish_date: 
-                try: 
-                    parsed_date_str = str(article.publish_date)
-                    if 'T' in parsed_date_str: 
-                        parsed_date = datetime.datetime.fromisoformat(parsed_date_str.replace('Z', '+00:00'))
-                    else: 
-                        parsed_date = datetime.datetime.strptime(parsed_date_str, '%Y-%m-%d %H:%M:%S')
-                    article_data['publish_date'] = parsed_date.replace(tzinfo=timezone.utc) if parsed_date.tzinfo is None else parsed_date.astimezone(timezone.utc)
-                except (ValueError, TypeError):
-                    logger.warning(f"  [newspaper3k] Could not parse publish_date: {article.publish_date} (type: {type(article.publish_date)}) for {url}")
-                    article_data['publish_date'] = article_data.get('publish_date', None) # Keep from custom if exists
-
-            if text and len(text) >= MIN_CONTENT_LENGTH:
-                article_data['text'] = text; article_data['extraction_method'] = 'newspaper3k'
-                article_data['extraction_note'] = f"Success (newspaper3k) ~{len(text)} chars."
-                logger.info(f"  [newspaper3k] Success for {url} (Length: {len(text)})")
-                return article_data
-            elif text: 
-                if not article_data.get('text') or len(text) > len(article_data.get('text','')):
-                    article_data['text'] = text
-                article_data['extraction_method'] = 'newspaper3k_short'
-                article_data['extraction_note'] = f"{article_data.get('extraction_note','')} | newspaper3k short text ({len(text)} chars)."
-            else: 
-                article_data['extraction_note'] = f"{article_data.get('extraction_note','')} | newspaper3k extracted no text."
-                
-        except ArticleException as e:
-            logger.error(f"  [newspaper3k] ArticleException for {url}: {e}")
-            article_data['extraction_note'] = f"{article_data.get('extraction_note','')} | newspaper3k ArticleException: {str(e)[:100]}"
-        except Exception as e:
-            logger.error(f"  [newspaper3k] General error for {url}: {e}")
-            article_data['extraction_note'] = f"{article_data.get('extraction_note','')} | newspaper3k general error: {str(e)[:100]}"
+    else:
+        for stage in _EXTRACTION_STAGES:
+            stage(article_data, html_content)
+            if len(article_data.get('text') or '') >= MIN_CONTENT_LENGTH:
+                break
 
-    if not article_data.get('text') or len(article_data.get('text', '')) < MIN_CONTENT_LENGTH:
-        original_extraction_note = article_data.get('extraction_note', 'Previous methods failed.')
-        logger.info(f"  [Fallback BS4] For: {url} (Previous note: {original_extraction_note})")
-        try:
-            soup = BeautifulSoup(html_content, 'lxml') 
-            for element in soup(['script', 'style', 'nav', 'footer', 'aside', 'header', '.sidebar', '#sidebar', 'form', 'button', 'input', '.ad', '.advertisement', '.cookie-banner', 'img', 'figure', 'figcaption', 'iframe', 'link', 'meta']):
-                element.decompose()
-            main_content_text = ""
-            main_selectors = ['article[class*="content"]', 'div[class*="content"]', 'article[id*="content"]', 'div[id*="content"]', 'article', 'main', '.main-content', '#main', '.post-body', '.entry-content', '.td-post-content', '.story-content', '[role="main"]', '.article-body', '.articleBody']
-            for selector in main_selectors:
-                content_area = soup.select_one(selector)
-                if content_area:
-                    main_content_text = content_area.get_text(separator=' ', strip=True)
-                    if len(main_content_text) >= MIN_CONTENT_LENGTH: 
-                        logger.info(f"    [BeautifulSoup] Found good content with selector: {selector}")
-                        break 
-            if len(main_content_text) < MIN_CONTENT_LENGTH: 
-                body = soup.find('body')
-                body_text = body.get_text(separator=' ', strip=True) if body else ""
-                final_bs_text = main_content_text if main_content_text and len(main_content_text) > len(body_text) / 3 else body_text
-            else: 
-                final_bs_text = main_content_text
-            final_bs_text = ' '.join(final_bs_text.split()) 
-            
-            if final_bs_text and len(final_bs_text) >= MIN_CONTENT_LENGTH:
-                article_data['text'] = final_bs_text
-                article_data['extraction_method'] = 'beautifulsoup'
-                article_data['extraction_note'] = f"Success (BS4) ~{len(final_bs_text)} chars."
-                logger.info(f"    [BeautifulSoup] Success for {url} (Length: {len(final_bs_text)})")
-            elif final_bs_text: 
-                if not article_data.get('text') or len(final_bs_text) > len(article_data.get('text','')):
-                    article_data['text'] = final_bs_text
-                article_data['extraction_method'] = 'beautifulsoup_short'
-                article_data['extraction_note'] = f"{original_extraction_note} | BS4 short text ({len(final_bs_text)} chars)." 
-                logger.warning(f"    [BeautifulSoup] Short content for {url} (Length: {len(final_bs_text)})")
-            else: 
-                article_data['extraction_note'] = f"{original_extraction_note} | BS4 no significant text." 
-                logger.warning(f"    [BeautifulSoup] No significant text for {url}.")
-        except Exception as e:
-            logger.error(f"  [Fallback BS4] Error for {url}: {e}")
-            article_data['extraction_note'] = f"{article_data.get('extraction_note','')} | BS4 error: {str(e)[:100]}"
-            if not article_data.get('text') or str(article_data.get('text','')).isspace():
-                 article_data['text'] = ''
-                 
     if (article_data.get('title') == 'N/A' or not str(article_data.get('title','')).strip()) and article_data.get('text','').strip(): 
         article_data['title'] = ' '.join(article_data.get('text','').split()[:12]) + "..."
 
-    # Ensure publish_date is a datetime object for consistent filtering later
-    if article_data['publish_date'] and isinstance(article_data['publish_date'], str):
+    # Invariant for callers: publish_date is a tz-aware UTC datetime or None
+    publish_date = article_data['publish_date']
+    if isinstance(publish_date, str):
         try:
-            article_data['publish_date'] = datetime.fromisoformat(article_data['publish_date'].replace('Z', '+00:00')).replace(tzinfo=timezone.utc)
-        except: # If parsing as ISO string fails, set to None
-            logger.warning(f"Final attempt to parse publish_date string '{article_data['publish_date']}' failed for {url}")
-            article_data['publish_date'] = None
-    elif article_data['publish_date'] and isinstance(article_data['publish_date'], datetime.datetime):
-        # Ensure it's timezone aware (UTC)
-        if article_data['publish_date'].tzinfo is None:
-            article_data['publish_date'] = article_data['publish_date'].replace(tzinfo=timezone.utc)
-        else:
-            article_data['publish_date'] = article_data['publish_date'].astimezone(timezone.utc)
-
+            publish_date = _parse_iso_datetime(publish_date)
+        except (ValueError, TypeError):
+            logger.warning(f"Final attempt to parse publish_date string '{publish_date}' failed for {url}")
+            publish_date = None
+    if isinstance(publish_date, datetime):
+        article_data['publish_date'] = publish_date.replace(tzinfo=timezone.utc) if publish_date.tzinfo is None else publish_date.astimezone(timezone.utc)
+        article_data['publish_date_str'] = article_data['publish_date'].strftime('%Y-%m-%d') # Display form, so the UI need not re-format it
+    else:
+        article_data['publish_date'] = None
+        article_data['publish_date_str'] = 'N/A'
 
+    text = article_data.get('text') or ''
+    article_data['text_len'] = len(text)
+    # Lowercased head (title + first 1000 chars) for the pipeline's trending and recency checks, built while the text is hot
+    article_data['_text_lower'] = f"{article_data.get('title') or ''} {text[:1000]}".lower()
     return article_data
 
 
+# ASCII mode: titles are matched against [A-Za-z] only, so Unicode word-boundary tables are not needed
+_TRENDING_WORD_RE = re.compile(r'\b[A-Za-z]{4,}\b', re.ASCII)
+
+# Words too generic to signal a trending story in these search results
+_TRENDING_STOPWORDS = frozenset({
+    'the', 'and', 'for', 'that', 'this', 'with', 'from', 'what', 'have', 'news', 'latest', 'updates',
+    'google', 'search', 'results', 'article', 'articles', 'content', 'more', 'about', 'also', 'been',
+    'could', 'after', 'into', 'their', 'them', 'then', 'there', 'these', 'they', 'were', 'will',
+    'would', 'year', 'years', 'says', 'said', 'like', 'just', 'city', 'today', 'time', 'times', 'india',
+    'indian', 'lucknow', 'delhi', 'mumbai', 'sport', 'sports', 'cricket', 'ipl', 'team', 'teams',
+    'live', 'highlights', 'match', 'points', 'table', 'current', 'situation', 'veda', 'learning', 'center',
+    'summer', 'carnival', 'check', 'schedule', 'player', 'result', 'ranking', 'admission', 'fees',
+    'review', 'official', 'information', 'guide', 'explained', 'beyond', 'revolutionizing', 'rise',
+    'state', 'beyond', 'future', 'trends', 'deep', 'dive', 'transformation', 'solutions', 'blog',
+    'report', 'conference', 'event', 'events', 'technologies', 'technology', 'services', 'service'
+})
+
+
 def detect_trending_topics(articles: list[dict]) -> dict:
     """Identify trending topics from article titles to prioritize important stories."""
-    all_text_for_trending = ""
-    for article in articles: 
-        title = article.get('title', '')
-        all_text_for_trending += f" {title}" 
+    all_text_for_trending = ' '.join(article.get('title') or '' for article in articles).lower()
 
     if not all_text_for_trending.strip():
         return {}
-    words = re.findall(r'\b[A-Za-z]{4,}\b', all_text_for_trending.lower()) 
-    stopwords = { # Expanded stopwords
-        'the', 'and', 'for', 'that', 'this', 'with', 'from', 'what', 'have', 'news', 'latest', 'updates',
-        'google', 'search', 'results', 'article', 'articles', 'content', 'more', 'about', 'also', 'been',
-        'could', 'after', 'into', 'their', 'them', 'then', 'there', 'these', 'they', 'were', 'will',
-        'would', 'year', 'years', 'says', 'said', 'like', 'just', 'city', 'today', 'time', 'times', 'india',
-        'indian', 'lucknow', 'delhi', 'mumbai', 'sport', 'sports', 'cricket', 'ipl', 'team', 'teams',
-        'live', 'highlights', 'match', 'points', 'table', 'current', 'situation', 'veda', 'learning', 'center',
-        'summer', 'carnival', 'check', 'schedule', 'player', 'result', 'ranking', 'admission', 'fees',
-        'review', 'official', 'information', 'guide', 'explained', 'beyond', 'revolutionizing', 'rise',
-        'state', 'beyond', 'future', 'trends', 'deep', 'dive', 'transformation', 'solutions', 'blog',
-        'report', 'conference', 'event', 'events', 'technologies', 'technology', 'services', 'service'
-    }
-    word_counts = Counter(words)
-    trending = {word: count for word, count in word_counts.items() if word not in stopwords and count > 1} 
-    sorted_trending = dict(sorted(trending.items(), key=lambda item: item[1], reverse=True)[:5])
+    # One streaming pass: stopwords are dropped before they are counted and no word list is materialized
+    word_counts = {}
+    for match in _TRENDING_WORD_RE.finditer(all_text_for_trending):
+        word = match.group()
+        if word in _TRENDING_STOPWORDS:
+            continue
+        word_counts[word] = word_counts.get(word, 0) + 1
+    trending = ((word, count) for word, count in word_counts.items() if count > 1)
+    sorted_trending = dict(heapq.nlargest(5, trending, key=itemgetter(1)))
     logger.info(f"Detected trending topics: {sorted_trending}")
     return sorted_trending
 
 
-def get_content_from_google_search(base_llm_query: str, location: str = None, lookback_hours: int = None) -> list[dict]:
-    """
-    Main orchestrator for Google Search.
-    """
-    logger.info(f"--- Starting Google Web Search & Extraction for base query: '{base_llm_query}' ---")
-    
+def _find_urls_for_query(base_llm_query: str, location: str | None, lookback_hours: int | None) -> list[dict]:
+    """Google Search half of the pipeline: the (url_info) entries to extract for this query."""
     query_for_api, relevant_trusted_domains, num_api_res_per_q, date_restrict_api = \
         determine_query_params_for_google(base_llm_query, location, lookback_hours)
+    if date_restrict_api == "d1":
+        clear_html_cache() # Last-24h queries must not be served pages cached by an earlier run
 
     urls_info_list = get_all_top_urls_orchestrator(
         query_for_api, # This is the query potentially modified with location and quotes
@@ -612,25 +1126,55 @@ def get_content_from_google_search(base_llm_query: str, location: str = None, lo
         logger.warning(f"[Pipeline] Diagnostics: query_for_api='{query_for_api}', relevant_trusted_domains={relevant_trusted_domains}, num_api_res_per_q={num_api_res_per_q}, date_restrict_api={date_restrict_api}")
         return []
             
+    trusted_domains = tuple(relevant_trusted_domains)
+    for url_info in urls_info_list:
+        domain = url_info.get('domain', '').lower()
+        url_info['trusted_domain'] = any(domain == d or domain.endswith('.' + d) for d in trusted_domains)
     logger.info(f"[Pipeline] Processing {len(urls_info_list)} unique URLs for content extraction.")
-    
-    processed_articles_before_filter = []
-    for url_info_item in urls_info_list:
-        article_data = extract_article_content(url_info_item)
+    return urls_info_list
+
+
+def get_content_from_google_search(base_llm_query: str, location: str = None, lookback_hours: int = None) -> list[dict]:
+    """
+    Main orchestrator for Google Search.
+    """
+    logger.info(f"--- Starting Google Web Search & Extraction for base query: '{base_llm_query}' ---")
+    now_utc = datetime.now(timezone.utc) # One clock reading for the date cutoff and the recency hints
+    urls_info_list = _find_urls_for_query(base_llm_query, location, lookback_hours)
+    if not urls_info_list:
+        return []
+    processed_articles = extract_articles_concurrently(urls_info_list)
+    return _select_articles_for_llm(processed_articles, base_llm_query, lookback_hours, now_utc)
+
+
+async def get_content_from_google_search_async(base_llm_query: str, location: str = None, lookback_hours: int = None) -> list[dict]:
+    """
+    Async counterpart of get_content_from_google_search, for callers that overlap the scrape with other I/O.
+    The Google API calls run on a worker thread; page downloads share the caller's event loop.
+    """
+    logger.info(f"--- Starting Google Web Search & Extraction (async) for base query: '{base_llm_query}' ---")
+    now_utc = datetime.now(timezone.utc)
+    urls_info_list = await asyncio.to_thread(_find_urls_for_query, base_llm_query, location, lookback_hours)
+    if not urls_info_list:
+        return []
+    processed_articles = await extract_articles_concurrently_async(urls_info_list)
+    return _select_articles_for_llm(processed_articles, base_llm_query, lookback_hours, now_utc)
+
+
+def _select_articles_for_llm(processed_articles_before_filter: list[dict], base_llm_query: str, lookback_hours: int | None, now_utc: datetime) -> list[dict]:
+    """Trending re-sort, lookback filtering and the final cut to TOTAL_URLS_TO_PROCESS_LIMIT articles."""
+    for article_data in processed_articles_before_filter:
         # Diagnostic: Log extraction note and content length
-        logger.info(f"[Pipeline] Extraction note: {article_data.get('extraction_note','N/A')} | Content length: {len(article_data.get('text',''))}")
-        processed_articles_before_filter.append(article_data)
+        logger.info(f"[Pipeline] Extraction note: {article_data.get('extraction_note','N/A')} | Content length: {article_data.get('text_len', 0)}")
 
     # Trending topics detection
     if "news" in base_llm_query.lower() or "latest" in base_llm_query.lower() or lookback_hours is not None:
         trending_topics = detect_trending_topics(processed_articles_before_filter)
         if trending_topics:
             for article in processed_articles_before_filter:
-                article['trending_score'] = 0
-                title_text = (article.get('title', '') + " " + article.get('text', '')[:500]).lower() 
-                for topic, count in trending_topics.items():
-                    if topic in title_text:
-                        article['trending_score'] += count
+                text_lower = article['_text_lower']
+                # Plain substring checks (at most 5 topics), so a topic inside another ("election" in "elections") still counts
+                article['trending_score'] = sum(count for topic, count in trending_topics.items() if topic in text_lower)
             processed_articles_before_filter.sort(key=lambda x: (x.get('trending_score', 0), x.get('publish_date') is not None), reverse=True)
             logger.info(f"  Articles re-sorted by trending topics. Top trending scores: {[a.get('trending_score',0) for a in processed_articles_before_filter[:3]]}")
 
@@ -638,21 +1182,14 @@ def get_content_from_google_search(base_llm_query: str, location: str = None, lo
     final_results_for_llm = []
     if lookback_hours is not None:
         logger.info(f"[Pipeline] Applying '{lookback_hours} hours' post-filtering (Google)...")
-        now_utc = datetime.now(timezone.utc) 
         cutoff_time = now_utc - timedelta(hours=lookback_hours)
         
         articles_with_valid_recent_dates = []
         articles_without_valid_dates_or_older = []
 
         for article in processed_articles_before_filter:
-            publish_date_dt = article.get('publish_date') 
-            if publish_date_dt and isinstance(publish_date_dt, datetime.datetime): 
-                if publish_date_dt.tzinfo is None or publish_date_dt.tzinfo.utcoffset(publish_date_dt) is None: 
-                    publish_date_dt = publish_date_dt.replace(tzinfo=timezone.utc) 
-                else: 
-                    publish_date_dt = publish_date_dt.astimezone(timezone.utc)
-                article['publish_date'] = publish_date_dt # Store the timezone-aware version
-
+            publish_date_dt = article.get('publish_date') # Already tz-aware UTC or None (see parse_article_html)
+            if publish_date_dt: 
                 if publish_date_dt >= cutoff_time:
                     articles_with_valid_recent_dates.append(article)
                 else:
@@ -664,22 +1201,19 @@ def get_content_from_google_search(base_llm_query: str, location: str = None, lo
         needed_more = TOTAL_URLS_TO_PROCESS_LIMIT - len(final_results_for_llm)
 
         if needed_more > 0:
-            articles_without_valid_dates_or_older.sort(key=lambda x: (x.get('trending_score', 0), len(x.get('text',''))), reverse=True)
+            articles_without_valid_dates_or_older.sort(key=lambda x: (x.get('trending_score', 0), x.get('text_len', 0)), reverse=True)
+            today_dt = now_utc
+            yesterday_dt = today_dt - timedelta(days=1)
+            recency_hints = ('today', 'breaking', 'latest', 'hours ago', 'just now',
+                             'this morning', 'this afternoon', 'this evening', 'yesterday',
+                             today_dt.strftime('%B %d').lower(), today_dt.strftime('%d %B').lower(),
+                             yesterday_dt.strftime('%B %d').lower(), yesterday_dt.strftime('%d %B').lower())
+            recency_re = re.compile('|'.join(map(re.escape, recency_hints))) # One scan per article instead of one per hint
             
             for article in articles_without_valid_dates_or_older:
                 if len(final_results_for_llm) >= TOTAL_URLS_TO_PROCESS_LIMIT: break
-                if article.get('text') and len(article.get('text')) >= MIN_CONTENT_LENGTH:
-                    text_lower = article.get('text', '').lower()[:1000] # Check first 1000 chars
-                    today_dt = datetime.now(timezone.utc) # Use timezone aware for today
-                    today_str_formats = [today_dt.strftime('%B %d').lower(), today_dt.strftime('%d %B').lower()]
-                    yesterday_dt = today_dt - timedelta(days=1)
-                    yesterday_str_formats = [yesterday_dt.strftime('%B %d').lower(), yesterday_dt.strftime('%d %B').lower()]
-                    
-                    recency_hints = ['today', 'breaking', 'latest', 'hours ago', 'just now', 
-                                     'this morning', 'this afternoon', 'this evening', 'yesterday'] + \
-                                    today_str_formats + yesterday_str_formats
-                    
-                    if any(hint in text_lower for hint in recency_hints):
+                if article.get('text_len', 0) >= MIN_CONTENT_LENGTH:
+                    if recency_re.search(article['_text_lower']):
                         logger.warning(f"  Article kept despite '{lookback_hours}h' filter due to missing date but good content & recency hints: {article.get('url')}")
                         final_results_for_llm.append(article)
                     elif article.get('trending_score',0) > 0:
@@ -691,16 +1225,16 @@ def get_content_from_google_search(base_llm_query: str, location: str = None, lo
                      logger.info(f"  Filtered out (no valid date & insufficient content): {article.get('url')}")
         logger.info(f"[Pipeline] Retained {len(final_results_for_llm)} articles after '{lookback_hours} hours' filter (Google).")
     else: 
+        min_content_length = MIN_CONTENT_LENGTH # Local lookup inside the comprehension
         final_results_for_llm = [
             article for article in processed_articles_before_filter 
-            if article.get('text') and len(article.get('text')) >= MIN_CONTENT_LENGTH
+            if article.get('text_len', 0) >= min_content_length
         ]
-        if any('trending_score' in article for article in final_results_for_llm):
-            final_results_for_llm.sort(key=lambda x: x.get('trending_score', 0), reverse=True)
         logger.info(f"[Pipeline] Retained {len(final_results_for_llm)} articles with substantial content (no time filter, Google).")
 
     final_results_for_llm = final_results_for_llm[:TOTAL_URLS_TO_PROCESS_LIMIT]
-    successful_extractions = len([a for a in final_results_for_llm if a.get('text') and len(a['text']) >= MIN_CONTENT_LENGTH])
+    # Dated recent articles skip the content check above, so this still has to count rather than use len()
+    successful_extractions = sum(1 for a in final_results_for_llm if a.get('text_len', 0) >= MIN_CONTENT_LENGTH)
     logger.info(f"[Pipeline] Final processing complete. Returning {successful_extractions} articles with substantial text (Google).")
     return final_results_for_llm
 
@@ -731,7 +1265,7 @@ if __name__ == '__main__':
                     logger.info(f"  URL: {article.get('url')}")
                     logger.info(f"  Title: {article.get('title')}")
                     pub_date_display = article.get('publish_date')
-                    if isinstance(pub_date_display, datetime.datetime): 
+                    if isinstance(pub_date_display, datetime): 
                         pub_date_display = pub_date_display.strftime('%Y-%m-%d %H:%M:%S %Z')
                     logger.info(f"  Published: {pub_date_display}")
                     logger.info(f"  Domain: {article.get('domain')}")
@@ -0,0 +1,320 @@
+# llm_cache.py
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+import logging
+import functools
+import asyncio
+import concurrent.futures
+from typing import Protocol
+
+# Semantic cache (Optional): needs sentence-transformers (which brings numpy) for local embeddings
+try:
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_CACHE_AVAILABLE = True
+except ImportError:
+    SEMANTIC_CACHE_AVAILABLE = False
+
+# Fast JSON (Optional): orjson serializes cache-key payloads several times faster than the stdlib
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# diskcache (Optional): process-safe SQLite cache with size-bounded eviction; without it DiskBackend is used
+try:
+    import diskcache
+    DISKCACHE_AVAILABLE = True
+except ImportError:
+    DISKCACHE_AVAILABLE = False
+
+logger = logging.getLogger('llm_cache')
+
+LLM_CACHE_DIR = os.environ.get("LLM_CACHE_DIR", ".llm_cache")
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "true").lower() == "true"
+DEFAULT_TTL_SECONDS = 86400
+LLM_CACHE_SIZE_LIMIT = int(os.environ.get("LLM_CACHE_SIZE_LIMIT", 2**30)) # Bytes; diskcache evicts least-recently-stored entries past it
+SQLITE_BUSY_TIMEOUT_SECONDS = 5.0
+EMBEDDING_MODEL_NAME = os.environ.get("LLM_CACHE_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+
+class CacheBackend(Protocol):
+    """Minimal key/value interface every response cache backend implements."""
+
+    def get(self, key: str) -> str | None: ...
+
+    def set(self, key: str, value: str, ttl: int | None = None) -> None: ...
+
+    def delete(self, key: str) -> None: ...
+
+
+class DiskBackend:
+    """
+    SQLite-backed cache. Entries carry their own expiry timestamp and are
+    treated as misses (and removed) once it has passed.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        # check_same_thread=False: Streamlit and the batch helpers call in from worker threads; access is serialized by _lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_SECONDS)
+        # WAL lets other worker processes read while one writes, so restarts and sibling workers share hits
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache(key TEXT PRIMARY KEY, value TEXT, ts INTEGER)")
+        self._conn.commit()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value, ts FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at and expires_at < int(time.time()):
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return value
+
+    def set(self, key: str, value: str, ttl: int | None = None) -> None:
+        expires_at = int(time.time()) + ttl if ttl else 0
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO cache(key, value, ts) VALUES (?, ?, ?)", (key, value, expires_at))
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+
+class DiskcacheBackend:
+    """diskcache.Cache adapter: expiry and eviction are handled by diskcache itself, safe across processes."""
+
+    def __init__(self, directory: str, size_limit: int = LLM_CACHE_SIZE_LIMIT):
+        self._cache = diskcache.Cache(directory, size_limit=size_limit)
+
+    def get(self, key: str) -> str | None:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: str, ttl: int | None = None) -> None:
+        self._cache.set(key, value, expire=ttl)
+
+    def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+
+def serialize_request(model_name: str, messages: list[dict], temperature: float) -> bytes:
+    """
+    Canonical JSON of everything that determines the completion. Compact separators and
+    no ASCII escaping keep multi-KB outlines from being inflated before hashing.
+    """
+    payload = {"model": model_name, "messages": messages, "temperature": temperature}
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def make_cache_key(model_name: str, messages: list[dict], temperature: float) -> str:
+    """SHA256 over serialize_request(). Computed once per call; retries reuse the same key and messages."""
+    return hashlib.sha256(serialize_request(model_name, messages, temperature)).hexdigest()
+
+
+class ResponseCache:
+    """Exact-match response cache with hit/miss counters for observability."""
+
+    def __init__(self, backend: CacheBackend, default_ttl: int = DEFAULT_TTL_SECONDS):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key: str) -> str | None:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"[LLM Cache] Lookup failed, treating as miss: {e}")
+            value = None
+        if value is None:
+            self.stats["misses"] += 1
+        else:
+            self.stats["hits"] += 1
+        return value
+
+    def set(self, key: str, value: str, ttl: int | None = None) -> None:
+        try:
+            self.backend.set(key, value, ttl=ttl or self.default_ttl)
+        except Exception as e:
+            logger.warning(f"[LLM Cache] Could not store entry: {e}")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key runs the function, and every
+    caller arriving while it is in flight waits for and shares its result (or exception).
+    Nothing is kept once the call completes; persistence is the response cache's job.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    def do(self, key: str, fn, *args, **kwargs):
+        with self._lock:
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = self._inflight[key] = concurrent.futures.Future()
+                self.stats["calls"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        if not is_leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def ado(self, key: str, fn, *args, **kwargs):
+        """Async counterpart of do(); `fn` must return an awaitable. Calls only coalesce within one event loop."""
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        with self._lock:
+            future = self._inflight.get(flight_key)
+            is_leader = future is None
+            if is_leader:
+                future = self._inflight[flight_key] = loop.create_future()
+                self.stats["calls"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        if not is_leader:
+            return await asyncio.shield(future)
+        try:
+            result = await fn(*args, **kwargs)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception() # Mark retrieved so an exception nobody waited on is not logged as lost
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(flight_key, None)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> ResponseCache | None:
+    """Shared on-disk response cache, or None when disabled via LLM_CACHE_ENABLED=false."""
+    global _default_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            if DISKCACHE_AVAILABLE:
+                backend = DiskcacheBackend(os.path.join(LLM_CACHE_DIR, "responses"))
+            else:
+                backend = DiskBackend(os.path.join(LLM_CACHE_DIR, "responses.sqlite3"))
+            _default_cache = ResponseCache(backend)
+        return _default_cache
+
+
+@functools.lru_cache(maxsize=1)
+def get_embedding_model():
+    """Loads the local sentence-transformers model once per process."""
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+
+def local_embed(text: str):
+    """Unit-normalized float32 embedding, so cosine similarity is a plain dot product."""
+    return get_embedding_model().encode(text, normalize_embeddings=True).astype(np.float32)
+
+
+class SemanticCache:
+    """
+    Near-duplicate cache: stores (embedding, response) rows in SQLite and returns the
+    stored response when a new text's cosine similarity to a live row meets the threshold.
+    Rows are namespaced (e.g. by model name) and expire after their TTL.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.95, ttl: int = DEFAULT_TTL_SECONDS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_SECONDS)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS semantic_cache(namespace TEXT, embedding BLOB, value TEXT, ts INTEGER)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS semantic_cache_ns ON semantic_cache(namespace)")
+        self._conn.commit()
+
+    def lookup(self, namespace: str, text: str) -> str | None:
+        try:
+            query_embedding = local_embed(text)
+            now = int(time.time())
+            with self._lock:
+                self._conn.execute("DELETE FROM semantic_cache WHERE ts < ?", (now,))
+                rows = self._conn.execute("SELECT embedding, value FROM semantic_cache WHERE namespace = ?", (namespace,)).fetchall()
+                self._conn.commit()
+            if rows:
+                matrix = np.frombuffer(b"".join(row[0] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+                similarities = matrix @ query_embedding
+                best_idx = int(similarities.argmax())
+                if similarities[best_idx] >= self.threshold:
+                    self.stats["hits"] += 1
+                    logger.info(f"[Semantic Cache] Hit in '{namespace}' (similarity {similarities[best_idx]:.3f}).")
+                    return rows[best_idx][1]
+        except Exception as e:
+            logger.warning(f"[Semantic Cache] Lookup failed, treating as miss: {e}")
+        self.stats["misses"] += 1
+        return None
+
+    def store(self, namespace: str, text: str, value: str) -> None:
+        try:
+            embedding = local_embed(text)
+            with self._lock:
+                self._conn.execute("INSERT INTO semantic_cache(namespace, embedding, value, ts) VALUES (?, ?, ?, ?)",
+                                   (namespace, embedding.tobytes(), value, int(time.time()) + self.ttl))
+                self._conn.commit()
+        except Exception as e:
+            logger.warning(f"[Semantic Cache] Could not store entry: {e}")
+
+
+_semantic_caches = {}
+
+
+def get_semantic_cache(name: str = "default", threshold: float = 0.95, ttl: int = DEFAULT_TTL_SECONDS) -> SemanticCache | None:
+    """
+    Shared semantic cache stored alongside the exact-match cache, or None when caching is
+    disabled or sentence-transformers is not installed.
+    """
+    if not LLM_CACHE_ENABLED or not SEMANTIC_CACHE_AVAILABLE:
+        return None
+    with _default_cache_lock:
+        if name not in _semantic_caches:
+            _semantic_caches[name] = SemanticCache(os.path.join(LLM_CACHE_DIR, f"semantic_{name}.sqlite3"), threshold=threshold, ttl=ttl)
+        return _semantic_caches[name]
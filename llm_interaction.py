@@ -1,72 +1,140 @@
 # llm_interaction.py
 import os
-import openai
+import atexit
+import asyncio
+import weakref
+import threading
+import functools
+import hashlib
 import json
+import logging
+import math
+import re
 import datetime # Ensure datetime is imported
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+import llm_cache
+import llm_rate_limit
+import llm_retry
+import llm_tokens
 
 from dotenv import load_dotenv
 load_dotenv()
 
+logger = logging.getLogger('llm_interaction')
+
+# openai (which pulls in httpx, pydantic and anyio) is imported on first use, so importing this module stays cheap
+if TYPE_CHECKING:
+    import openai
+
 OPENROUTER_API_KEY = os.environ.get("OPENROUTER_API_KEY")
 # Defaulting to model from user's provided code
 DEFAULT_MODEL_NAME = os.environ.get("DEFAULT_MODEL_NAME", "nousresearch/deephermes-3-mistral-24b-preview:free") 
+# Phase 1 only rewrites the query, so a small fast model is enough; Phase 2 writes the outline and needs the strong one
+PHASE1_MODEL_NAME = os.environ.get("PHASE1_MODEL_NAME", "mistralai/mistral-7b-instruct:free")
+PHASE2_MODEL_NAME = os.environ.get("PHASE2_MODEL_NAME", DEFAULT_MODEL_NAME)
 OPENROUTER_API_BASE = "https://openrouter.ai/api/v1"
+LLM_TEMPERATURE = 0.2
+LLM_CACHE_TTL = 86400
+PHASE1_SEMANTIC_THRESHOLD = float(os.environ.get("PHASE1_SEMANTIC_THRESHOLD", 0.92))
+PHASE1_SEMANTIC_TTL = 3600 # Search-query plans go stale faster than full responses
+# JSON mode needs a model that honours response_format, so it is opt-in; the SEARCH_QUERY text format stays the fallback
+PHASE1_JSON_MODE = os.environ.get("PHASE1_JSON_MODE", "false").lower() == "true"
+PHASE1_JSON_MAX_TOKENS = 800
+# Opt-in: for small article sets, write the outline and its elaboration in one JSON request instead of two calls
+COMBINED_ELABORATION = os.environ.get("COMBINED_ELABORATION", "false").lower() == "true"
+# Whole built prompt (system prompt included). A full Phase 2 prompt (PHASE2_MAX_ARTICLES x PHASE2_MAX_PARAGRAPHS_PER_ARTICLE)
+# of long paragraphs exceeds this; short article sets fit
+COMBINED_MAX_PROMPT_TOKENS = int(os.environ.get("COMBINED_MAX_PROMPT_TOKENS", 3000))
+# Queries that already read like search queries skip the Phase 1 LLM call entirely
+PHASE1_FAST_PATH = os.environ.get("PHASE1_FAST_PATH", "true").lower() == "true"
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 4))
+LLM_MAX_ATTEMPTS = 6
+LLM_RETRY_MAX_WAIT = 30.0
+PHASE2_MAX_CONTEXT_TOKENS = int(os.environ.get("PHASE2_MAX_CONTEXT_TOKENS", 28000)) # Article budget, leaving room for the response
+# Paragraphs kept per article (best BM25 match to the query); shrinks Phase 2 prefill well below the token budget
+PHASE2_MAX_PARAGRAPHS_PER_ARTICLE = int(os.environ.get("PHASE2_MAX_PARAGRAPHS_PER_ARTICLE", 4))
+# At most this many articles (best by PHASE2_RANK_WEIGHTS score) go into the Phase 2 prompt; 0 keeps them all
+PHASE2_MAX_ARTICLES = int(os.environ.get("PHASE2_MAX_ARTICLES", 5))
+PHASE2_RANK_WEIGHTS = {"relevance": 0.5, "recency": 0.3, "domain": 0.2}
+RECENCY_HALF_LIFE_DAYS = 7 # Recency score halves at this age
+BM25_K1 = 1.5
+BM25_B = 0.75
+LLM_REQUEST_TIMEOUT = 40.0 # Per attempt, so one hung request cannot stall a phase indefinitely
+# Model ids whose provider only caches prompt prefixes marked with cache_control
+PROMPT_CACHE_CONTROL_MODEL_PREFIXES = ("anthropic/",)
+
+if not OPENROUTER_API_KEY:
+    logger.warning("OPENROUTER_API_KEY environment variable not set. LLM calls will fail.")
+
+# Pooled HTTP/OpenAI clients are built lazily, once per process (rebuilt after a fork, whose parent's pool is unusable)
+_CLIENT_STATE = {"pid": None, "client": None}
+_CLIENT_LOCK = threading.Lock()
+
+
+def _http_client_options() -> dict:
+    import httpx
+    return {
+        # Sized for bursts of concurrent Phase 2 calls; the SDK's default pool raises PoolTimeout under load
+        "limits": httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0),
+        "timeout": httpx.Timeout(60.0, connect=10.0),
+    }
 
-CLIENT = None
-if OPENROUTER_API_KEY:
-    CLIENT = openai.OpenAI(
+
+def _build_client() -> "openai.OpenAI | None":
+    if not OPENROUTER_API_KEY:
+        return None
+    import httpx
+    import openai
+    http_client = httpx.Client(**_http_client_options())
+    atexit.register(http_client.close)
+    return openai.OpenAI(
         base_url=OPENROUTER_API_BASE,
         api_key=OPENROUTER_API_KEY,
+        http_client=http_client, # Keep-alive connections are reused across Phase 1 and Phase 2 calls
+        max_retries=0, # Retries are handled by llm_retry so they are not multiplied by the SDK's own
     )
-else:
-    print("Warning: OPENROUTER_API_KEY environment variable not set. LLM calls will fail.")
+
+
+def get_client() -> "openai.OpenAI | None":
+    """Returns this process's shared OpenAI client for OpenRouter (None without an API key), building it on first use."""
+    pid = os.getpid()
+    if _CLIENT_STATE["pid"] != pid:
+        with _CLIENT_LOCK:
+            if _CLIENT_STATE["pid"] != pid:
+                _CLIENT_STATE["client"] = _build_client()
+                _CLIENT_STATE["pid"] = pid
+    return _CLIENT_STATE["client"]
 
 CURRENT_YEAR = datetime.datetime.now().year # This will be 2025 in our scenario
 
-def _call_llm(messages: list[dict], model_name: str = DEFAULT_MODEL_NAME) -> tuple[str | None, str | None]:
-    """
-    Private helper function to make a call to the LLM.
-    Includes robust error handling and response validation.
-    """
-    if not CLIENT:
-        error_message = "OpenRouter client not initialized. API key might be missing."
-        print(f"Error in _call_llm: {error_message}")
-        return None, error_message
-    try:
-        print(f"[LLM Call] Requesting completion from model: {model_name} with {len(messages)} messages.")
-        chat_completion = CLIENT.chat.completions.create(
-            model=model_name,
-            messages=messages,
-            temperature=0.2 
-        )
-        
-        if hasattr(chat_completion, 'error') and chat_completion.error:
-            api_error_message = chat_completion.error.get('message', 'Unknown API error in response object.')
-            api_error_code = chat_completion.error.get('code', 'N/A')
-            error_message = (f"LLM API returned an error in the response object: "
-                             f"Code {api_error_code} - {api_error_message}\n"
-                             f"Full error object: {str(chat_completion.error)}")
-            print(f"Error in _call_llm (API error in response): {error_message}")
-            return None, error_message
+@functools.lru_cache(maxsize=1)
+def _retryable_errors() -> tuple:
+    """Transient failures worth retrying in place; other 4xx (bad request, auth) fail immediately."""
+    import openai
+    return (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
 
-        if chat_completion and \
-           hasattr(chat_completion, 'choices') and \
-           chat_completion.choices and \
-           len(chat_completion.choices) > 0 and \
-           chat_completion.choices[0] and \
-           hasattr(chat_completion.choices[0], 'message') and \
-           chat_completion.choices[0].message and \
-           hasattr(chat_completion.choices[0].message, 'content') and \
-           chat_completion.choices[0].message.content is not None:
-            response_content = chat_completion.choices[0].message.content
-            print(f"[LLM Call] Received response content (length: {len(response_content)}).")
-            return response_content, response_content 
-        else:
-            error_message = "LLM API call succeeded but response structure was unexpected or content was missing.\n"
-            error_message += f"Chat completion object (str): {str(chat_completion)}\n"
-            print(f"Error in _call_llm (unexpected structure): {error_message}")
-            return None, error_message
-    except openai.APIStatusError as e: 
+# A finished (newline-terminated) Phase 1 answer line; once streamed, the rest of the generation is not needed
+_SEARCH_QUERY_LINE_RE = re.compile(r'^SEARCH_QUERY:[ \t]*\S.*\n', re.MULTILINE)
+# First non-empty SEARCH_QUERY line and the Phase 2 outline marker, each found with a single scan of the response
+_SEARCH_QUERY_RE = re.compile(r'^SEARCH_QUERY:[ \t]*(\S.*?)[ \t\r]*$', re.MULTILINE)
+_OUTLINE_SPLIT_RE = re.compile(r'BRIEF_INFORMATION_OUTLINE:\s*')
+_NUMBER_RE = re.compile(r'\d+')
+# Article text cleanup before packing into the Phase 2 prompt
+_INLINE_WS_RE = re.compile(r'[ \t\f\v\u00a0]+')
+_EXTRA_NEWLINES_RE = re.compile(r'\n{3,}')
+_BM25_TERM_RE = re.compile(r'\w+')
+# Phase 1 fast path: short keyword-style queries that already pin a timeframe
+_KEYWORD_QUERY_RE = re.compile(r'^[\w\s\-+"\']{1,80}$')
+_QUESTION_OR_COMMAND_RE = re.compile(r'\b(?:tell|find|what|who|when|where|which|how|why|explain|show|give|i|me|my|you|your)\b', re.I)
+_TIMEFRAME_RE = re.compile(r'\b(?:(?:19|20)\d{2}|latest|today|current|recent)\b', re.I)
+
+
+def _describe_llm_exception(e: Exception) -> str:
+    """Human readable message for an exception raised while calling the OpenRouter API."""
+    import openai
+    if isinstance(e, openai.APIStatusError): # Includes RateLimitError and AuthenticationError
         error_message = f"OpenRouter API Status Error (Status {e.status_code}): {getattr(e, 'message', str(e))}\n"
         raw_text = "N/A"
         if e.response is not None:
@@ -75,152 +143,704 @@ def _call_llm(messages: list[dict], model_name: str = DEFAULT_MODEL_NAME) -> tup
         error_message += f"Raw response text: {raw_text}"
         if e.status_code == 429 or "rate limit" in getattr(e, 'message', str(e)).lower():
             error_message += "\nThis appears to be a rate limit error from the API."
-        print(f"Error in _call_llm (APIStatusError): {error_message}")
-        return None, error_message
-    except openai.APIConnectionError as e:
-        error_message = f"OpenRouter API Connection Error: {e}. Network issue or server unavailable."
-    except openai.RateLimitError as e: 
-        error_message = f"OpenRouter Rate Limit Exceeded (RateLimitError exception): {e}"
-    except openai.AuthenticationError as e: 
-        error_message = f"OpenRouter Authentication Error: {e}. Check API key."
-    except openai.APIError as e: 
+        return error_message
+    if isinstance(e, openai.APIConnectionError):
+        return f"OpenRouter API Connection Error: {e}. Network issue or server unavailable."
+    if isinstance(e, openai.APIError):
         error_message = f"OpenRouter APIError ({type(e).__name__}): {e}."
         raw_text = "N/A"
         if hasattr(e, 'response') and e.response is not None and hasattr(e.response, 'text'):
             try: raw_text = e.response.text
             except Exception: raw_text = "Could not read raw response text."
-        error_message += f" Raw response: {raw_text}"
-    except json.JSONDecodeError as e: 
-        error_message = f"JSON Decode Error during LLM call ({type(e).__name__}): {e}.\n"
-        error_message += ("API server returned non-JSON response. Possible server issue or HTML error page.")
-    except Exception as e: 
-        error_message = f"An truly unexpected error occurred during LLM call ({type(e).__name__}): {e}."
-        print(f"Error in _call_llm (general exception): {error_message}")
+        return error_message + f" Raw response: {raw_text}"
+    if isinstance(e, json.JSONDecodeError):
+        return (f"JSON Decode Error during LLM call ({type(e).__name__}): {e}.\n"
+                "API server returned non-JSON response. Possible server issue or HTML error page.")
+    return f"An truly unexpected error occurred during LLM call ({type(e).__name__}): {e}."
+
+
+def _extract_response_content(chat_completion) -> tuple[str | None, str | None]:
+    """(content, None) for a usable completion, otherwise (None, error message)."""
+    if hasattr(chat_completion, 'error') and chat_completion.error:
+        api_error_message = chat_completion.error.get('message', 'Unknown API error in response object.')
+        api_error_code = chat_completion.error.get('code', 'N/A')
+        error_message = (f"LLM API returned an error in the response object: "
+                         f"Code {api_error_code} - {api_error_message}\n"
+                         f"Full error object: {str(chat_completion.error)}")
+        logger.error("Error in _call_llm (API error in response): %s", error_message)
+        return None, error_message
+
+    try:
+        response_content = chat_completion.choices[0].message.content
+        if response_content is None:
+            raise ValueError("message content is null")
+    except (AttributeError, IndexError, TypeError, ValueError) as e:
+        error_message = ("LLM API call succeeded but response structure was unexpected or content was missing "
+                         f"({type(e).__name__}: {e}).\n"
+                         f"Chat completion object (str): {chat_completion!s}\n")
+        logger.error("Error in _call_llm (unexpected structure): %s", error_message)
         return None, error_message
+    return response_content, None
 
 
-def get_search_query_and_cot(user_query: str, model_name: str = DEFAULT_MODEL_NAME) -> tuple[str | None, str | None]:
+def _call_llm(messages: list[dict], model_name: str = DEFAULT_MODEL_NAME, **create_kwargs) -> tuple[str | None, str | None]:
     """
-    Phase 1: Gets the refined search query and the LLM's chain of thought for planning.
-    This version uses the prompt structure from the user's provided code.
+    Private helper function to make a call to the LLM.
+    Includes robust error handling and response validation.
+    Extra keyword arguments (e.g. response_format) are passed to the completion request.
+    """
+    client = get_client()
+    if not client:
+        error_message = "OpenRouter client not initialized. API key might be missing."
+        logger.error("Error in _call_llm: %s", error_message)
+        return None, error_message
+
+    response_cache = llm_cache.get_default_cache()
+    if response_cache:
+        cache_key = llm_cache.make_cache_key(model_name, messages, LLM_TEMPERATURE)
+        cached_content = response_cache.get(cache_key)
+        if cached_content is not None:
+            logger.info("[LLM Call] Cache hit for model: %s (stats: %s)", model_name, response_cache.stats)
+            return cached_content, cached_content
+    try:
+        logger.info("[LLM Call] Requesting completion from model: %s with %d messages.", model_name, len(messages))
+        chat_completion = llm_retry.call_with_retry(
+            llm_rate_limit.paced(client.chat.completions.create, messages),
+            model=model_name,
+            messages=messages,
+            temperature=LLM_TEMPERATURE,
+            timeout=LLM_REQUEST_TIMEOUT,
+            **create_kwargs,
+            retry_on=_retryable_errors(),
+            max_attempts=LLM_MAX_ATTEMPTS,
+            max_wait=LLM_RETRY_MAX_WAIT,
+        )
+    except Exception as e:
+        error_message = _describe_llm_exception(e)
+        logger.error("Error in _call_llm (%s): %s", type(e).__name__, error_message)
+        return None, error_message
+
+    response_content, error_message = _extract_response_content(chat_completion)
+    if response_content is None:
+        return None, error_message
+    logger.info("[LLM Call] Received response content (length: %d).", len(response_content))
+    if response_cache:
+        response_cache.set(cache_key, response_content, ttl=LLM_CACHE_TTL)
+    return response_content, response_content 
+
+
+def _stream_llm(messages: list[dict], model_name: str = DEFAULT_MODEL_NAME, stop_pattern: re.Pattern | None = None, **create_kwargs):
     """
-    print(f"\n[LLM Interaction] Phase 1: Getting search query for: '{user_query}'")
+    Streaming form of _call_llm: a generator that yields content deltas as they arrive and returns
+    (full_response, error_message) like _call_llm (use `yield from`). When stop_pattern matches the
+    accumulated text the stream is closed early, so the remainder of the generation is never produced.
+    Extra keyword arguments (e.g. response_format, max_tokens) are passed to the completion request.
+    """
+    client = get_client()
+    if not client:
+        error_message = "OpenRouter client not initialized. API key might be missing."
+        logger.error("Error in _stream_llm: %s", error_message)
+        return None, error_message
+
+    response_cache = llm_cache.get_default_cache()
+    if response_cache:
+        cache_key = llm_cache.make_cache_key(model_name, messages, LLM_TEMPERATURE)
+        cached_content = response_cache.get(cache_key)
+        if cached_content is not None:
+            logger.info("[LLM Call] Cache hit for model: %s (stats: %s)", model_name, response_cache.stats)
+            yield cached_content
+            return cached_content, cached_content
+
+    chunks = []
+    stopped_early = False
+    try:
+        logger.info("[LLM Call] Streaming completion from model: %s with %d messages.", model_name, len(messages))
+        # Only opening the stream is retried; a failure part-way through is reported like any other error
+        stream = llm_retry.call_with_retry(
+            llm_rate_limit.paced(client.chat.completions.create, messages),
+            model=model_name,
+            messages=messages,
+            temperature=LLM_TEMPERATURE,
+            timeout=LLM_REQUEST_TIMEOUT,
+            stream=True,
+            **create_kwargs,
+            retry_on=_retryable_errors(),
+            max_attempts=LLM_MAX_ATTEMPTS,
+            max_wait=LLM_RETRY_MAX_WAIT,
+        )
+        try:
+            for chunk in stream:
+                if not chunk.choices: # e.g. a trailing usage-only chunk
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                chunks.append(delta)
+                yield delta
+                if stop_pattern is not None and '\n' in delta and stop_pattern.search(''.join(chunks)):
+                    stopped_early = True
+                    break
+        finally:
+            stream.close() # Also aborts the HTTP response when we stop early or the consumer goes away
+    except Exception as e:
+        error_message = _describe_llm_exception(e)
+        logger.error("Error in _stream_llm (%s): %s", type(e).__name__, error_message)
+        return None, error_message
+
+    response_content = ''.join(chunks)
+    if not response_content:
+        error_message = "LLM API stream finished without returning any content."
+        logger.error("Error in _stream_llm: %s", error_message)
+        return None, error_message
+    logger.info("[LLM Call] Streamed response content (length: %d%s).", len(response_content), ", stopped early" if stopped_early else "")
+    if response_cache:
+        response_cache.set(cache_key, response_content, ttl=LLM_CACHE_TTL)
+    return response_content, response_content
+
+
+# AsyncOpenAI clients (and the semaphore bounding their concurrency) are bound to the event loop they were created on
+_ASYNC_STATE = weakref.WeakKeyDictionary()
+
+def _get_async_state() -> "tuple[openai.AsyncOpenAI, asyncio.Semaphore] | None":
+    if not OPENROUTER_API_KEY:
+        return None
+    import httpx
+    import openai
+    loop = asyncio.get_running_loop()
+    state = _ASYNC_STATE.get(loop)
+    if state is None:
+        state = _ASYNC_STATE[loop] = (
+            openai.AsyncOpenAI(base_url=OPENROUTER_API_BASE, api_key=OPENROUTER_API_KEY, max_retries=0,
+                               http_client=httpx.AsyncClient(**_http_client_options())),
+            asyncio.Semaphore(LLM_MAX_CONCURRENCY),
+        )
+    return state
+
+
+async def _aread_stream(stream, stop_pattern: re.Pattern) -> tuple[str, bool]:
+    """Collects the content of an async completion stream, closing it as soon as stop_pattern matches the accumulated text."""
+    chunks = []
+    try:
+        async for chunk in stream:
+            if not chunk.choices: # e.g. a trailing usage-only chunk
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            chunks.append(delta)
+            if '\n' in delta and stop_pattern.search(''.join(chunks)):
+                return ''.join(chunks), True
+    finally:
+        await stream.close() # Also aborts the HTTP response when we stop early
+    return ''.join(chunks), False
+
+
+async def _acall_llm(messages: list[dict], model_name: str = DEFAULT_MODEL_NAME, stop_pattern: re.Pattern | None = None, **create_kwargs) -> tuple[str | None, str | None]:
+    """
+    Async mirror of _call_llm, sharing its response cache. At most LLM_MAX_CONCURRENCY
+    requests per event loop are in flight at once. When stop_pattern is given the response is streamed
+    and cut off as soon as it matches, like _stream_llm. Extra keyword arguments are passed to the completion request.
+    """
+    state = _get_async_state()
+    if not state:
+        error_message = "OpenRouter client not initialized. API key might be missing."
+        logger.error("Error in _acall_llm: %s", error_message)
+        return None, error_message
+    async_client, semaphore = state
+
+    response_cache = llm_cache.get_default_cache()
+    if response_cache:
+        cache_key = llm_cache.make_cache_key(model_name, messages, LLM_TEMPERATURE)
+        cached_content = response_cache.get(cache_key)
+        if cached_content is not None:
+            logger.info("[LLM Call] Cache hit for model: %s (stats: %s)", model_name, response_cache.stats)
+            return cached_content, cached_content
+    async def _create(**kwargs):
+        async with semaphore: # Held per attempt only, so backoff sleeps do not occupy a slot
+            response = await async_client.chat.completions.create(**kwargs)
+            if stop_pattern is None:
+                return response
+            # Read inside the attempt so the stream keeps its slot; a failure part-way through restarts the request
+            return await _aread_stream(response, stop_pattern)
+
+    if stop_pattern is not None:
+        create_kwargs["stream"] = True
+    try:
+        logger.info("[LLM Call] (async) Requesting completion from model: %s with %d messages.", model_name, len(messages))
+        chat_completion = await llm_retry.acall_with_retry(
+            llm_rate_limit.apaced(_create, messages),
+            model=model_name,
+            messages=messages,
+            temperature=LLM_TEMPERATURE,
+            timeout=LLM_REQUEST_TIMEOUT,
+            **create_kwargs,
+            retry_on=_retryable_errors(),
+            max_attempts=LLM_MAX_ATTEMPTS,
+            max_wait=LLM_RETRY_MAX_WAIT,
+        )
+    except Exception as e:
+        error_message = _describe_llm_exception(e)
+        logger.error("Error in _acall_llm (%s): %s", type(e).__name__, error_message)
+        return None, error_message
+
+    stopped_early = False
+    if stop_pattern is None:
+        response_content, error_message = _extract_response_content(chat_completion)
+        if response_content is None:
+            return None, error_message
+    else:
+        response_content, stopped_early = chat_completion
+        if not response_content:
+            error_message = "LLM API stream finished without returning any content."
+            logger.error("Error in _acall_llm: %s", error_message)
+            return None, error_message
+    logger.info("[LLM Call] (async) Received response content (length: %d%s).", len(response_content), ", stopped early" if stopped_early else "")
+    if response_cache:
+        response_cache.set(cache_key, response_content, ttl=LLM_CACHE_TTL)
+    return response_content, response_content
+
+
+# Static Phase 1 instructions, built once at import. The user query travels only in the user message,
+# so this string is byte-identical across requests and can be served from the provider's prompt cache.
+_PHASE1_SYSTEM_PROMPT = (
+    f"You are a search query generation assistant. The current year is {CURRENT_YEAR}. "
+    "Your task is to meticulously think step-by-step, like a detective, to generate the best possible search engine query for the user's request. "
+    "You MUST provide your response in a specific structure. \n\n"
+    "First, as a deep thinking AI, show your detailed internal monologue and deliberations. You may use extremely long chains of thought to deeply consider the problem and deliberate with yourself via systematic reasoning processes to help come to a correct solution. This is your free-form thinking space.\n\n"
     
-    system_prompt = (
-        f"You are a search query generation assistant. The current year is {CURRENT_YEAR}. "
-        "Your task is to meticulously think step-by-step, like a detective, to generate the best possible search engine query for the user's request. "
-        "You MUST provide your response in a specific structure. \n\n"
-        "First, as a deep thinking AI, show your detailed internal monologue and deliberations. You may use extremely long chains of thought to deeply consider the problem and deliberate with yourself via systematic reasoning processes to help come to a correct solution. This is your free-form thinking space.\n\n"
-        
-        "After your internal monologue, you MUST then present your structured response in EXACTLY two parts, with NO other text whatsoever between or after these parts:\n\n"
-        
-        "PART 1: DETAILED CHAIN OF THOUGHT\n"
-        "Prefix this part with 'Chain of thought:'.\n"
-        "In this section, formally elaborate on your reasoning process. Your steps should include:\n"
-        "  a. Initial understanding: What is the user's core information need based on their query: '{user_query}'?\n"
-        "  b. Keyword identification: What are the most crucial keywords and concepts? Are there synonyms, related terms, or domain-specific jargon to consider?\n"
-        "  c. Timeframe considerations: Does the query mention specific years (e.g., '{CURRENT_YEAR}', '2025', 'last year') or imply a need for recent information ('latest', 'current')? These timeframes MUST be preserved AS IS in the final search query.\n"
-        "  d. Query construction (Tree of Thought): Generate at least 3 distinct search query options that would potentially answer the user's need. For each option:\n"
-        "    - Explain the rationale for why it could be effective\n"
-        "    - Score it on three dimensions using a 1–10 scale: Precision (relevance), Recall (coverage), and Recency (freshness)\n"
-        "    - Discuss the pros and cons\n"
-        "  Then, reason about which query is optimal based on scores and scope. Prune the weaker candidates and explain the final selection.\n"
-        "  e. Final keyword selection: What exact keyword phrase will form the final search query?\n\n"
-        
-        "PART 2: SEARCH QUERY\n"
-        "Prefix this part with 'SEARCH_QUERY:'.\n"
-        "This line must contain ONLY the final, concise, and effective search engine query derived from your chain of thought above. "
-        "Do NOT add any text, explanation, markdown, or disclaimers after the SEARCH_QUERY line. Your response must end immediately after the search query itself.\n\n"
-        
-        "--- STRICT FORMAT EXAMPLE (User query: 'latest AI news 2025') ---\n"
-        "INTERNAL MONOLOGUE / DELIBERATIONS:\n" 
-        "The user wants the most recent news about Artificial Intelligence specifically for the year 2025. I need to ensure the query is targeted to this year and the concept of 'latest news'. Keywords: AI, news, 2025, latest. Option 1: 'latest AI news 2025' - Direct and good. Option 2: 'AI 2025 developments' - Broader, might miss news. Option 1 seems best.\n\n"
-        "Chain of thought:\n"
-        "a. Initial understanding: The user wants the most recent news about Artificial Intelligence specifically for the year 2025.\n"
-        "b. Keyword identification: 'AI', 'news', '2025'. 'Latest' implies recency.\n"
-        "c. Timeframe considerations: The year '2025' is explicitly mentioned and must be used.\n"
-        "d. Query construction:\n"
-        "   Option 1: 'latest AI news 2025' — High precision, high recall, good recency. Scores: Precision 9/10, Recall 9/10, Recency 9/10\n"
-        "   Option 2: 'AI breakthroughs 2025' — Focuses more on innovation but might miss general news. Precision 8/10, Recall 7/10, Recency 8/10\n"
-        "   Option 3: 'AI technology updates 2025' — Could pull technical and industry info but may lack major headline news. Precision 7/10, Recall 8/10, Recency 7/10\n"
-        "   Final evaluation: Option 1 is the most balanced and directly aligned with the user's need for current news.\n"
-        "e. Final keyword selection: latest AI news 2025\n"
-        "SEARCH_QUERY: latest AI news 2025\n"
-        "--- END OF EXAMPLE ---"
-    )
+    "After your internal monologue, you MUST then present your structured response in EXACTLY two parts, with NO other text whatsoever between or after these parts:\n\n"
     
-    messages = [
-        {"role": "system", "content": system_prompt},
+    "PART 1: DETAILED CHAIN OF THOUGHT\n"
+    "Prefix this part with 'Chain of thought:'.\n"
+    "In this section, formally elaborate on your reasoning process. Your steps should include:\n"
+    "  a. Initial understanding: What is the user's core information need based on their query (given in the user message)?\n"
+    "  b. Keyword identification: What are the most crucial keywords and concepts? Are there synonyms, related terms, or domain-specific jargon to consider?\n"
+    f"  c. Timeframe considerations: Does the query mention specific years (e.g., '{CURRENT_YEAR}', '2025', 'last year') or imply a need for recent information ('latest', 'current')? These timeframes MUST be preserved AS IS in the final search query.\n"
+    "  d. Query construction (Tree of Thought): Generate at least 3 distinct search query options that would potentially answer the user's need. For each option:\n"
+    "    - Explain the rationale for why it could be effective\n"
+    "    - Score it on three dimensions using a 1–10 scale: Precision (relevance), Recall (coverage), and Recency (freshness)\n"
+    "    - Discuss the pros and cons\n"
+    "  Then, reason about which query is optimal based on scores and scope. Prune the weaker candidates and explain the final selection.\n"
+    "  e. Final keyword selection: What exact keyword phrase will form the final search query?\n\n"
+    
+    "PART 2: SEARCH QUERY\n"
+    "Prefix this part with 'SEARCH_QUERY:'.\n"
+    "This line must contain ONLY the final, concise, and effective search engine query derived from your chain of thought above. "
+    "Do NOT add any text, explanation, markdown, or disclaimers after the SEARCH_QUERY line. Your response must end immediately after the search query itself.\n\n"
+    
+    "--- STRICT FORMAT EXAMPLE (User query: 'latest AI news 2025') ---\n"
+    "INTERNAL MONOLOGUE / DELIBERATIONS:\n" 
+    "The user wants the most recent news about Artificial Intelligence specifically for the year 2025. I need to ensure the query is targeted to this year and the concept of 'latest news'. Keywords: AI, news, 2025, latest. Option 1: 'latest AI news 2025' - Direct and good. Option 2: 'AI 2025 developments' - Broader, might miss news. Option 1 seems best.\n\n"
+    "Chain of thought:\n"
+    "a. Initial understanding: The user wants the most recent news about Artificial Intelligence specifically for the year 2025.\n"
+    "b. Keyword identification: 'AI', 'news', '2025'. 'Latest' implies recency.\n"
+    "c. Timeframe considerations: The year '2025' is explicitly mentioned and must be used.\n"
+    "d. Query construction:\n"
+    "   Option 1: 'latest AI news 2025' — High precision, high recall, good recency. Scores: Precision 9/10, Recall 9/10, Recency 9/10\n"
+    "   Option 2: 'AI breakthroughs 2025' — Focuses more on innovation but might miss general news. Precision 8/10, Recall 7/10, Recency 8/10\n"
+    "   Option 3: 'AI technology updates 2025' — Could pull technical and industry info but may lack major headline news. Precision 7/10, Recall 8/10, Recency 7/10\n"
+    "   Final evaluation: Option 1 is the most balanced and directly aligned with the user's need for current news.\n"
+    "e. Final keyword selection: latest AI news 2025\n"
+    "SEARCH_QUERY: latest AI news 2025\n"
+    "--- END OF EXAMPLE ---"
+)
+
+# JSON-mode variant of the Phase 1 instructions (PHASE1_JSON_MODE); the reasoning is kept short to fit PHASE1_JSON_MAX_TOKENS
+_PHASE1_JSON_SYSTEM_PROMPT = (
+    f"You are a search query generation assistant. The current year is {CURRENT_YEAR}. "
+    "Think step-by-step to generate the best possible search engine query for the user's request (given in the user message).\n"
+    "In your reasoning: identify the user's core information need and the crucial keywords; preserve any timeframe the query "
+    f"mentions (e.g. '{CURRENT_YEAR}', '2025', 'last year', 'latest') AS IS; compare at least 3 candidate queries on precision, "
+    "recall and recency; then pick the best one.\n\n"
+    "Respond with a single JSON object and nothing else, in exactly this shape:\n"
+    '{"chain_of_thought": "<your reasoning, at most a few short paragraphs>", "search_query": "<the final concise search engine query>"}\n\n'
+    "Example for the user query 'latest AI news 2025':\n"
+    '{"chain_of_thought": "The user wants the most recent AI news for 2025. Keywords: AI, news, 2025, latest. '
+    "Candidates: 'latest AI news 2025' (precise, broad, recent), 'AI breakthroughs 2025' (misses general news), "
+    "'AI technology updates 2025' (too technical). The first is the most balanced.\", \"search_query\": \"latest AI news 2025\"}"
+)
+
+# Static Phase 2 instructions; the per-request query and reference list are appended after them in _build_phase2_messages
+_PHASE2_SYSTEM_PROMPT = (
+    f"You are a highly advanced AI news and research analyst. Your task is to create a 'Brief Information Outline' or 'Key Findings Digest' from provided web content. "
+    f"The current year is {CURRENT_YEAR}. You are given:\n"
+    "- A user query (stated at the end of these instructions).\n"
+    "- Web articles scraped from multiple sources. Each article is presented in the user message as 'Source [number]' and includes its URL, Title, Publish Date, and Content.\n"
+    "- The mapping of source numbers to their full URLs that you will use for citations (in the REFERENCE_LIST_START/END block at the end of these instructions).\n\n"
+    "Your job is to perform multi-step reasoning over the content to produce this outline. "
+    "Use advanced reasoning, like an expert model, to identify the most salient facts and present them clearly.\n\n"
+    "⚠️ CRITICAL: Do not add any information not explicitly mentioned in the provided sources. Do not hallucinate. Be evidence-driven.\n\n"
+    "IMPORTANT: Even if an article lacks a publish date or contains general information, you must still extract and include any potentially relevant news, events, or updates that could be useful for the user's query. Prioritize event-based or specific snippets over generic descriptions, but do not discard articles solely due to missing dates or lack of explicit recency. If recent news is scarce, include all possible relevant facts from the available articles.\n\n"
+    "You MUST provide your response in a specific structure. \n\n"
+    "First, as a deep thinking AI, show your detailed internal monologue and deliberations. You may use extremely long chains of thought to deeply consider the problem, evaluate each source, and plan your outline. This is your free-form thinking space before the structured parts.\n\n"
+    "After your internal monologue, you MUST then present your structured response in EXACTLY two parts, with NO other text whatsoever between or after these parts:\n\n"
+    "PART 1: Chain of thought:\n"
+    "Prefix this part with 'Chain of thought:'.\n"
+    "- For each source (e.g., Source [1], Source [2]), reason through its:\n"
+    "  a. Relevance to the user query\n"
+    "  b. Timeliness (using its Published Date and content cues, but do not discard if missing)\n"
+    "  c. Credibility and clarity of the information.\n"
+    "  d. Key facts, figures, or distinct pieces of information extracted that directly help answer the query or form part of the outline. When referring to a source in your thought process, use its number (e.g., 'Source [1] states...').\n"
+    "- Then provide a synthesis plan explaining how you'll organize these key points into a coherent outline, prioritizing the most relevant and timely information. Indicate which source numbers support each planned point.\n\n"
+    "PART 2: BRIEF_INFORMATION_OUTLINE:\n"
+    "Prefix this part with 'BRIEF_INFORMATION_OUTLINE:'.\n"
+    "- Present the key findings as a structured, grouped news digest, using clear section headers (with relevant emojis) for each major news topic.\n"
+    "- Under each section header, use concise bullet points for distinct news items or facts.\n"
+    "- Each bullet point should directly state a key piece of information from the sources.\n"
+    "- After each bullet point, cite the source(s) using their corresponding number(s) in square brackets, like [1] or [1, 2].\n"
+    "- If multiple articles cover the same event, group them under the same section and cite all relevant sources.\n"
+    "- Prioritize recency and importance. If information is conflicting, you may note it briefly.\n"
+    "- IMPORTANT: Extract and include ALL distinct newsworthy events, facts, or updates found in the sources, even if only mentioned in a single article. Do NOT omit relevant items just because they appear in only one source.\n"
+    "- If a news item is only present in one source, still include it as a separate bullet point with its citation.\n"
+    "- Use a style similar to this example:\n"
+    "BRIEF_INFORMATION_OUTLINE:\n"
+    "🚌 Tragic Bus Fire Claims Five Lives\n"
+    "- A private sleeper bus traveling from Begusarai to Delhi caught fire on Kisan Path in Lucknow, resulting in five deaths, including two children. The driver fled the scene and is being sought by authorities. [1, 2, 3]\n"
+    "\n🦁 Zoos Closed Amid Bird Flu Outbreak\n"
+    "- Following the death of a tigress due to bird flu at Gorakhpur Zoo, zoos in Lucknow, Kanpur, and Gorakhpur have been temporarily closed. Carnivorous animals are being fed mutton instead of poultry. [4, 5]\n"
+    "\n🛡️ BrahMos Missile Facility Inaugurated\n"
+    "- Defence Minister inaugurated a new BrahMos missile manufacturing plant in Lucknow, set to produce up to 100 supersonic cruise missiles annually. [6, 7]\n"
+    "\n🍲 Bada Mangal Festival Commences\n"
+    "- The annual Bada Mangal festival has begun in Lucknow, with over 350 community feasts registered. [8, 9]\n"
+    "\n🧪 Crackdown on Food Adulteration\n"
+    "- The Chief Minister announced strict measures against food and medicine adulteration, including public shaming and new testing labs. [10]\n"
+    "\nReferences:\n"
+    "[1] https://example.com/news1\n[2] https://example.com/news2\n...\n"
+    "--- END OF EXAMPLE ---\n"
+    "If no sources are relevant or timely, state that clearly in the BRIEF_INFORMATION_OUTLINE.\n"
+    "**AFTER the grouped outline, create a 'References:' section.**\n"
+    "Under 'References:', list each source number you cited in the outline, followed by its full URL (taken from the REFERENCE_LIST_START/END block provided to you).\n"
+    "Ensure NO text appears after the References section.\n"
+)
+
+# Single-request variant of Phase 2 plus elaboration (COMBINED_ELABORATION); same per-request suffix as _PHASE2_SYSTEM_PROMPT
+_PHASE2_COMBINED_SYSTEM_PROMPT = (
+    f"You are a highly advanced AI news and research analyst and content writer. The current year is {CURRENT_YEAR}. You are given:\n"
+    "- A user query (stated at the end of these instructions).\n"
+    "- Web articles scraped from multiple sources. Each article is presented in the user message as 'Source [number]' and includes its URL, Title, Publish Date, and Content.\n"
+    "- The mapping of source numbers to their full URLs that you will use for citations (in the REFERENCE_LIST_START/END block at the end of these instructions).\n\n"
+    "⚠️ CRITICAL: Do not add any information not explicitly mentioned in the provided sources. Do not hallucinate. Be evidence-driven.\n\n"
+    "Respond with a single JSON object and nothing else, in exactly this shape:\n"
+    '{"chain_of_thought": "...", "outline": "...", "elaboration": "..."}\n\n'
+    "- chain_of_thought: for each source, its relevance to the query, timeliness, credibility and the key facts it contributes "
+    "(refer to sources by number, e.g. 'Source [1] states...'), then your plan for organizing the outline.\n"
+    "- outline: a grouped news digest with section headers (with relevant emojis) and concise bullet points, each bullet followed by "
+    "its source number(s) in square brackets like [1] or [1, 2]. Include ALL distinct relevant facts, even those found in a single source. "
+    "End it with a 'References:' section listing each cited source number and its full URL from the reference list. "
+    "If no sources are relevant, say so clearly here.\n"
+    "- elaboration: well-formatted Markdown that expands the outline into a structured, coherent piece (use ## / ### headings) that "
+    "directly and comprehensively answers the user query, using only facts from the outline. Do not simply repeat the outline.\n"
+)
+
+# Phase 2 result when no article has usable text; fixed, since an LLM call could only restate it
+_PHASE2_NO_CONTENT_RESULT = (
+    "Could not retrieve meaningful web articles for this query, so a web-based outline cannot be provided.",
+    "No articles with usable text were retrieved; the Phase 2 LLM call was skipped.",
+)
+
+
+def _system_message(static_text: str, model_name: str, dynamic_text: str = "") -> dict:
+    """
+    System message with the static instructions first. For providers that need an explicit breakpoint
+    (Anthropic via OpenRouter) the static block is marked cache_control so repeat calls bill it at the cached rate;
+    OpenAI-style providers cache the identical prefix automatically.
+    """
+    if model_name.startswith(PROMPT_CACHE_CONTROL_MODEL_PREFIXES):
+        blocks = [{"type": "text", "text": static_text, "cache_control": {"type": "ephemeral"}}]
+        if dynamic_text:
+            blocks.append({"type": "text", "text": dynamic_text})
+        return {"role": "system", "content": blocks}
+    return {"role": "system", "content": static_text + dynamic_text}
+
+
+def _build_phase1_messages(user_query: str, model_name: str) -> list[dict]:
+    return [
+        _system_message(_PHASE1_JSON_SYSTEM_PROMPT if PHASE1_JSON_MODE else _PHASE1_SYSTEM_PROMPT, model_name),
         {"role": "user", "content": user_query}
     ]
 
-    full_response, error_message_from_call = _call_llm(messages, model_name)
 
+def _phase1_request_options() -> tuple[dict, re.Pattern | None]:
+    """Extra completion arguments and the early-stop pattern for a Phase 1 request."""
+    if PHASE1_JSON_MODE:
+        return {"response_format": {"type": "json_object"}, "max_tokens": PHASE1_JSON_MAX_TOKENS}, None
+    return {}, _SEARCH_QUERY_LINE_RE
+
+
+def _phase1_json_fields(full_response: str) -> tuple[str, str] | None:
+    """(search_query, chain_of_thought) from a JSON-mode Phase 1 response, or None if it is not one."""
+    if not full_response.lstrip().startswith('{'):
+        return None
+    try:
+        payload = json.loads(full_response)
+    except json.JSONDecodeError:
+        return None
+    search_query = payload.get('search_query') if isinstance(payload, dict) else None
+    if not isinstance(search_query, str) or not search_query.strip():
+        return None
+    return search_query.strip(), str(payload.get('chain_of_thought') or full_response)
+
+
+def _parse_phase1_response(full_response: str | None, error_message_from_call: str | None) -> tuple[str | None, str | None]:
     if error_message_from_call and not full_response: 
         return None, error_message_from_call
 
     if full_response:
-        lines = full_response.strip().split('\n')
+        json_fields = _phase1_json_fields(full_response)
+        if json_fields:
+            logger.info("[LLM Interaction] Suggested Search Query: %s", json_fields[0])
+            return json_fields
+
+        # Text format (or a model that ignored response_format): first non-empty SEARCH_QUERY line
         search_query = None
-        
-        for line_idx, line_content in enumerate(lines): 
-            if line_content.startswith("SEARCH_QUERY:"):
-                potential_query = line_content.replace("SEARCH_QUERY:", "").strip()
-                if potential_query: 
-                    search_query = potential_query
-                    if line_idx < len(lines) - 1 and lines[line_idx+1].strip():
-                        print(f"[LLM Interaction Warning] Text found after SEARCH_QUERY line: '{lines[line_idx+1]}...'")
-                    break 
+        match = _SEARCH_QUERY_RE.search(full_response)
+        if match:
+            search_query = match.group(1)
+            trailing_text = full_response[match.end():].strip()
+            if trailing_text:
+                logger.warning("[LLM Interaction] Text found after SEARCH_QUERY line: '%s...'", trailing_text.splitlines()[0])
         
         phase_1_chain_of_thought = full_response 
         
         if not search_query:
-             print("[LLM Interaction Warning] 'SEARCH_QUERY:' prefix not found or query was empty in Phase 1 LLM response. Cannot determine search query. The full response was:")
-             print(full_response) 
+             logger.warning("[LLM Interaction] 'SEARCH_QUERY:' prefix not found or query was empty in Phase 1 LLM response. Cannot determine search query. The full response was:\n%s", full_response)
              return None, phase_1_chain_of_thought
 
-        print(f"[LLM Interaction] Suggested Search Query: {search_query}")
+        logger.info("[LLM Interaction] Suggested Search Query: %s", search_query)
         return search_query, phase_1_chain_of_thought
     
     return None, error_message_from_call if error_message_from_call else "LLM did not return a response for Phase 1."
 
 
-def get_summary_and_cot(original_user_query: str, scraped_articles_data: list[dict], model_name: str = DEFAULT_MODEL_NAME) -> tuple[str | None, str | None]:
+def _phase1_semantic_lookup(user_query: str, model_name: str):
     """
-    Phase 2: Gets a brief outline/digest based on a list of scraped article dictionaries.
-    Each dictionary in scraped_articles_data should have 'url', 'title', 'text', 'publish_date'.
-    This version instructs the LLM for an outline format with numbered source citations and a References section,
-    and encourages a preceding internal monologue.
+    Paraphrased queries ("latest AI news 2025" / "AI news in 2025") are served the earlier Phase 1 response.
+    A hit is rejected unless its search query keeps every number (e.g. a year) in the new query.
+    """
+    semantic_cache = llm_cache.get_semantic_cache("phase1", threshold=PHASE1_SEMANTIC_THRESHOLD, ttl=PHASE1_SEMANTIC_TTL)
+    if not semantic_cache:
+        return None, None
+    cached_response = semantic_cache.lookup(model_name, user_query)
+    if cached_response is None:
+        return semantic_cache, None
+    json_fields = _phase1_json_fields(cached_response)
+    match = None if json_fields else _SEARCH_QUERY_RE.search(cached_response)
+    cached_query = json_fields[0] if json_fields else (match.group(1) if match else None)
+    if not cached_query or not set(_NUMBER_RE.findall(user_query)) <= set(_NUMBER_RE.findall(cached_query)):
+        return semantic_cache, None
+    logger.info("[LLM Interaction] Phase 1 semantic cache hit (stats: %s)", semantic_cache.stats)
+    return semantic_cache, cached_response
+
+
+def _store_phase1_semantic(semantic_cache, user_query: str, model_name: str, full_response: str | None, search_query: str | None) -> None:
+    if semantic_cache and search_query:
+        semantic_cache.store(model_name, user_query, full_response)
+
+
+def get_search_query_and_cot(user_query: str, model_name: str = PHASE1_MODEL_NAME) -> tuple[str | None, str | None]:
     """
-    print(f"\n[LLM Interaction] Phase 2: Generating outline for query: '{original_user_query}'")
+    Phase 1: Gets the refined search query and the LLM's chain of thought for planning.
+    This version uses the prompt structure from the user's provided code.
+    """
+    stream = get_search_query_and_cot_stream(user_query, model_name)
+    while True:
+        try:
+            next(stream)
+        except StopIteration as finished:
+            return finished.value
+
+
+def _phase1_fast_path(user_query: str) -> tuple[str, str] | None:
+    """(query, note) when the query is already a short keyword query with a timeframe, so the LLM adds nothing."""
+    query = user_query.strip()
+    if (PHASE1_FAST_PATH and _KEYWORD_QUERY_RE.match(query) and _TIMEFRAME_RE.search(query)
+            and not _QUESTION_OR_COMMAND_RE.search(query)):
+        logger.info("[LLM Interaction] Phase 1 fast path: using the query as-is.")
+        return query, "[fast-path] Query is already a keyword search query with a timeframe; LLM skipped."
+    return None
+
+
+def get_search_query_fast_path(user_query: str) -> tuple[str, str] | None:
+    """(search_query, chain_of_thought) when Phase 1 would use the query as-is without an LLM call, else None."""
+    return _phase1_fast_path(user_query)
+
+
+def get_search_query_and_cot_stream(user_query: str, model_name: str = PHASE1_MODEL_NAME):
+    """
+    Streaming Phase 1 for UI consumers: yields the response text as it is generated and stops the
+    generation as soon as the SEARCH_QUERY line is complete. The generator's return value
+    (via `yield from`, or StopIteration.value) is the (search_query, chain_of_thought) tuple.
+    """
+    logger.info("[LLM Interaction] Phase 1: Getting search query for: '%s'", user_query)
+    fast_result = _phase1_fast_path(user_query)
+    if fast_result is not None:
+        return fast_result
+    semantic_cache, cached_response = _phase1_semantic_lookup(user_query, model_name)
+    if cached_response is not None:
+        yield cached_response
+        return _parse_phase1_response(cached_response, None)
+
+    create_kwargs, stop_pattern = _phase1_request_options()
+    full_response, error_message_from_call = yield from _stream_llm(
+        _build_phase1_messages(user_query, model_name), model_name, stop_pattern=stop_pattern, **create_kwargs)
+    search_query, phase_1_chain_of_thought = _parse_phase1_response(full_response, error_message_from_call)
+    _store_phase1_semantic(semantic_cache, user_query, model_name, full_response, search_query)
+    return search_query, phase_1_chain_of_thought
+
+
+async def get_search_query_and_cot_async(user_query: str, model_name: str = PHASE1_MODEL_NAME) -> tuple[str | None, str | None]:
+    """Async counterpart of get_search_query_and_cot, so Phase 1 can overlap with other I/O."""
+    logger.info("[LLM Interaction] (async) Phase 1: Getting search query for: '%s'", user_query)
+    fast_result = _phase1_fast_path(user_query)
+    if fast_result is not None:
+        return fast_result
+    semantic_cache, cached_response = _phase1_semantic_lookup(user_query, model_name)
+    if cached_response is not None:
+        return _parse_phase1_response(cached_response, None)
+
+    create_kwargs, stop_pattern = _phase1_request_options()
+    full_response, error_message_from_call = await _acall_llm(
+        _build_phase1_messages(user_query, model_name), model_name, stop_pattern=stop_pattern, **create_kwargs)
+    search_query, phase_1_chain_of_thought = _parse_phase1_response(full_response, error_message_from_call)
+    _store_phase1_semantic(semantic_cache, user_query, model_name, full_response, search_query)
+    return search_query, phase_1_chain_of_thought
+
+
+def _clean_article_text(text: str, title: str | None = None) -> str:
+    """
+    Collapses runs of spaces and blank lines, and drops lines that only spend tokens: short all-caps
+    menu/banner items ("SUBSCRIBE", "TOP STORIES") and a repeat of the article's title.
+    """
+    title_key = title.strip().lower() if title else None
+    kept_lines = []
+    for line in _INLINE_WS_RE.sub(' ', text).split('\n'):
+        line = line.strip()
+        if line and ((line.isupper() and len(line.split()) < 3) or line.lower() == title_key):
+            continue
+        kept_lines.append(line)
+    return _EXTRA_NEWLINES_RE.sub('\n\n', '\n'.join(kept_lines)).strip()
+
+
+def _dedupe_articles(articles: list[dict]) -> list[dict]:
+    """
+    Drops repeated URLs (ignoring #fragments and case of the host) and syndicated copies whose first 4 KB
+    of text is identical, keeping the first occurrence, so duplicates do not spend the Phase 2 token budget.
+    """
+    seen_urls, seen_hashes, unique_articles = set(), set(), []
+    for article in articles:
+        url = article.get('url')
+        url_key = None
+        if url:
+            parts = urlsplit(url)
+            url_key = parts._replace(netloc=parts.netloc.lower(), path=parts.path.rstrip('/'), fragment='').geturl()
+        text_hash = hashlib.blake2b(article['text'][:4096].encode('utf-8', 'ignore'), digest_size=8).digest()
+        if url_key in seen_urls or text_hash in seen_hashes:
+            continue
+        if url_key:
+            seen_urls.add(url_key)
+        seen_hashes.add(text_hash)
+        unique_articles.append(article)
+    if len(unique_articles) < len(articles):
+        logger.info("[LLM Interaction] Dropped %d duplicate article(s) before Phase 2.", len(articles) - len(unique_articles))
+    return unique_articles
+
+
+@functools.lru_cache(maxsize=4096)
+def _published_date_info(publish_date: datetime.date) -> str:
+    """'Published: YYYY-MM-DD' line for a source; memoized since the same articles recur across Phase 2 calls."""
+    return f"Published: {publish_date.isoformat()}"
+
 
+def _bm25_scores(query_terms: set[str], documents: list[list[str]]) -> list[float]:
+    """Okapi BM25 score of each tokenized document against the query terms."""
+    term_counts, doc_freqs = [], dict.fromkeys(query_terms, 0)
+    for terms in documents:
+        counts = {}
+        for term in terms:
+            if term in query_terms:
+                counts[term] = counts.get(term, 0) + 1
+        for term in counts:
+            doc_freqs[term] += 1
+        term_counts.append(counts)
+
+    num_docs = len(documents)
+    avg_length = (sum(map(len, documents)) / num_docs) or 1
+    idf = {term: math.log((num_docs - df + 0.5) / (df + 0.5) + 1) for term, df in doc_freqs.items() if df}
+    scores = []
+    for counts, terms in zip(term_counts, documents):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(terms) / avg_length)
+        scores.append(sum(idf[term] * tf * (BM25_K1 + 1) / (tf + norm) for term, tf in counts.items()))
+    return scores
+
+
+def _recency_score(publish_date, now: datetime.datetime) -> float:
+    """1.0 for an article published now, 0.5 after RECENCY_HALF_LIFE_DAYS, 0.0 when undated."""
+    if not isinstance(publish_date, datetime.datetime):
+        return 0.0
+    if publish_date.tzinfo is None:
+        publish_date = publish_date.replace(tzinfo=datetime.timezone.utc)
+    age_days = max((now - publish_date).total_seconds() / 86400, 0.0)
+    return 1.0 / (1.0 + age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+def _rank_articles_by_relevance(query: str, articles: list[dict], max_articles: int = PHASE2_MAX_ARTICLES) -> list[dict]:
+    """
+    Orders articles by a weighted score (PHASE2_RANK_WEIGHTS) of BM25 relevance to the query (normalized to the best
+    article), recency and whether the source is a trusted domain, and keeps the top max_articles (0: all), so the
+    token budget goes to the most useful sources instead of whichever arrived first. Ties keep arrival order.
+    """
+    if len(articles) < 2:
+        return articles
+    query_terms = set(_BM25_TERM_RE.findall(query.lower()))
+    relevance = _bm25_scores(query_terms, [_BM25_TERM_RE.findall(article['text'].lower()) for article in articles]) if query_terms else [0.0] * len(articles)
+    best_relevance = max(relevance) or 1.0
+    now = datetime.datetime.now(datetime.timezone.utc)
+    weights = PHASE2_RANK_WEIGHTS
+    scores = [
+        weights["relevance"] * relevance_score / best_relevance
+        + weights["recency"] * _recency_score(article.get('publish_date'), now)
+        + weights["domain"] * bool(article.get('trusted_domain'))
+        for article, relevance_score in zip(articles, relevance)
+    ]
+    order = sorted(range(len(articles)), key=scores.__getitem__, reverse=True)
+    if max_articles and len(order) > max_articles:
+        logger.info("[LLM Interaction] Keeping the top %d of %d articles for Phase 2.", max_articles, len(order))
+        order = order[:max_articles]
+    return [articles[i] for i in order]
+
+
+def _select_relevant_paragraphs(query: str, text: str, max_paragraphs: int = PHASE2_MAX_PARAGRAPHS_PER_ARTICLE) -> str:
+    """
+    Keeps the max_paragraphs paragraphs of an article that score highest against the query (BM25), in their
+    original order. Articles with no matching paragraph keep their lead paragraphs. 0 disables the cut.
+    """
+    paragraphs = text.split('\n\n')
+    if not max_paragraphs or len(paragraphs) <= max_paragraphs:
+        return text
+    query_terms = set(_BM25_TERM_RE.findall(query.lower()))
+    if not query_terms:
+        return '\n\n'.join(paragraphs[:max_paragraphs])
+    scores = _bm25_scores(query_terms, [_BM25_TERM_RE.findall(paragraph.lower()) for paragraph in paragraphs])
+    keep = sorted(sorted(range(len(paragraphs)), key=scores.__getitem__, reverse=True)[:max_paragraphs])
+    return '\n\n'.join(paragraphs[i] for i in keep)
+
+
+def _build_phase2_messages(original_user_query: str, scraped_articles_data: list[dict], model_name: str,
+                           static_prompt: str = _PHASE2_SYSTEM_PROMPT) -> tuple[list[dict], bool]:
+    """Phase 2 request messages, and whether any article had usable text (False: no messages, skip the call)."""
     meaningful_scraped_articles = [
         article for article in scraped_articles_data 
         if article and isinstance(article, dict) and article.get('text') and article.get('text').strip()
     ]
+    meaningful_scraped_articles = _dedupe_articles(meaningful_scraped_articles)
+    meaningful_scraped_articles = _rank_articles_by_relevance(original_user_query, meaningful_scraped_articles)
 
     if not meaningful_scraped_articles:
-        system_prompt_no_content = (
-            f"You are an expert information analyst. The current year is {CURRENT_YEAR}. "
-            "You were asked to provide an outline for the query: "
-            f"'{original_user_query}'. However, no meaningful web content (articles with text) was provided after attempting a web search. "
-            "Your task is to state that you could not find specific web articles to create an outline and therefore cannot provide a web-based response. "
-            "Do not use your general knowledge. Your entire response should be ONLY this statement, prefixed with 'BRIEF_INFORMATION_OUTLINE:'."
-        )
-        messages_no_content = [
-            {"role": "system", "content": system_prompt_no_content}
-        ]
-        statement, error_no_content = _call_llm(messages_no_content, model_name)
-        if statement: 
-            parsed_statement = statement.replace("BRIEF_INFORMATION_OUTLINE:", "").strip() if statement.startswith("BRIEF_INFORMATION_OUTLINE:") else statement
-            return parsed_statement, statement 
-        else:
-            return "Could not retrieve meaningful web articles, and an error occurred generating a statement.", error_no_content
+        return [], False
 
 
-    formatted_scraped_content_for_llm = ""
-    total_chars_processed = 0
-    max_total_chars_for_llm_context = 60000 
+    formatted_source_chunks = []
+    total_tokens_processed = 0
     
     source_url_mapping_for_prompt = [] 
     for i, article in enumerate(meaningful_scraped_articles):
@@ -232,14 +852,15 @@ def get_summary_and_cot(original_user_query: str, scraped_articles_data: list[di
         # --- CORRECTED DATE HANDLING ---
         publish_date_obj = article.get('publish_date') # This should be a datetime object or None
         if publish_date_obj and isinstance(publish_date_obj, datetime.datetime):
-            date_info = f"Published: {publish_date_obj.strftime('%Y-%m-%d')}"
+            date_info = _published_date_info(publish_date_obj.date())
         elif isinstance(publish_date_obj, str): # If it's already a string for some reason
-            date_info = f"Published: {publish_date_obj.split('T')[0] if 'T' in publish_date_obj else publish_date_obj}"
+            time_sep = publish_date_obj.find('T')
+            date_info = f"Published: {publish_date_obj[:time_sep] if time_sep != -1 else publish_date_obj}"
         else:
             date_info = "Published: N/A"
         # --- END OF CORRECTION ---
             
-        text_content = article.get('text', '')
+        text_content = _select_relevant_paragraphs(original_user_query, _clean_article_text(article.get('text', ''), title))
         
         source_tag = (
            f"--- Source [{i+1}] ---\n" 
@@ -249,69 +870,25 @@ def get_summary_and_cot(original_user_query: str, scraped_articles_data: list[di
            f"(Consider this source independently when reasoning. Treat each article as a separate evidence chunk.)\n"
            "Content:\n"
         )
+        end_tag = f"\n--- End of Source [{i+1}] ---\n\n"
         
-        available_chars_for_this_article = max_total_chars_for_llm_context - total_chars_processed - len(source_tag) - 20 
-        if available_chars_for_this_article <= 50: 
+        tag_tokens = llm_tokens.count_tokens(source_tag + end_tag)
+        available_tokens_for_this_article = PHASE2_MAX_CONTEXT_TOKENS - total_tokens_processed - tag_tokens
+        if available_tokens_for_this_article <= 12: # Not worth including a source cut to a few words
             break 
 
-        formatted_scraped_content_for_llm += source_tag
-        formatted_scraped_content_for_llm += text_content[:available_chars_for_this_article]
-        formatted_scraped_content_for_llm += f"\n--- End of Source [{i+1}] ---\n\n" 
-        total_chars_processed += len(source_tag) + len(text_content[:available_chars_for_this_article]) + 20
+        article_text, article_tokens = llm_tokens.truncate_to_tokens(text_content, available_tokens_for_this_article)
+        formatted_source_chunks.extend((source_tag, article_text, end_tag))
+        total_tokens_processed += tag_tokens + article_tokens
 
+    formatted_scraped_content_for_llm = "".join(formatted_source_chunks)
     numbered_source_list_for_prompt = "\n".join(source_url_mapping_for_prompt)
 
-    system_prompt_with_content = (
-        f"You are a highly advanced AI news and research analyst. Your task is to create a 'Brief Information Outline' or 'Key Findings Digest' from provided web content. "
-        f"The current year is {CURRENT_YEAR}. You are given:\n"
-        f"- A user query: '{original_user_query}'\n"
-        f"- Web articles scraped from multiple sources. Each article is presented below as 'Source [number]' and includes its URL, Title, Publish Date, and Content.\n"
+    # Per-request part, kept after the static instructions so they form a byte-identical, cacheable prefix
+    system_prompt_dynamic = (
+        f"\nUser query: '{original_user_query}'\n"
         f"For your reference, here is the mapping of source numbers to their full URLs that you will use for citations:\n"
-        f"REFERENCE_LIST_START\n{numbered_source_list_for_prompt}\nREFERENCE_LIST_END\n\n"
-        "Your job is to perform multi-step reasoning over the content to produce this outline. "
-        "Use advanced reasoning, like an expert model, to identify the most salient facts and present them clearly.\n\n"
-        "⚠️ CRITICAL: Do not add any information not explicitly mentioned in the provided sources. Do not hallucinate. Be evidence-driven.\n\n"
-        "IMPORTANT: Even if an article lacks a publish date or contains general information, you must still extract and include any potentially relevant news, events, or updates that could be useful for the user's query. Prioritize event-based or specific snippets over generic descriptions, but do not discard articles solely due to missing dates or lack of explicit recency. If recent news is scarce, include all possible relevant facts from the available articles.\n\n"
-        "You MUST provide your response in a specific structure. \n\n"
-        "First, as a deep thinking AI, show your detailed internal monologue and deliberations. You may use extremely long chains of thought to deeply consider the problem, evaluate each source, and plan your outline. This is your free-form thinking space before the structured parts.\n\n"
-        "After your internal monologue, you MUST then present your structured response in EXACTLY two parts, with NO other text whatsoever between or after these parts:\n\n"
-        "PART 1: Chain of thought:\n"
-        "Prefix this part with 'Chain of thought:'.\n"
-        "- For each source (e.g., Source [1], Source [2]), reason through its:\n"
-        "  a. Relevance to the query: '{original_user_query}'\n"
-        "  b. Timeliness (using its Published Date and content cues, but do not discard if missing)\n"
-        "  c. Credibility and clarity of the information.\n"
-        "  d. Key facts, figures, or distinct pieces of information extracted that directly help answer the query or form part of the outline. When referring to a source in your thought process, use its number (e.g., 'Source [1] states...').\n"
-        "- Then provide a synthesis plan explaining how you'll organize these key points into a coherent outline, prioritizing the most relevant and timely information. Indicate which source numbers support each planned point.\n\n"
-        "PART 2: BRIEF_INFORMATION_OUTLINE:\n"
-        "Prefix this part with 'BRIEF_INFORMATION_OUTLINE:'.\n"
-        "- Present the key findings as a structured, grouped news digest, using clear section headers (with relevant emojis) for each major news topic.\n"
-        "- Under each section header, use concise bullet points for distinct news items or facts.\n"
-        "- Each bullet point should directly state a key piece of information from the sources.\n"
-        "- After each bullet point, cite the source(s) using their corresponding number(s) in square brackets, like [1] or [1, 2].\n"
-        "- If multiple articles cover the same event, group them under the same section and cite all relevant sources.\n"
-        "- Prioritize recency and importance. If information is conflicting, you may note it briefly.\n"
-        "- IMPORTANT: Extract and include ALL distinct newsworthy events, facts, or updates found in the sources, even if only mentioned in a single article. Do NOT omit relevant items just because they appear in only one source.\n"
-        "- If a news item is only present in one source, still include it as a separate bullet point with its citation.\n"
-        "- Use a style similar to this example:\n"
-        "BRIEF_INFORMATION_OUTLINE:\n"
-        "🚌 Tragic Bus Fire Claims Five Lives\n"
-        "- A private sleeper bus traveling from Begusarai to Delhi caught fire on Kisan Path in Lucknow, resulting in five deaths, including two children. The driver fled the scene and is being sought by authorities. [1, 2, 3]\n"
-        "\n🦁 Zoos Closed Amid Bird Flu Outbreak\n"
-        "- Following the death of a tigress due to bird flu at Gorakhpur Zoo, zoos in Lucknow, Kanpur, and Gorakhpur have been temporarily closed. Carnivorous animals are being fed mutton instead of poultry. [4, 5]\n"
-        "\n🛡️ BrahMos Missile Facility Inaugurated\n"
-        "- Defence Minister inaugurated a new BrahMos missile manufacturing plant in Lucknow, set to produce up to 100 supersonic cruise missiles annually. [6, 7]\n"
-        "\n🍲 Bada Mangal Festival Commences\n"
-        "- The annual Bada Mangal festival has begun in Lucknow, with over 350 community feasts registered. [8, 9]\n"
-        "\n🧪 Crackdown on Food Adulteration\n"
-        "- The Chief Minister announced strict measures against food and medicine adulteration, including public shaming and new testing labs. [10]\n"
-        "\nReferences:\n"
-        "[1] https://example.com/news1\n[2] https://example.com/news2\n...\n"
-        "--- END OF EXAMPLE ---\n"
-        "If no sources are relevant or timely, state that clearly in the BRIEF_INFORMATION_OUTLINE.\n"
-        "**AFTER the grouped outline, create a 'References:' section.**\n"
-        "Under 'References:', list each source number you cited in the outline, followed by its full URL (taken from the REFERENCE_LIST_START/END block provided to you).\n"
-        "Ensure NO text appears after the References section.\n"
+        f"REFERENCE_LIST_START\n{numbered_source_list_for_prompt}\nREFERENCE_LIST_END\n"
     )
     
     user_prompt_for_summary = (
@@ -320,13 +897,13 @@ def get_summary_and_cot(original_user_query: str, scraped_articles_data: list[di
         f"{formatted_scraped_content_for_llm}"
     )
 
-    messages = [
-        {"role": "system", "content": system_prompt_with_content},
+    return [
+        _system_message(static_prompt, model_name, system_prompt_dynamic),
         {"role": "user", "content": user_prompt_for_summary} 
-    ]
+    ], True
 
-    full_response, error_message_from_call = _call_llm(messages, model_name)
 
+def _parse_phase2_response(full_response: str | None, error_message_from_call: str | None) -> tuple[str | None, str | None]:
     if error_message_from_call and not full_response:
         return None, error_message_from_call
     
@@ -334,14 +911,11 @@ def get_summary_and_cot(original_user_query: str, scraped_articles_data: list[di
         phase_2_chain_of_thought = full_response 
         final_outline = None 
 
-        if "BRIEF_INFORMATION_OUTLINE:" in full_response:
-            parts = full_response.split("BRIEF_INFORMATION_OUTLINE:", 1)
-            if len(parts) > 1:
-                final_outline = parts[1].strip()
-            else: 
-                final_outline = "Outline was expected after 'BRIEF_INFORMATION_OUTLINE:' tag, but none was found."
+        parts = _OUTLINE_SPLIT_RE.split(full_response, maxsplit=1)
+        if len(parts) > 1:
+            final_outline = parts[1].strip()
         else:
-            print("[LLM Interaction Warning] 'BRIEF_INFORMATION_OUTLINE:' prefix not found in Phase 2. The full response will be treated as CoT, and outline might be missing or embedded.")
+            logger.warning("[LLM Interaction] 'BRIEF_INFORMATION_OUTLINE:' prefix not found in Phase 2. The full response will be treated as CoT, and outline might be missing or embedded.")
             final_outline = "Outline is embedded within the Chain of Thought above. 'BRIEF_INFORMATION_OUTLINE:' tag was not found."
 
         return final_outline, phase_2_chain_of_thought 
@@ -349,12 +923,108 @@ def get_summary_and_cot(original_user_query: str, scraped_articles_data: list[di
     return None, error_message_from_call if error_message_from_call else "LLM did not return a response for Phase 2."
 
 
+def get_summary_and_cot(original_user_query: str, scraped_articles_data: list[dict], model_name: str = PHASE2_MODEL_NAME) -> tuple[str | None, str | None]:
+    """
+    Phase 2: Gets a brief outline/digest based on a list of scraped article dictionaries.
+    Each dictionary in scraped_articles_data should have 'url', 'title', 'text', 'publish_date'.
+    This version instructs the LLM for an outline format with numbered source citations and a References section,
+    and encourages a preceding internal monologue.
+    """
+    logger.info("[LLM Interaction] Phase 2: Generating outline for query: '%s'", original_user_query)
+    messages, has_content = _build_phase2_messages(original_user_query, scraped_articles_data, model_name)
+    if not has_content:
+        logger.warning("[LLM Interaction] No article text for Phase 2; skipping the LLM call.")
+        return _PHASE2_NO_CONTENT_RESULT
+    full_response, error_message_from_call = _call_llm(messages, model_name)
+    return _parse_phase2_response(full_response, error_message_from_call)
+
+
+def get_summary_and_cot_stream(original_user_query: str, scraped_articles_data: list[dict], model_name: str = PHASE2_MODEL_NAME):
+    """
+    Streaming Phase 2 for UI consumers: yields the response text (chain of thought, then the outline) as it is
+    generated. The generator's return value (via `yield from`, or StopIteration.value) is the
+    (final_outline, chain_of_thought) tuple that get_summary_and_cot returns.
+    """
+    logger.info("[LLM Interaction] Phase 2: Streaming outline for query: '%s'", original_user_query)
+    messages, has_content = _build_phase2_messages(original_user_query, scraped_articles_data, model_name)
+    if not has_content:
+        logger.warning("[LLM Interaction] No article text for Phase 2; skipping the LLM call.")
+        return _PHASE2_NO_CONTENT_RESULT
+    full_response, error_message_from_call = yield from _stream_llm(messages, model_name)
+    return _parse_phase2_response(full_response, error_message_from_call)
+
+
+async def get_summary_and_cot_async(original_user_query: str, scraped_articles_data: list[dict], model_name: str = PHASE2_MODEL_NAME) -> tuple[str | None, str | None]:
+    """Async counterpart of get_summary_and_cot."""
+    logger.info("[LLM Interaction] (async) Phase 2: Generating outline for query: '%s'", original_user_query)
+    messages, has_content = _build_phase2_messages(original_user_query, scraped_articles_data, model_name)
+    if not has_content:
+        logger.warning("[LLM Interaction] No article text for Phase 2; skipping the LLM call.")
+        return _PHASE2_NO_CONTENT_RESULT
+    full_response, error_message_from_call = await _acall_llm(messages, model_name)
+    return _parse_phase2_response(full_response, error_message_from_call)
+
+
+
+def get_outline_and_elaboration(original_user_query: str, scraped_articles_data: list[dict], model_name: str = PHASE2_MODEL_NAME) -> tuple[str, str, str] | None:
+    """
+    Phase 2 and content elaboration in one JSON-mode request: (outline, elaboration, chain_of_thought).
+    Returns None when there is no usable content, the prompt is too large for one request (over
+    COMBINED_MAX_PROMPT_TOKENS), or the response is not the expected JSON; callers then use get_summary_and_cot as usual.
+    """
+    messages, has_content = _build_phase2_messages(original_user_query, scraped_articles_data, model_name, _PHASE2_COMBINED_SYSTEM_PROMPT)
+    if not has_content:
+        return None
+    # Measure the prompt actually sent (after ranking and paragraph selection), not the raw article text
+    prompt_tokens = llm_rate_limit.estimate_prompt_tokens(messages)
+    if prompt_tokens > COMBINED_MAX_PROMPT_TOKENS:
+        logger.info("[LLM Interaction] Prompt too large for a combined outline+elaboration request (%d tokens).", prompt_tokens)
+        return None
+
+    logger.info("[LLM Interaction] Phase 2 (combined with elaboration) for query: '%s'", original_user_query)
+    full_response, error_message_from_call = _call_llm(messages, model_name, response_format={"type": "json_object"})
+    if not full_response:
+        logger.warning("[LLM Interaction] Combined request failed: %s", error_message_from_call)
+        return None
+    try:
+        payload = json.loads(full_response)
+    except json.JSONDecodeError:
+        payload = None
+    fields = [payload.get(key) if isinstance(payload, dict) else None for key in ('outline', 'elaboration', 'chain_of_thought')]
+    if not all(isinstance(field, str) and field.strip() for field in fields[:2]):
+        logger.warning("[LLM Interaction] Combined response was not the expected JSON; falling back to the two-step path.")
+        return None
+    outline, elaboration, chain_of_thought = fields
+    return outline.strip(), elaboration.strip(), chain_of_thought if isinstance(chain_of_thought, str) else full_response
+
+
+async def get_summaries_batch(queries_and_articles: list[tuple[str, list[dict]]], concurrency: int = 10, model_name: str = PHASE2_MODEL_NAME) -> list:
+    """
+    Runs Phase 2 for several (original_user_query, scraped_articles_data) pairs concurrently, with at most
+    `concurrency` items in progress (requests in flight are further capped by LLM_MAX_CONCURRENCY).
+    Results are (outline, chain_of_thought) tuples in input order; failed items are returned as the raised exception.
+    """
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(query: str, articles: list[dict]):
+        async with sem:
+            return await get_summary_and_cot_async(query, articles, model_name)
+
+    tasks = [_one(query, articles) for query, articles in queries_and_articles]
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def get_summaries_and_cots_batch(queries_and_articles: list[tuple[str, list[dict]]], concurrency: int = 10, model_name: str = PHASE2_MODEL_NAME) -> list:
+    """Synchronous entry point for get_summaries_batch."""
+    return asyncio.run(get_summaries_batch(queries_and_articles, concurrency=concurrency, model_name=model_name))
+
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     print(f"--- Testing LLM Interaction Module (User's Prompt Style + Date Fix, Current Year: {CURRENT_YEAR}) ---")
     test_model_name = os.environ.get("TEST_LLM_MODEL", DEFAULT_MODEL_NAME)
     print(f"Using model for tests: {test_model_name}")
 
-    if not CLIENT:
+    if not get_client():
         print("Cannot run tests: OpenRouter client not initialized. Is OPENROUTER_API_KEY set?")
     else:
         # Test Phase 1 
@@ -0,0 +1,117 @@
+# llm_rate_limit.py
+import os
+import time
+import asyncio
+import threading
+import functools
+import logging
+
+import llm_tokens
+
+logger = logging.getLogger('llm_rate_limit')
+
+# Defaults match OpenRouter's free tier (20 requests/min); 0 disables the respective limit
+LLM_RATE_LIMIT_RPM = int(os.environ.get("LLM_RATE_LIMIT_RPM", 20))
+LLM_RATE_LIMIT_TPM = int(os.environ.get("LLM_RATE_LIMIT_TPM", 0))
+TOKENS_PER_MESSAGE_OVERHEAD = 4 # Role and separator tokens the chat format adds around each message
+
+
+class TokenBucket:
+    """
+    Proactive request/token pacing shared by every thread and event loop in the process.
+    Each call reserves one request and its estimated prompt tokens up front; when a bucket
+    would go negative the caller waits until it has refilled, so the limit is never exceeded
+    and waiting callers are served in arrival order.
+    """
+
+    def __init__(self, rpm: int, tpm: int = 0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        """Takes the capacity for one call and returns how long the caller must wait before making it."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated_at
+            self._updated_at = now
+            wait = 0.0
+            if self.rpm:
+                self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60) - 1
+                if self._requests < 0:
+                    wait = -self._requests * 60 / self.rpm
+            if self.tpm:
+                # A prompt larger than the whole bucket would otherwise never fit
+                self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60) - min(tokens, self.tpm)
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens * 60 / self.tpm)
+            return wait
+
+    def acquire(self, tokens: int = 0) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            logger.info(f"[Rate Limit] Pacing LLM request for {wait:.1f}s.")
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            logger.info(f"[Rate Limit] Pacing LLM request for {wait:.1f}s.")
+            await asyncio.sleep(wait)
+
+
+def estimate_prompt_tokens(messages: list[dict]) -> int:
+    """Prompt size of a chat request; handles both plain-string and content-block message bodies."""
+    total = 0
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = "".join(block.get("text", "") for block in content if isinstance(block, dict))
+        total += llm_tokens.count_tokens(content) + TOKENS_PER_MESSAGE_OVERHEAD
+    return total
+
+
+_default_limiter = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_default_limiter() -> TokenBucket | None:
+    """Process-wide limiter for OpenRouter calls, or None when both limits are disabled."""
+    global _default_limiter
+    if not LLM_RATE_LIMIT_RPM and not LLM_RATE_LIMIT_TPM:
+        return None
+    with _default_limiter_lock:
+        if _default_limiter is None:
+            _default_limiter = TokenBucket(LLM_RATE_LIMIT_RPM, LLM_RATE_LIMIT_TPM)
+        return _default_limiter
+
+
+def paced(fn, messages: list[dict]):
+    """Wraps a completion-create callable so every attempt, retries included, waits its turn first."""
+    limiter = get_default_limiter()
+    if limiter is None:
+        return fn
+    tokens = estimate_prompt_tokens(messages) if limiter.tpm else 0
+
+    @functools.wraps(fn)
+    def _paced(*args, **kwargs):
+        limiter.acquire(tokens)
+        return fn(*args, **kwargs)
+    return _paced
+
+
+def apaced(fn, messages: list[dict]):
+    """Async counterpart of paced(); `fn` must return an awaitable."""
+    limiter = get_default_limiter()
+    if limiter is None:
+        return fn
+    tokens = estimate_prompt_tokens(messages) if limiter.tpm else 0
+
+    @functools.wraps(fn)
+    async def _paced(*args, **kwargs):
+        await limiter.aacquire(tokens)
+        return await fn(*args, **kwargs)
+    return _paced
@@ -0,0 +1,136 @@
+# llm_retry.py
+import time
+import random
+import asyncio
+import threading
+import logging
+
+logger = logging.getLogger('llm_retry')
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Process-level circuit breaker: opens after `fail_max` consecutive transient failures,
+    rejects calls for `reset_timeout` seconds, then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, fail_max: int = 10, reset_timeout: float = 30.0, name: str = "llm"):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self._failures = 0
+        self._opened_at = None
+        self._half_open_trial = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """Raises CircuitOpenError while the circuit is open; returns True when this call is the half-open trial."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if self._half_open_trial or time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit '{self.name}' is open after {self._failures} consecutive failures; retry in a few seconds.")
+            # Half-open: only this call goes through; the rest are rejected until its outcome is recorded
+            self._half_open_trial = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._half_open_trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            # A failed trial re-opens the circuit immediately
+            if self._half_open_trial or (self._failures >= self.fail_max and self._opened_at is None):
+                self._half_open_trial = False
+                self._opened_at = time.monotonic()
+                logger.warning(f"[Circuit Breaker] '{self.name}' opened after {self._failures} consecutive failures.")
+
+    def release_trial(self) -> None:
+        """Ends a trial that was neither a success nor a transient failure (e.g. a non-retryable error), so the next caller gets one."""
+        with self._lock:
+            self._half_open_trial = False
+
+
+def backoff_delay(attempt: int, multiplier: float = 1.0, max_wait: float = 30.0) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(max_wait, multiplier * 2**attempt)]."""
+    return random.uniform(0, min(max_wait, multiplier * (2 ** attempt)))
+
+
+def retry_after_seconds(e: Exception) -> float | None:
+    """Seconds requested by the Retry-After header of the exception's HTTP response (seconds form only), if any."""
+    headers = getattr(getattr(e, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        delay = float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+    return delay if delay >= 0 else None
+
+
+def _retry_delay(e: Exception, attempt: int, max_wait: float) -> float:
+    """The server's Retry-After when it sent one (capped at max_wait), otherwise jittered exponential backoff."""
+    delay = retry_after_seconds(e)
+    return min(delay, max_wait) if delay is not None else backoff_delay(attempt, max_wait=max_wait)
+
+
+def call_with_retry(fn, *args, retry_on: tuple = (), max_attempts: int = 5, max_wait: float = 30.0,
+                    breaker: CircuitBreaker | None = None, **kwargs):
+    """
+    Calls fn(*args, **kwargs), retrying exceptions in `retry_on` with jittered exponential backoff
+    (or after the server's Retry-After delay, when the error carries one).
+    Only exhausted transient failures count against the circuit breaker.
+    """
+    is_trial = breaker.before_call() if breaker else False
+    try:
+        for attempt in range(max_attempts):
+            try:
+                result = fn(*args, **kwargs)
+            except retry_on as e:
+                if attempt == max_attempts - 1:
+                    if breaker:
+                        breaker.record_failure()
+                    raise
+                delay = _retry_delay(e, attempt, max_wait)
+                logger.warning(f"[Retry] Attempt {attempt+1}/{max_attempts} failed ({type(e).__name__}); retrying in {delay:.1f}s.")
+                time.sleep(delay)
+                continue
+            if breaker:
+                breaker.record_success()
+            return result
+    finally:
+        if is_trial:
+            breaker.release_trial()
+
+
+async def acall_with_retry(fn, *args, retry_on: tuple = (), max_attempts: int = 5, max_wait: float = 30.0,
+                           breaker: CircuitBreaker | None = None, **kwargs):
+    """Async counterpart of call_with_retry; `fn` must return an awaitable."""
+    is_trial = breaker.before_call() if breaker else False
+    try:
+        for attempt in range(max_attempts):
+            try:
+                result = await fn(*args, **kwargs)
+            except retry_on as e:
+                if attempt == max_attempts - 1:
+                    if breaker:
+                        breaker.record_failure()
+                    raise
+                delay = _retry_delay(e, attempt, max_wait)
+                logger.warning(f"[Retry] Attempt {attempt+1}/{max_attempts} failed ({type(e).__name__}); retrying in {delay:.1f}s.")
+                await asyncio.sleep(delay)
+                continue
+            if breaker:
+                breaker.record_success()
+            return result
+    finally:
+        if is_trial:
+            breaker.release_trial()
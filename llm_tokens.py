@@ -0,0 +1,51 @@
+# llm_tokens.py
+import functools
+import logging
+
+# Token counting (Optional): tiktoken gives exact BPE counts; without it we fall back to a chars/4 estimate
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
+
+logger = logging.getLogger('llm_tokens')
+
+TOKEN_ENCODING_NAME = "cl100k_base"
+CHARS_PER_TOKEN = 4 # Rough average for English prose; used only when tiktoken is unavailable
+
+
+@functools.lru_cache(maxsize=4)
+def get_encoding(encoding_name: str = TOKEN_ENCODING_NAME):
+    """Builds the tiktoken encoding once per process (its constructor is slow). Returns None if unavailable."""
+    if not TIKTOKEN_AVAILABLE:
+        return None
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e: # e.g. the BPE file cannot be downloaded on first use
+        logger.warning(f"[Tokens] Could not load tiktoken encoding '{encoding_name}', estimating from length: {e}")
+        return None
+
+
+def count_tokens(text: str, encoding_name: str = TOKEN_ENCODING_NAME) -> int:
+    """Number of tokens in text; exact with tiktoken, otherwise a ceil(chars / CHARS_PER_TOKEN) estimate."""
+    if not text:
+        return 0
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode_ordinary(text)) # Ordinary text only; skips the special-token scan
+
+
+def truncate_to_tokens(text: str, max_tokens: int, encoding_name: str = TOKEN_ENCODING_NAME) -> tuple[str, int]:
+    """(text cut to at most max_tokens tokens, its token count). Without tiktoken the cut is at max_tokens * CHARS_PER_TOKEN chars."""
+    if not text or max_tokens <= 0:
+        return "", 0
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        text = text[:max_tokens * CHARS_PER_TOKEN]
+        return text, -(-len(text) // CHARS_PER_TOKEN)
+    tokens = encoding.encode_ordinary(text)
+    if len(tokens) <= max_tokens:
+        return text, len(tokens)
+    return encoding.decode(tokens[:max_tokens]), max_tokens
@@ -4,7 +4,30 @@ import llm_interaction # Your module for LLM calls (ensure it's a version that h
 import google_search_scraper as search_scraper_module # Using Google Search scraper
 import content_elaboration # The module for content elaboration
 import requests # For IP-based location
-import datetime
+import asyncio
+import os
+import json
+import time
+import re
+import threading
+from dataclasses import dataclass
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# Opt-in: scrape the raw query while Phase 1 is still planning. Only reused when the plan keeps the query or fails,
+# so most queries pay for two scrapes (Custom Search quota included)
+SPECULATIVE_SCRAPE = os.environ.get("SPECULATIVE_SCRAPE", "false").lower() == "true"
+# Repeat queries reuse scrape results for a while; time-bound ("last 24 hours") queries go stale sooner
+SCRAPE_CACHE_TTL_SECONDS = 900
+RECENT_SCRAPE_CACHE_TTL_SECONDS = 300
+# The IP geo-lookup survives server restarts so a cold start does not block the first render on it
+GEO_CACHE_PATH = os.environ.get("GEO_CACHE_PATH", os.path.join(os.path.expanduser("~"), ".cache", "liveai", "geo.json"))
+GEO_CACHE_TTL_SECONDS = 86400
+GEO_LOOKUP_TIMEOUT_SECONDS = 3
+# Bounds session-state growth and the debug panel's st.json render cost over long sessions
+HISTORY_MAX_ENTRIES = 20
+HISTORY_MAX_ARTICLES_PER_STEP = 10
+LOOKBACK_HOURS = {"last 24 hours": 24, "today": 24, "last week": 24 * 7, "past week": 24 * 7, "last month": 24 * 30}
+LOOKBACK_RE = re.compile(r"\b(last 24 hours|today|last week|past week|last month)\b")
 
 
 st.set_page_config(page_title="Live Search Agent with CoT (Google Search)", layout="wide")
@@ -13,31 +36,92 @@ st.title("🔎 Live Search Agent with Chain of Thoughts (Google Search)")
 st.caption("Enter a query to get a web-informed answer with visible reasoning steps.")
 
 # Fetch user city via IP geo-lookup
-@st.cache_data(ttl=3600) # Updated decorator for newer Streamlit versions
-def get_user_city():
+def _read_geo_cache():
+    """Location string cached on disk by an earlier run, or None if missing, unreadable or older than GEO_CACHE_TTL_SECONDS."""
     try:
-        # Increased timeout slightly for robustness
-        resp = requests.get('https://ipinfo.io/json', timeout=10)
-        resp.raise_for_status() # Raise an exception for HTTP errors
-        data = resp.json()
-        city = data.get('city', '')
-        region = data.get('region', '')
-        country = data.get('country', '')
-        if city and region and country:
-            return f"{city}, {region}, {country}"
-        elif city and country:
-            return f"{city}, {country}"
-        elif city:
-            return city
-        return "Location not detected"
-    except Exception as e:
-        st.sidebar.warning(f"Could not detect location: {e}")
+        with open(GEO_CACHE_PATH, encoding='utf-8') as f:
+            cached = json.load(f)
+        if time.time() - cached['ts'] < GEO_CACHE_TTL_SECONDS:
+            return cached['location']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+def _write_geo_cache(location):
+    try:
+        os.makedirs(os.path.dirname(GEO_CACHE_PATH), exist_ok=True)
+        with open(GEO_CACHE_PATH, 'w', encoding='utf-8') as f:
+            json.dump({"location": location, "ts": time.time()}, f)
+    except OSError:
+        pass # Only costs a lookup on the next start
+
+@st.cache_resource
+def get_http_session():
+    """One requests.Session per server process (module globals are rebuilt on every rerun), so direct calls reuse connections."""
+    session = requests.Session()
+    session.headers.update({'User-Agent': 'liveai/1.0'})
+    return session
+
+def get_user_city():
+    cached_location = _read_geo_cache()
+    if cached_location:
+        return cached_location
+    # Short timeout: searches wait on this if it is still running, and failure just means no localization
+    resp = get_http_session().get('https://ipinfo.io/json', timeout=GEO_LOOKUP_TIMEOUT_SECONDS)
+    resp.raise_for_status() # Raise an exception for HTTP errors
+    data = resp.json()
+    city = data.get('city', '')
+    region = data.get('region', '')
+    country = data.get('country', '')
+    if city and region and country:
+        location = f"{city}, {region}, {country}"
+    elif city and country:
+        location = f"{city}, {country}"
+    elif city:
+        location = city
+    else:
         return "Location not detected"
+    _write_geo_cache(location)
+    return location
+
+@st.cache_resource(ttl=3600)
+def start_user_city_lookup():
+    """
+    Runs get_user_city on a background thread, once per process (per hour), so page renders never wait on it.
+    The returned dict gets 'location' (and 'error' on failure) before its 'done' event is set.
+    """
+    lookup = {"location": None, "error": None, "done": threading.Event()}
+    def _run():
+        try:
+            lookup["location"] = get_user_city()
+        except Exception as e:
+            lookup["error"] = e
+            lookup["location"] = "Location not detected"
+        finally:
+            lookup["done"].set()
+    threading.Thread(target=_run, name="geo-lookup", daemon=True).start()
+    return lookup
 
-user_location_info = get_user_city()
-if user_location_info and "not detected" not in user_location_info:
-    st.sidebar.info(f"Detected location: {user_location_info}")
+@st.cache_resource
+def prewarm_llm_clients():
+    """
+    Builds the pooled LLM clients on a background thread once per server process. The modules already keep
+    them for the process lifetime; this just moves the lazy first-use cost (openai import, client setup)
+    off the first search.
+    """
+    threading.Thread(target=lambda: (llm_interaction.get_client(), content_elaboration.get_client()),
+                     name="llm-client-prewarm", daemon=True).start()
+    return True
+
+prewarm_llm_clients()
+user_city_lookup = start_user_city_lookup()
+if not user_city_lookup["done"].is_set():
+    st.sidebar.caption("Detecting location…")
+elif "not detected" not in user_city_lookup["location"]:
+    st.sidebar.info(f"Detected location: {user_city_lookup['location']}")
 else:
+    if user_city_lookup["error"]:
+        st.sidebar.warning(f"Could not detect location: {user_city_lookup['error']}")
     st.sidebar.warning("User location not automatically detected. Search results may be less localized.")
 
 
@@ -51,8 +135,88 @@ def display_cot(cot_header, cot_text):
     else:
         st.warning(f"No {cot_header.lower()} available.")
 
+def write_stream_with_result(stream):
+    """
+    Shows a streaming llm_interaction generator's text live, then clears it and returns the generator's
+    return value (e.g. the parsed (outline, cot) tuple), which the caller renders in its final form.
+    """
+    result = {}
+    def _relay():
+        result['value'] = yield from stream
+    live_output = st.empty()
+    with live_output.container():
+        st.write_stream(_relay())
+    live_output.empty()
+    return result['value']
+
+@dataclass(frozen=True, slots=True)
+class ArticleCard:
+    """Preformatted strings for one article in the details expander."""
+    header: str
+    caption: str
+    snippet: str
+
+def _article_card(number, article):
+    text = article.get('text')
+    return ArticleCard(
+        header=f"**Source {number}: [{article.get('title', 'No Title')}]({article.get('url', '#')})**",
+        caption=f"Domain: {article.get('domain', 'N/A')} | Published: {article.get('publish_date_str', 'N/A')} | Method: {article.get('extraction_method', 'N/A')} | Note: {article.get('extraction_note', '')}",
+        snippet=(text[:200] + "...") if text else "No text extracted.",
+    )
+
+def build_article_cards(scraped_articles_data):
+    """One ArticleCard per article, built in a single pass and kept in session state for redraws."""
+    return [_article_card(i + 1, article) for i, article in enumerate(scraped_articles_data)]
+
+def render_article_cards(article_cards):
+    with st.expander(f"📚 View Processed Article Details ({len(article_cards)} found with content)", expanded=False):
+        for card in article_cards:
+            st.markdown(card.header)
+            st.caption(card.caption)
+            st.text(card.snippet)
+            st.markdown("---")
+
+@st.cache_data(ttl=SCRAPE_CACHE_TTL_SECONDS, show_spinner=False)
+def _cached_scrape(search_query, location, lookback_hours):
+    return asyncio.run(search_scraper_module.get_content_from_google_search_async(search_query, location=location, lookback_hours=lookback_hours))
+
+@st.cache_data(ttl=RECENT_SCRAPE_CACHE_TTL_SECONDS, show_spinner=False)
+def _cached_recent_scrape(search_query, location, lookback_hours):
+    return asyncio.run(search_scraper_module.get_content_from_google_search_async(search_query, location=location, lookback_hours=lookback_hours))
+
+def cached_scrape(search_query, location, lookback_hours):
+    """Scrape results keyed on (query, location, lookback), with a shorter TTL for queries limited to the last day."""
+    if lookback_hours is not None and lookback_hours <= 24:
+        return _cached_recent_scrape(search_query, location, lookback_hours)
+    return _cached_scrape(search_query, location, lookback_hours)
+
+async def plan_and_speculative_scrape(user_query, location, lookback_hours):
+    """
+    Runs Phase 1 and, when SPECULATIVE_SCRAPE is on, a scrape of the raw query concurrently.
+    Returns [phase1 result, scrape result]; either may be an exception, and the scrape result is None when skipped.
+    """
+    # A fast-path query is used as-is: no LLM call, and Phase 2 scrapes it once
+    fast_result = llm_interaction.get_search_query_fast_path(user_query)
+    if fast_result is not None:
+        return [fast_result, None]
+    plan = llm_interaction.get_search_query_and_cot_async(user_query)
+    if not SPECULATIVE_SCRAPE:
+        return [(await asyncio.gather(plan, return_exceptions=True))[0], None]
+    ctx = get_script_run_ctx()
+    def _speculative_scrape():
+        # st.cache_data needs the script's context. The worker belongs to this asyncio.run's default executor,
+        # which is shut down when the run ends, so the context never leaks into another session's work
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return cached_scrape(user_query, location, lookback_hours)
+    # The cached scrape is synchronous (a hit returns immediately, a miss runs its own event loop), so it gets a worker thread
+    scrape = asyncio.to_thread(_speculative_scrape)
+    return await asyncio.gather(plan, scrape, return_exceptions=True)
+
 # --- Main Application Logic ---
-user_query = st.text_input("Enter your search query:", placeholder="e.g., What are the latest advancements in AI?")
+# A form only reruns the script on submit, not on every edit of the query box
+with st.form("query_form", clear_on_submit=False):
+    user_query = st.text_input("Enter your search query:", placeholder="e.g., What are the latest advancements in AI?")
+    submitted = st.form_submit_button("🚀 Get Live Answer", type="primary")
 
 if 'history' not in st.session_state:
     st.session_state.history = []
@@ -60,11 +224,19 @@ if 'current_outline' not in st.session_state:
     st.session_state.current_outline = None
 if 'original_query_for_elaboration' not in st.session_state:
     st.session_state.original_query_for_elaboration = None
+if 'prefetched_elaboration' not in st.session_state:
+    st.session_state.prefetched_elaboration = None
+if 'last_process_log' not in st.session_state:
+    st.session_state.last_process_log = None
+if 'article_cards' not in st.session_state:
+    st.session_state.article_cards = []
 
 
-if st.button("🚀 Get Live Answer", type="primary"):
+if submitted:
     st.session_state.current_outline = None 
     st.session_state.original_query_for_elaboration = None
+    st.session_state.prefetched_elaboration = None
+    st.session_state.article_cards = []
 
     if not user_query:
         st.error("Please enter a search query.")
@@ -74,25 +246,44 @@ if st.button("🚀 Get Live Answer", type="primary"):
         current_process_log = {"query": user_query, "search_provider": "Google Search", "steps": []}
         st.session_state.original_query_for_elaboration = user_query 
 
+        # Determine lookback_hours based on query - simple heuristic for now
+        # One scan; when several phrases appear the narrowest window wins, as "today" did over "last week" before
+        lookback_hours_for_query = min((LOOKBACK_HOURS[phrase] for phrase in LOOKBACK_RE.findall(user_query.lower())), default=None)
+        
+        user_city_lookup["done"].wait(GEO_LOOKUP_TIMEOUT_SECONDS) # Normally finished long before the first search
+        user_location_info = user_city_lookup["location"] or "Location not detected"
+        location_for_search = user_location_info if "not detected" not in user_location_info else None
+
         # --- Phase 1: LLM plans the search ---
         st.subheader("Phase 1: Planning the Search")
         search_query_for_scraper = None
         phase1_cot = None
+        speculative_articles = None
         with st.spinner("Asking LLM to analyze query and suggest a search term..."):
-            try:
-                search_query_for_scraper, phase1_cot = llm_interaction.get_search_query_and_cot(user_query)
+            plan_result, speculative_result = asyncio.run(
+                plan_and_speculative_scrape(user_query, location_for_search, lookback_hours_for_query))
+            if isinstance(plan_result, Exception):
+                st.error(f"Error in Phase 1 (LLM planning): {plan_result}")
+                phase1_cot = f"An error occurred: {plan_result}"
+                current_process_log["steps"].append({"name": "LLM Search Plan Error", "error": str(plan_result)})
+            else:
+                search_query_for_scraper, phase1_cot = plan_result
                 current_process_log["steps"].append({
                     "name": "LLM Search Plan", 
                     "query_suggestion": search_query_for_scraper, 
                     "cot_snippet": (phase1_cot[:150]+"..." if phase1_cot else "N/A") 
                 })
-            except Exception as e:
-                st.error(f"Error in Phase 1 (LLM planning): {e}")
-                phase1_cot = f"An error occurred: {e}"
-                current_process_log["steps"].append({"name": "LLM Search Plan Error", "error": str(e)})
+            if isinstance(speculative_result, Exception):
+                current_process_log["steps"].append({"name": "Speculative Scrape Error (Google)", "error": str(speculative_result)})
+            else:
+                speculative_articles = speculative_result
 
         display_cot("📝 LLM's Search Plan (Chain of Thought)", phase1_cot)
 
+        if not search_query_for_scraper and speculative_articles:
+            st.warning("LLM could not determine a search query; using results for your original query instead.")
+            search_query_for_scraper = user_query
+
         if not search_query_for_scraper:
             st.error("LLM could not determine a search query. Please try rephrasing your input.")
         else:
@@ -104,28 +295,18 @@ if st.button("🚀 Get Live Answer", type="primary"):
             # This will be a list of dictionaries from get_content_from_google_search
             scraped_articles_data = [] 
 
-            # Determine lookback_hours based on query - simple heuristic for now
-            lookback_hours_for_query = None
-            if "last 24 hours" in user_query.lower() or "today" in user_query.lower():
-                lookback_hours_for_query = 24
-            elif "last week" in user_query.lower():
-                lookback_hours_for_query = 24 * 7
-            
-            location_for_search = user_location_info if "not detected" not in user_location_info else None
-
-
             with st.spinner(f"Searching Google for '{search_query_for_scraper}' (Location: {location_for_search or 'N/A'}, Lookback: {lookback_hours_for_query or 'N/A'}h) and scraping articles..."):
                 try:
-                    scraped_articles_data = search_scraper_module.get_content_from_google_search(
-                        search_query_for_scraper,
-                        location=location_for_search,
-                        lookback_hours=lookback_hours_for_query
-                    )
+                    if speculative_articles is not None and search_query_for_scraper.strip().lower() == user_query.strip().lower():
+                        scraped_articles_data = speculative_articles # Already scraped alongside Phase 1
+                    else:
+                        scraped_articles_data = cached_scrape(search_query_for_scraper, location_for_search, lookback_hours_for_query)
                     current_process_log["steps"].append({
                         "name": "Google Search & Scrape (Rich Content)", 
                         "articles_retrieved_count": len(scraped_articles_data),
-                        "article_titles": [article.get('title', 'N/A') for article in scraped_articles_data],
-                        "article_urls": [article.get('url', 'N/A') for article in scraped_articles_data]
+                        "article_titles": list(dict.fromkeys(article.get('title', 'N/A') for article in scraped_articles_data))[:HISTORY_MAX_ARTICLES_PER_STEP],
+                        "article_urls": list(dict.fromkeys(article.get('url', 'N/A') for article in scraped_articles_data))[:HISTORY_MAX_ARTICLES_PER_STEP],
+                        "n_more": max(0, len(scraped_articles_data) - HISTORY_MAX_ARTICLES_PER_STEP)
                     })
 
                 except Exception as e:
@@ -134,25 +315,8 @@ if st.button("🚀 Get Live Answer", type="primary"):
             
             if scraped_articles_data:
                 st.success(f"Successfully processed {len(scraped_articles_data)} article(s) from the web.")
-                # Create a list of URLs from the successfully processed articles for the expander title
-                # This list should come from the 'url' key in each dict within scraped_articles_data
-                processed_urls_titles = [(article.get('url', 'N/A'), article.get('title', 'No Title')) for article in scraped_articles_data]
-
-                with st.expander(f"📚 View Processed Article Details ({len(processed_urls_titles)} found with content)", expanded=False):
-                    for i, article_data_dict in enumerate(scraped_articles_data):
-                        title = article_data_dict.get('title', 'No Title')
-                        url = article_data_dict.get('url', '#')
-                        domain = article_data_dict.get('domain', 'N/A')
-                        extraction_method = article_data_dict.get('extraction_method', 'N/A')
-                        publish_date = article_data_dict.get('publish_date')
-                        extraction_note = article_data_dict.get('extraction_note', '')
-                        text_snippet = (article_data_dict.get('text', '')[:200] + "...") if article_data_dict.get('text') else "No text extracted."
-                        
-                        st.markdown(f"**Source {i+1}: [{title}]({url})**")
-                        date_display = publish_date.strftime('%Y-%m-%d') if isinstance(publish_date, datetime.datetime) else str(publish_date) if publish_date else 'N/A'
-                        st.caption(f"Domain: {domain} | Published: {date_display} | Method: {extraction_method} | Note: {extraction_note}")
-                        st.text(text_snippet)
-                        st.markdown("---")
+                st.session_state.article_cards = build_article_cards(scraped_articles_data)
+                render_article_cards(st.session_state.article_cards)
             else:
                 st.warning("Could not retrieve significant articles from the web using Google Search. The LLM will be informed.")
             
@@ -166,11 +330,17 @@ if st.button("🚀 Get Live Answer", type="primary"):
                 try:
                     # Pass the list of article dictionaries directly
                     # Also pass phase1_cot if your llm_interaction.py expects it for plan-guided outlining
-                    final_outline, phase3_cot = llm_interaction.get_summary_and_cot( 
-                        original_user_query=user_query,
-                        scraped_articles_data=scraped_articles_data
-                        # phase1_research_plan_cot=phase1_cot, # Uncomment if get_summary_and_cot expects this
-                    )
+                    combined_result = None
+                    if llm_interaction.COMBINED_ELABORATION:
+                        # Small article sets get the outline and its elaboration from a single request
+                        combined_result = llm_interaction.get_outline_and_elaboration(user_query, scraped_articles_data)
+                    if combined_result:
+                        final_outline, st.session_state.prefetched_elaboration, phase3_cot = combined_result
+                    else:
+                        final_outline, phase3_cot = write_stream_with_result(llm_interaction.get_summary_and_cot_stream( 
+                            original_user_query=user_query,
+                            scraped_articles_data=scraped_articles_data
+                        ))
                     st.session_state.current_outline = final_outline 
                     current_process_log["steps"].append({
                         "name": "LLM Outline Generation", 
@@ -192,7 +362,17 @@ if st.button("🚀 Get Live Answer", type="primary"):
                 st.error("LLM did not provide an outline.")
         
         st.session_state.history.append(current_process_log)
+        st.session_state.last_process_log = current_process_log # The outline's own entry, for the elaboration step to extend
+        if len(st.session_state.history) > HISTORY_MAX_ENTRIES:
+            st.session_state.history = st.session_state.history[-HISTORY_MAX_ENTRIES:]
         st.markdown("---") 
+elif st.session_state.current_outline:
+    # Reruns from other widgets (elaborate button, sidebar) show the last answer from session state instead of recomputing it
+    st.markdown("---")
+    if st.session_state.article_cards:
+        render_article_cards(st.session_state.article_cards)
+    st.subheader("✅ Brief Information Outline")
+    st.markdown(st.session_state.current_outline)
 
 # --- Phase 4: Optional Content Elaboration ---
 if st.session_state.current_outline and \
@@ -210,28 +390,30 @@ if st.session_state.current_outline and \
             elaboration_cot = None # To store CoT for elaboration
             with st.spinner("LLM is elaborating on the outline to create detailed content..."):
                 try:
-                    # Assuming content_elaboration.elaborate_on_outline returns (elaborated_text, cot)
-                    elaborated_text_final, elaboration_cot = content_elaboration.elaborate_on_outline(
-                        original_user_query=st.session_state.original_query_for_elaboration,
-                        information_outline=st.session_state.current_outline
-                    )
+                    if st.session_state.prefetched_elaboration:
+                        elaborated_text_final = st.session_state.prefetched_elaboration # Written together with the outline
+                    else:
+                        # Streamed into a placeholder so text appears as it is generated; rendered once more below
+                        live_output = st.empty()
+                        with live_output.container():
+                            elaborated_text_final = st.write_stream(content_elaboration.elaborate_on_outline_stream(
+                                original_user_query=st.session_state.original_query_for_elaboration,
+                                information_outline=st.session_state.current_outline
+                            ))
+                        live_output.empty()
                     
                     # Log this step
-                    for log_item in reversed(st.session_state.history):
-                        if log_item["query"] == st.session_state.original_query_for_elaboration:
-                            log_item["steps"].append({
-                                "name": "Content Elaboration",
-                                "elaborated_content_snippet": (elaborated_text_final[:200]+"..." if elaborated_text_final else "N/A"),
-                                "cot_snippet": (elaboration_cot[:150]+"..." if elaboration_cot else "N/A")
-                            })
-                            break
+                    if st.session_state.last_process_log is not None:
+                        st.session_state.last_process_log["steps"].append({
+                            "name": "Content Elaboration",
+                            "elaborated_content_snippet": (elaborated_text_final[:200]+"..." if elaborated_text_final else "N/A"),
+                            "cot_snippet": (elaboration_cot[:150]+"..." if elaboration_cot else "N/A")
+                        })
                 except Exception as e:
                     st.error(f"Error during content elaboration: {e}")
                     elaborated_text_final = f"Error during content elaboration: {e}"
-                    for log_item in reversed(st.session_state.history):
-                        if log_item["query"] == st.session_state.original_query_for_elaboration:
-                            log_item["steps"].append({"name": "Content Elaboration Error", "error": str(e)})
-                            break
+                    if st.session_state.last_process_log is not None:
+                        st.session_state.last_process_log["steps"].append({"name": "Content Elaboration Error", "error": str(e)})
             
             display_cot("🔍 LLM's Elaboration Process (Chain of Thought)", elaboration_cot) # Display CoT for elaboration
 